@@ -52,6 +52,7 @@ from sentry.reprocessing2 import get_progress
 from sentry.search.events.constants import RELEASE_STAGE_ALIAS
 from sentry.search.events.filter import convert_search_filter_to_snuba_query
 from sentry.tagstore.snuba.backend import fix_tag_value_data
+from sentry.tsdb.base import TimeSeriesColumns
 from sentry.tsdb.snuba import SnubaTSDB
 from sentry.utils import metrics
 from sentry.utils.cache import cache
@@ -593,6 +594,9 @@ class GroupStatsMixin:
     CUSTOM_ROLLUP_6H = timedelta(hours=6).total_seconds()  # rollups should be increments of 6hs
 
     def query_tsdb(self, group_ids, query_params):
+        """
+        Returns the ``TimeSeriesColumns`` of the given groups.
+        """
         raise NotImplementedError
 
     def get_stats(self, item_list, user, **kwargs):
@@ -636,7 +640,7 @@ class GroupStatsMixin:
                     "rollup": int(interval.total_seconds()),
                 }
 
-            return self.query_tsdb(group_ids, query_params, **kwargs)
+            return self.query_tsdb(group_ids, query_params, **kwargs).to_series()
 
 
 class StreamGroupSerializer(GroupSerializer, GroupStatsMixin):
@@ -664,16 +668,15 @@ class StreamGroupSerializer(GroupSerializer, GroupStatsMixin):
         try:
             environment = self.environment_func()
         except Environment.DoesNotExist:
-            stats = {key: tsdb.make_series(0, **query_params) for key in group_ids}
-        else:
-            stats = tsdb.get_range(
-                model=tsdb.models.group,
-                keys=group_ids,
-                environment_ids=environment and [environment.id],
-                **query_params,
-            )
+            _, series = tsdb.get_optimal_rollup_series(**query_params)
+            return TimeSeriesColumns(series, group_ids, [[0] * len(series) for _ in group_ids])
 
-        return stats
+        return tsdb.get_range_columns(
+            model=tsdb.models.group,
+            keys=group_ids,
+            environment_ids=environment and [environment.id],
+            **query_params,
+        )
 
     def get_attrs(self, item_list, user):
         attrs = super().get_attrs(item_list, user)
@@ -928,7 +931,7 @@ class StreamGroupSerializerSnuba(GroupSerializerSnuba, GroupStatsMixin):
         return None
 
     def query_tsdb(self, group_ids, query_params, conditions=None, environment_ids=None, **kwargs):
-        return snuba_tsdb.get_range(
+        return snuba_tsdb.get_range_columns(
             model=snuba_tsdb.models.group,
             keys=group_ids,
             environment_ids=environment_ids,
@@ -100,45 +100,77 @@ class BaseAttachmentCache:
         self.inner = inner
 
     def set(self, key, attachments, timeout=None):
-        for id, attachment in enumerate(attachments):
-            if attachment.chunks is not None:
-                continue
-            # TODO(markus): We need to get away from sequential IDs, they
-            # are risking collision when using Relay.
-            if attachment.id is None:
-                attachment.id = id
-
-            if attachment.key is None:
-                attachment.key = key
-
-            metrics_tags = {"type": attachment.type}
-            self.set_unchunked_data(
-                key=key,
-                id=attachment.id,
-                data=attachment.data,
-                timeout=timeout,
-                metrics_tags=metrics_tags,
-            )
-
-        meta = []
-
-        for attachment in attachments:
-            attachment._cache = self
-            meta.append(attachment.meta())
-
-        self.inner.set(ATTACHMENT_META_KEY.format(key=key), meta, timeout, raw=False)
+        self.set_many([(key, attachments)], timeout=timeout)
+
+    def set_many(self, items, timeout=None):
+        """
+        Stores the attachments of multiple events, given as a sequence of
+        ``(key, attachments)`` pairs. Data and metadata of all events are
+        each written with a single call to the backend.
+        """
+        data = {}
+        metas = {}
+
+        for key, attachments in items:
+            for id, attachment in enumerate(attachments):
+                if attachment.chunks is not None:
+                    continue
+                # TODO(markus): We need to get away from sequential IDs, they
+                # are risking collision when using Relay.
+                if attachment.id is None:
+                    attachment.id = id
+
+                if attachment.key is None:
+                    attachment.key = key
+
+                metrics_tags = {"type": attachment.type}
+                data_key = ATTACHMENT_UNCHUNKED_DATA_KEY.format(key=key, id=attachment.id)
+                data[data_key] = self._compress_unchunked_data(attachment.data, metrics_tags)
+
+            meta = []
+
+            for attachment in attachments:
+                attachment._cache = self
+                meta.append(attachment.meta())
+
+            metas[ATTACHMENT_META_KEY.format(key=key)] = meta
+
+        if data:
+            self.inner.set_many(data, timeout, raw=True)
+        if metas:
+            self.inner.set_many(metas, timeout, raw=False)
 
     def set_chunk(self, key, id, chunk_index, chunk_data, timeout=None):
         key = ATTACHMENT_DATA_CHUNK_KEY.format(key=key, id=id, chunk_index=chunk_index)
         self.inner.set(key, zlib.compress(chunk_data), timeout, raw=True)
 
+    def set_chunks(self, chunks, timeout=None):
+        """
+        Stores multiple chunks, given as ``(key, id, chunk_index, chunk_data)``
+        tuples, with a single call to the backend.
+        """
+        self.inner.set_many(
+            {
+                ATTACHMENT_DATA_CHUNK_KEY.format(
+                    key=key, id=id, chunk_index=chunk_index
+                ): zlib.compress(chunk_data)
+                for key, id, chunk_index, chunk_data in chunks
+            },
+            timeout,
+            raw=True,
+        )
+
     def set_unchunked_data(self, key, id, data, timeout=None, metrics_tags=None):
         key = ATTACHMENT_UNCHUNKED_DATA_KEY.format(key=key, id=id)
+        compressed = self._compress_unchunked_data(data, metrics_tags)
+        self.inner.set(key, compressed, timeout, raw=True)
+
+    def _compress_unchunked_data(self, data, metrics_tags=None):
         compressed = zlib.compress(data)
         metrics.timing("attachments.blob-size.raw", len(data), tags=metrics_tags)
         metrics.timing("attachments.blob-size.compressed", len(compressed), tags=metrics_tags)
         metrics.incr("attachments.received", tags=metrics_tags, skip_internal=False)
-        self.inner.set(key, compressed, timeout, raw=True)
+        return compressed
 
     def get_from_chunks(self, key, **attachment):
         return CachedAttachment(key=key, cache=self, **attachment)
@@ -1,9 +1,14 @@
 import logging
+from collections import defaultdict
 
-from django.db.models import F
+from django.db import connections, router
+from django.db.models import F, Model
+from django.db.models.expressions import BaseExpression
 
 from sentry.signals import buffer_incr_complete
 from sentry.tasks.process_buffer import process_incr
+from sentry.utils import metrics
+from sentry.utils.dates import to_timestamp
 from sentry.utils.services import Service
 
 
@@ -82,3 +87,168 @@ class Buffer(Service, metaclass=BufferMount):
             created=created,
             sender=model,
         )
+
+    def process_batch(self, items):
+        """
+        Processes many buffered increments at once.
+
+        ``items`` is a list of ``(model, columns, filters, extra, signal_only)``
+        tuples, the same arguments that ``process`` accepts. Increments that
+        target a single existing row by primary key are grouped by model and
+        the set of updated columns and written with one multi-row ``UPDATE``
+        per group; everything else goes through ``process``.
+        """
+        groups = defaultdict(list)
+        seen = set()
+        deferred = []
+        for item in items:
+            group_key = self._get_bulk_update_group(*item)
+            if group_key is None:
+                self.process(*item)
+                continue
+
+            # A row can only be updated once per statement
+            row_key = (group_key[0], self._get_filters_pk(item[2]))
+            if row_key in seen:
+                deferred.append(item)
+            else:
+                seen.add(row_key)
+                groups[group_key].append(item)
+
+        for (model, column_names, extra_names), group_items in groups.items():
+            if len(group_items) == 1:
+                self.process(*group_items[0])
+                continue
+
+            updated = self._bulk_update(model, column_names, extra_names, group_items)
+            metrics.timing(
+                "buffer.bulk-update.rows",
+                len(updated),
+                tags={"module": model.__module__, "model": model.__name__},
+            )
+            for model, columns, filters, extra, signal_only in group_items:
+                if self._get_filters_pk(filters) not in updated:
+                    # The row doesn't exist (yet), let the regular path create it.
+                    self.process(model, columns, filters, extra, signal_only)
+                    continue
+
+                buffer_incr_complete.send_robust(
+                    model=model,
+                    columns=columns,
+                    filters=filters,
+                    extra=extra,
+                    created=False,
+                    sender=model,
+                )
+
+        for item in deferred:
+            self.process(*item)
+
+    def _get_filters_pk(self, filters):
+        if len(filters) != 1:
+            return None
+        value = filters.get("id", filters.get("pk"))
+        if not isinstance(value, int):
+            return None
+        return value
+
+    def _get_bulk_update_group(self, model, columns, filters, extra=None, signal_only=None):
+        from sentry.event_manager import ScoreClause
+        from sentry.models import Group
+
+        if signal_only or self._get_filters_pk(filters) is None:
+            return None
+
+        extra = extra or {}
+        for name, value in extra.items():
+            if name == "score" and model is Group and isinstance(value, ScoreClause):
+                # Replaced by the score computed from `last_seen` and `times_seen`
+                if "last_seen" not in extra or "times_seen" not in columns:
+                    return None
+            elif isinstance(value, (BaseExpression, Model)):
+                return None
+
+        return (model, tuple(sorted(columns)), tuple(sorted(extra)))
+
+    def _bulk_update(self, model, column_names, extra_names, items):
+        """
+        Applies all ``items`` with a single ``UPDATE ... FROM (VALUES ...)``
+        statement and returns the set of primary keys that were updated.
+        """
+        from sentry.models import Group
+
+        using = router.db_for_write(model)
+        connection = connections[using]
+        qn = connection.ops.quote_name
+        opts = model._meta
+        pk_field = opts.pk
+
+        rows = {
+            self._get_filters_pk(filters): (columns, extra or {})
+            for _, columns, filters, extra, _ in items
+        }
+
+        compute_score = (
+            model is Group and "last_seen" in extra_names and "times_seen" in column_names
+        )
+        extra_names = tuple(n for n in extra_names if not (compute_score and n == "score"))
+
+        value_columns = [pk_field.column]
+        casts = [pk_field.cast_db_type(connection)]
+        assignments = []
+        for name in column_names:
+            field = opts.get_field(name)
+            value_columns.append(field.column)
+            casts.append(field.cast_db_type(connection))
+            assignments.append(
+                "{col} = t.{col} + v.{col}::{cast}".format(col=qn(field.column), cast=casts[-1])
+            )
+        for name in extra_names:
+            field = opts.get_field(name)
+            value_columns.append(field.column)
+            casts.append(field.cast_db_type(connection))
+            assignments.append(
+                "{col} = v.{col}::{cast}".format(col=qn(field.column), cast=casts[-1])
+            )
+        if compute_score:
+            # Equivalent of `ScoreClause` for every row
+            value_columns.append("_score_last_seen")
+            assignments.append(
+                "{score} = log(t.{times_seen} + v.{times_seen}::bigint) * 600"
+                " + v.{last_seen}::bigint".format(
+                    score=qn(opts.get_field("score").column),
+                    times_seen=qn(opts.get_field("times_seen").column),
+                    last_seen=qn("_score_last_seen"),
+                )
+            )
+
+        params = []
+        # Updating in primary key order avoids deadlocks between concurrent batches
+        for pk, (columns, extra) in sorted(rows.items()):
+            params.append(pk)
+            for name in column_names:
+                params.append(columns[name])
+            for name in extra_names:
+                field = opts.get_field(name)
+                params.append(field.get_db_prep_save(extra[name], connection))
+            if compute_score:
+                params.append(int(to_timestamp(extra["last_seen"])))
+
+        row_sql = "(%s)" % ", ".join(["%s"] * len(value_columns))
+        sql = (
+            "UPDATE {table} AS t SET {assignments} "
+            "FROM (VALUES {rows}) AS v ({columns}) "
+            "WHERE t.{pk} = v.{pk}::{pk_cast} "
+            "RETURNING t.{pk}"
+        ).format(
+            table=qn(opts.db_table),
+            assignments=", ".join(assignments),
+            rows=", ".join([row_sql] * len(rows)),
+            columns=", ".join(qn(c) for c in value_columns),
+            pk=qn(pk_field.column),
+            pk_cast=casts[0],
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return {row[0] for row in cursor.fetchall()}
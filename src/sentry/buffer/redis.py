@@ -1,8 +1,14 @@
+import atexit
+import os
 import pickle
+import random
 import threading
-from datetime import datetime
-from time import time
+from datetime import datetime, timedelta
+from time import sleep, time
 
+import msgpack
+from celery.signals import worker_process_shutdown
+from django.apps import apps
 from django.db import models
 from django.utils import timezone
 from django.utils.encoding import force_bytes, force_text
@@ -11,6 +17,7 @@ from sentry.buffer import Buffer
 from sentry.exceptions import InvalidConfiguration
 from sentry.tasks.process_buffer import process_incr, process_pending
 from sentry.utils import json, metrics
+from sentry.utils.codecs import Codec
 from sentry.utils.compat import crc32
 from sentry.utils.hashlib import md5_text
 from sentry.utils.imports import import_string
@@ -47,16 +54,167 @@ class PendingBuffer:
         return rv
 
 
+class BufferValueCodec(Codec):
+    """
+    Compact binary encoding for buffered ``filters`` and ``extra`` values.
+
+    Values are msgpack-encoded, with extension types for datetimes and model
+    references, and prefixed with a single version byte so that values
+    written by older (JSON/pickle) or newer workers can be told apart when
+    they end up in the same buffer hash.
+    """
+
+    version = 1
+    header = b"\x01"
+
+    EXT_DATETIME = 1
+    EXT_MODEL = 2
+    EXT_SCORE = 3
+
+    _epoch = datetime(1970, 1, 1)
+
+    def _default(self, value):
+        from sentry.event_manager import ScoreClause
+
+        if isinstance(value, datetime):
+            aware = value.tzinfo is not None
+            if aware:
+                value = value.astimezone(timezone.utc).replace(tzinfo=None)
+            delta = value - self._epoch
+            return msgpack.ExtType(
+                self.EXT_DATETIME,
+                msgpack.packb(
+                    [delta.days * 86400 + delta.seconds, delta.microseconds, aware],
+                ),
+            )
+        if isinstance(value, models.Model):
+            return msgpack.ExtType(
+                self.EXT_MODEL, msgpack.packb([value._meta.label, value.pk], use_bin_type=True)
+            )
+        if isinstance(value, ScoreClause):
+            # Only the SQL relevant values are kept, the group reference is
+            # recomputed by ``Buffer.process`` for updates.
+            return msgpack.ExtType(
+                self.EXT_SCORE,
+                self.encode([value.last_seen, value.times_seen]),
+            )
+        raise TypeError(f"unable to encode {type(value)!r}")
+
+    def _ext_hook(self, code, data):
+        if code == self.EXT_DATETIME:
+            seconds, microseconds, aware = msgpack.unpackb(data)
+            value = self._epoch + timedelta(seconds=seconds, microseconds=microseconds)
+            if aware:
+                value = value.replace(tzinfo=timezone.utc)
+            return value
+        if code == self.EXT_MODEL:
+            label, pk = msgpack.unpackb(data, raw=False)
+            return apps.get_model(label)(pk=pk)
+        if code == self.EXT_SCORE:
+            from sentry.event_manager import ScoreClause
+
+            last_seen, times_seen = self.decode(data)
+            return ScoreClause(last_seen=last_seen, times_seen=times_seen)
+        return msgpack.ExtType(code, data)
+
+    def encode(self, value):
+        return self.header + msgpack.packb(value, use_bin_type=True, default=self._default)
+
+    def decode(self, value):
+        assert value[:1] == self.header
+        return msgpack.unpackb(
+            memoryview(value)[1:],
+            raw=False,
+            strict_map_key=False,
+            ext_hook=self._ext_hook,
+        )
+
+
+class CoalescedIncr:
+    """
+    In-process aggregate of all ``incr`` calls for a single buffer key.
+
+    Counters are summed, ``extra`` values are last write wins and
+    ``signal_only`` sticks once any call sets it, which mirrors what the
+    individual Redis commands would have produced.
+    """
+
+    __slots__ = ("model", "filters", "columns", "extra", "signal_only", "calls")
+
+    def __init__(self, model, filters):
+        self.model = model
+        self.filters = filters
+        self.columns = {}
+        self.extra = {}
+        self.signal_only = None
+        self.calls = 0
+
+    def add(self, columns, extra=None, signal_only=None):
+        for column, amount in columns.items():
+            self.columns[column] = self.columns.get(column, 0) + amount
+        if extra:
+            self.extra.update(extra)
+        if signal_only is True:
+            self.signal_only = True
+        self.calls += 1
+
+    def merge(self, newer):
+        """
+        Adds the increments of ``newer``, which were collected after the ones
+        of this entry, so that its ``extra`` values win.
+        """
+        self.add(newer.columns, newer.extra, newer.signal_only)
+        self.calls += newer.calls - 1
+
+
 class RedisBuffer(Buffer):
     key_expire = 60 * 60  # 1 hour
     pending_key = "b:p"
 
-    def __init__(self, pending_partitions=1, incr_batch_size=2, **options):
+    def __init__(
+        self,
+        pending_partitions=1,
+        incr_batch_size=2,
+        coalesce_window=0,
+        coalesce_batch_size=1000,
+        codec_version=0,
+        bulk_process=False,
+        pending_chunk_size=None,
+        **options,
+    ):
         self.cluster, options = get_cluster_from_options("SENTRY_BUFFER_OPTIONS", options)
         self.pending_partitions = pending_partitions
         self.incr_batch_size = incr_batch_size
+        # When ``coalesce_window`` (in seconds) is set, increments are
+        # aggregated in-process per key and written to Redis once the window
+        # has elapsed or ``coalesce_batch_size`` calls have been collected.
+        self.coalesce_window = coalesce_window
+        self.coalesce_batch_size = coalesce_batch_size
         assert self.pending_partitions > 0
         assert self.incr_batch_size > 0
+        # Values are always readable in both the legacy (JSON/pickle) and the
+        # versioned codec. Workers that predate the codec can only read the
+        # legacy format, so pickles are written until ``codec_version`` is
+        # set to ``BufferValueCodec.version`` once all of them are upgraded.
+        self.codec_version = codec_version
+        self.codec = BufferValueCodec()
+        # Process batches of keys with pipelined Redis reads and bulk
+        # ``UPDATE`` statements rather than key by key.
+        self.bulk_process = bulk_process
+        # When set, ``process_pending`` pops pending keys from each host in
+        # chunks of this size instead of reading the whole pending set.
+        self.pending_chunk_size = pending_chunk_size
+        assert self.pending_chunk_size is None or self.pending_chunk_size > 0
+        assert self.coalesce_window >= 0
+        assert self.coalesce_batch_size > 0
+        assert self.codec_version in (0, BufferValueCodec.version)
+
+        self._coalesce_lock = threading.Lock()
+        self._coalesced = {}
+        self._coalesced_calls = 0
+        self._coalesce_started = None
+        self._coalesce_flusher = None
+        self._coalesce_hooks_registered = False
 
     def validate(self):
         try:
@@ -142,6 +300,21 @@ class RedisBuffer(Buffer):
         else:
             raise TypeError(f"invalid type: {type_}")
 
+    def _encode_stored_value(self, value):
+        if self.codec_version == 0:
+            return pickle.dumps(value)
+        return self.codec.encode(value)
+
+    def _decode_stored_value(self, value):
+        if value[:1] == self.codec.header:
+            return self.codec.decode(value)
+        if value.startswith(b"{"):
+            return self._load_values(json.loads(value.decode("utf-8")))
+        if value.startswith(b"["):
+            return self._load_value(json.loads(value.decode("utf-8")))
+        # TODO(dcramer): legacy pickle support - remove in Sentry 9.1
+        return pickle.loads(value)
+
     def incr(self, model, columns, filters, extra=None, signal_only=None):
         """
         Increment the key by doing the following:
@@ -151,22 +324,38 @@ class RedisBuffer(Buffer):
             - Perform a set (last write wins) on extra
             - Perform a set on signal_only (only if True)
         - Add hashmap key to pending flushes
+
+        If coalescing is enabled, the above is deferred and performed once per
+        key for all increments collected within the coalescing window.
         """
 
-        # TODO(dcramer): longer term we'd rather not have to serialize values
-        # here (unless it's to JSON)
         key = self._make_key(model, filters)
-        pending_key = self._make_pending_key_from_key(key)
-        # We can't use conn.map() due to wanting to support multiple pending
-        # keys (one per Redis partition)
-        conn = self.cluster.get_local_client_for_key(key)
 
-        pipe = conn.pipeline()
+        if self.coalesce_window:
+            self._coalesce_incr(key, model, columns, filters, extra, signal_only)
+        else:
+            # We can't use conn.map() due to wanting to support multiple pending
+            # keys (one per Redis partition)
+            conn = self.cluster.get_local_client_for_key(key)
+            pipe = conn.pipeline()
+            self._write_incr(pipe, key, model, columns, filters, extra, signal_only)
+            pipe.execute()
+
+        metrics.incr(
+            "buffer.incr",
+            skip_internal=True,
+            tags={"module": model.__module__, "model": model.__name__},
+        )
+
+    def _write_incr(self, pipe, key, model, columns, filters, extra=None, signal_only=None):
+        """
+        Queues the Redis commands for a single (possibly coalesced) increment
+        of ``key`` onto ``pipe``. ``pipe`` must route to the host owning
+        ``key`` as the pending set is stored alongside it.
+        """
+        pending_key = self._make_pending_key_from_key(key)
         pipe.hsetnx(key, "m", f"{model.__module__}.{model.__name__}")
-        # TODO(dcramer): once this goes live in production, we can kill the pickle path
-        # (this is to ensure a zero downtime deploy where we can transition event processing)
-        pipe.hsetnx(key, "f", pickle.dumps(filters))
-        # pipe.hsetnx(key, 'f', json.dumps(self._dump_values(filters)))
+        pipe.hsetnx(key, "f", self._encode_stored_value(filters))
         for column, amount in columns.items():
             pipe.hincrby(key, "i+" + column, amount)
 
@@ -175,24 +364,147 @@ class RedisBuffer(Buffer):
             # hook here
             # e.g. "update score if last_seen or times_seen is changed"
             for column, value in extra.items():
-                # TODO(dcramer): once this goes live in production, we can kill the pickle path
-                # (this is to ensure a zero downtime deploy where we can transition event processing)
-                pipe.hset(key, "e+" + column, pickle.dumps(value))
-                # pipe.hset(key, 'e+' + column, json.dumps(self._dump_value(value)))
+                pipe.hset(key, "e+" + column, self._encode_stored_value(value))
 
         if signal_only is True:
             pipe.hset(key, "s", "1")
 
         pipe.expire(key, self.key_expire)
         pipe.zadd(pending_key, {key: time()})
-        pipe.execute()
 
-        metrics.incr(
-            "buffer.incr",
-            skip_internal=True,
-            tags={"module": model.__module__, "model": model.__name__},
+    def _coalesce_incr(self, key, model, columns, filters, extra=None, signal_only=None):
+        with self._coalesce_lock:
+            entry = self._coalesced.get(key)
+            if entry is None:
+                entry = self._coalesced[key] = CoalescedIncr(model, filters)
+            entry.add(columns, extra, signal_only)
+            self._coalesced_calls += 1
+            if self._coalesce_started is None:
+                self._coalesce_started = time()
+            should_flush = (
+                self._coalesced_calls >= self.coalesce_batch_size
+                or time() - self._coalesce_started >= self.coalesce_window
+            )
+            if not self._coalesce_hooks_registered:
+                self._coalesce_hooks_registered = True
+                self._register_coalesce_hooks()
+
+        if should_flush:
+            # The increments of the failed flush are kept and retried by the
+            # flusher thread. Raising here would make the caller retry too and
+            # count the increments twice.
+            try:
+                self.flush_coalesced()
+            except Exception:
+                metrics.incr("buffer.coalesce.flush-failed", skip_internal=True)
+                self.logger.exception("buffer.coalesce.flush-failed")
+        else:
+            self._ensure_coalesce_flusher()
+
+    def _ensure_coalesce_flusher(self):
+        # Make sure increments don't linger in memory when traffic stops
+        # before the batch size is reached.
+        if self._coalesce_flusher is not None and self._coalesce_flusher.is_alive():
+            return
+
+        with self._coalesce_lock:
+            if self._coalesce_flusher is not None and self._coalesce_flusher.is_alive():
+                return
+            t = threading.Thread(target=self._run_coalesce_flusher, name="buffer-coalesce-flusher")
+            t.daemon = True
+            t.start()
+            self._coalesce_flusher = t
+
+    def _register_coalesce_hooks(self):
+        # The flusher is a daemon thread, so increments that are still held in
+        # memory would be lost when the process exits or forks.
+        atexit.register(self._flush_coalesced_on_shutdown)
+        worker_process_shutdown.connect(self._flush_coalesced_on_shutdown, weak=False)
+        os.register_at_fork(
+            before=self._flush_coalesced_on_shutdown,
+            after_in_child=self._reset_coalesced_in_child,
         )
 
+    def _flush_coalesced_on_shutdown(self, **kwargs):
+        try:
+            self.flush_coalesced()
+        except Exception:
+            self.logger.exception("buffer.coalesce.flush-failed")
+
+    def _reset_coalesced_in_child(self):
+        # Neither the flusher thread nor a lock held by it survive a fork.
+        self._coalesce_lock = threading.Lock()
+        self._coalesced = {}
+        self._coalesced_calls = 0
+        self._coalesce_started = None
+        self._coalesce_flusher = None
+
+    def _run_coalesce_flusher(self):
+        while True:
+            sleep(self.coalesce_window)
+            try:
+                self.flush_coalesced()
+            except Exception:
+                self.logger.exception("buffer.coalesce.flush-failed")
+
+    def flush_coalesced(self):
+        """
+        Writes all coalesced increments to Redis, issuing a single pipeline
+        per Redis host.
+
+        If the write fails, the increments are merged back into the ones
+        collected in the meantime, so they are written by the next flush, and
+        the error is raised.
+        """
+        with self._coalesce_lock:
+            if not self._coalesced:
+                return
+            entries = self._coalesced
+            calls = self._coalesced_calls
+            self._coalesced = {}
+            self._coalesced_calls = 0
+            self._coalesce_started = None
+
+        router = self.cluster.get_router()
+        hosts = set()
+        try:
+            with metrics.timer("buffer.coalesce.flush"):
+                with self.cluster.fanout() as conn:
+                    for key, entry in entries.items():
+                        hosts.add(router.get_host_for_key(key))
+                        self._write_incr(
+                            conn.target_key(key),
+                            key,
+                            entry.model,
+                            entry.columns,
+                            entry.filters,
+                            entry.extra,
+                            entry.signal_only,
+                        )
+        except Exception:
+            # Hosts that did receive their commands will count these increments
+            # twice, which is preferable to dropping them all.
+            self._restore_coalesced(entries, calls)
+            raise
+
+        metrics.timing("buffer.coalesce.calls", calls)
+        metrics.timing("buffer.coalesce.keys", len(entries))
+        metrics.timing("buffer.coalesce.hosts", len(hosts))
+        metrics.timing("buffer.coalesce.ratio", calls / len(entries))
+
+    def _restore_coalesced(self, entries, calls):
+        with self._coalesce_lock:
+            for key, entry in entries.items():
+                newer = self._coalesced.get(key)
+                if newer is not None:
+                    entry.merge(newer)
+                self._coalesced[key] = entry
+            self._coalesced_calls += calls
+            if self._coalesce_started is None:
+                self._coalesce_started = time()
+        metrics.incr("buffer.coalesce.restored", amount=len(entries), skip_internal=True)
+        self._ensure_coalesce_flusher()
+
     def process_pending(self, partition=None):
         if partition is None and self.pending_partitions > 1:
             # If we're using partitions, this one task fans out into
@@ -204,6 +516,10 @@ class RedisBuffer(Buffer):
             # super fast and is fine to do redundantly.
 
         pending_key = self._make_pending_key(partition)
+        if self.pending_chunk_size is not None:
+            self._process_pending_streaming(pending_key)
+            return
+
         client = self.cluster.get_routing_client()
         lock_key = self._make_lock_key(pending_key)
         # prevent a stampede due to celerybeat + periodic task
@@ -236,6 +552,58 @@ class RedisBuffer(Buffer):
         finally:
             client.delete(lock_key)
 
+    def _process_pending_streaming(self, pending_key):
+        """
+        Drains ``pending_key`` host by host, popping at most
+        ``pending_chunk_size`` keys at a time. Every host is guarded by its own
+        lock (stored on that host), so several workers can drain different
+        hosts of the same pending set concurrently.
+        """
+        lock_key = self._make_lock_key(pending_key)
+        lock_timeout = 60
+        host_ids = list(self.cluster.hosts)
+        random.shuffle(host_ids)
+
+        for host_id in host_ids:
+            client = self.cluster.get_local_client(host_id)
+            # prevent a stampede due to celerybeat + periodic task
+            if not client.set(lock_key, "1", nx=True, ex=lock_timeout):
+                metrics.incr("buffer.pending-host-locked", tags={"host": str(host_id)})
+                continue
+
+            pending_buffer = PendingBuffer(self.incr_batch_size)
+            started = time()
+            keycount = 0
+            oldest = None
+
+            try:
+                # Stop before the lock expires, whatever is left over is
+                # picked up by the next run.
+                while time() - started < lock_timeout / 2:
+                    entries = client.zpopmin(pending_key, self.pending_chunk_size)
+                    if not entries:
+                        break
+
+                    if oldest is None:
+                        oldest = entries[0][1]
+                    keycount += len(entries)
+                    for key, _ in entries:
+                        pending_buffer.append(key.decode("utf-8"))
+                        if pending_buffer.full():
+                            process_incr.apply_async(kwargs={"batch_keys": pending_buffer.flush()})
+
+                    if len(entries) < self.pending_chunk_size:
+                        break
+
+                if not pending_buffer.empty():
+                    process_incr.apply_async(kwargs={"batch_keys": pending_buffer.flush()})
+            finally:
+                client.delete(lock_key)
+
+            metrics.timing("buffer.pending-size", keycount, tags={"host": str(host_id)})
+            if oldest is not None:
+                metrics.timing("buffer.pending-age", started - oldest, tags={"host": str(host_id)})
+
     def process(self, key=None, batch_keys=None):
         assert not (key is None and batch_keys is None)
         assert not (key is not None and batch_keys is not None)
@@ -243,9 +611,48 @@ class RedisBuffer(Buffer):
         if key is not None:
             batch_keys = [key]
 
+        if self.bulk_process and len(batch_keys) > 1:
+            self._process_batch_incr(batch_keys)
+            return
+
         for key in batch_keys:
             self._process_single_incr(key)
 
+    def _load_buffered_values(self, key, values):
+        """
+        Turns the contents of a buffer hash into the arguments of
+        ``Buffer.process``, or ``None`` if the hash was already processed.
+        """
+        # XXX(python3): In python2 this isn't as important since redis will
+        # return string tyes (be it, byte strings), but in py3 we get bytes
+        # back, and really we just want to deal with keys as strings.
+        values = {force_text(k): v for k, v in values.items()}
+
+        if not values:
+            metrics.incr("buffer.revoked", tags={"reason": "empty"}, skip_internal=False)
+            self.logger.debug("buffer.revoked.empty", extra={"redis_key": key})
+            return None
+
+        # XXX(py3): Note that ``import_string`` explicitly wants a str in
+        # python2, so we'll decode (for python3) and then translate back to
+        # a byte string (in python2) for import_string.
+        model = import_string(str(values.pop("m").decode("utf-8")))  # NOQA
+
+        filters = self._decode_stored_value(values.pop("f"))
+
+        incr_values = {}
+        extra_values = {}
+        signal_only = None
+        for k, v in values.items():
+            if k.startswith("i+"):
+                incr_values[k[2:]] = int(v)
+            elif k.startswith("e+"):
+                extra_values[k[2:]] = self._decode_stored_value(v)
+            elif k == "s":
+                signal_only = bool(int(v))  # Should be 1 if set
+
+        return (model, incr_values, filters, extra_values, signal_only)
+
     def _process_single_incr(self, key):
         client = self.cluster.get_routing_client()
         lock_key = self._make_lock_key(key)
@@ -266,42 +673,49 @@ class RedisBuffer(Buffer):
             pipe.delete(key)
             values = pipe.execute()[0]
 
-            # XXX(python3): In python2 this isn't as important since redis will
-            # return string tyes (be it, byte strings), but in py3 we get bytes
-            # back, and really we just want to deal with keys as strings.
-            values = {force_text(k): v for k, v in values.items()}
-
-            if not values:
-                metrics.incr("buffer.revoked", tags={"reason": "empty"}, skip_internal=False)
-                self.logger.debug("buffer.revoked.empty", extra={"redis_key": key})
-                return
-
-            # XXX(py3): Note that ``import_string`` explicitly wants a str in
-            # python2, so we'll decode (for python3) and then translate back to
-            # a byte string (in python2) for import_string.
-            model = import_string(str(values.pop("m").decode("utf-8")))  # NOQA
+            item = self._load_buffered_values(key, values)
+            if item is not None:
+                super().process(*item)
+        finally:
+            client.delete(lock_key)
 
-            if values["f"].startswith(b"{"):
-                filters = self._load_values(json.loads(values.pop("f").decode("utf-8")))
+    def _process_batch_incr(self, keys):
+        """
+        Processes many keys at once: locks are taken, and hashes fetched and
+        deleted, with one pipeline per Redis host before the collected
+        increments are handed to ``Buffer.process_batch``.
+        """
+        with self.cluster.map() as conn:
+            lock_results = [
+                (key, conn.set(self._make_lock_key(key), "1", nx=True, ex=10)) for key in keys
+            ]
+
+        locked_keys = []
+        for key, result in lock_results:
+            if result.value:
+                locked_keys.append(key)
             else:
-                # TODO(dcramer): legacy pickle support - remove in Sentry 9.1
-                filters = pickle.loads(values.pop("f"))
-
-            incr_values = {}
-            extra_values = {}
-            signal_only = None
-            for k, v in values.items():
-                if k.startswith("i+"):
-                    incr_values[k[2:]] = int(v)
-                elif k.startswith("e+"):
-                    if v.startswith(b"["):
-                        extra_values[k[2:]] = self._load_value(json.loads(v.decode("utf-8")))
-                    else:
-                        # TODO(dcramer): legacy pickle support - remove in Sentry 9.1
-                        extra_values[k[2:]] = pickle.loads(v)
-                elif k == "s":
-                    signal_only = bool(int(v))  # Should be 1 if set
-
-            super().process(model, incr_values, filters, extra_values, signal_only)
+                metrics.incr("buffer.revoked", tags={"reason": "locked"}, skip_internal=False)
+                self.logger.debug("buffer.revoked.locked", extra={"redis_key": key})
+
+        try:
+            with self.cluster.fanout() as conn:
+                value_results = []
+                for key in locked_keys:
+                    client = conn.target_key(key)
+                    value_results.append((key, client.hgetall(key)))
+                    client.zrem(self._make_pending_key_from_key(key), key)
+                    client.delete(key)
+
+            items = []
+            for key, result in value_results:
+                item = self._load_buffered_values(key, result.value)
+                if item is not None:
+                    items.append(item)
+
+            metrics.timing("buffer.process-batch.size", len(items))
+            super().process_batch(items)
         finally:
-            client.delete(lock_key)
+            with self.cluster.map() as conn:
+                for key in locked_keys:
+                    conn.delete(self._make_lock_key(key))
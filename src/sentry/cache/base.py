@@ -32,6 +32,12 @@ class BaseCache(local):
     def set(self, key, value, timeout, version=None, raw=False):
         raise NotImplementedError
 
+    def set_many(self, items, timeout, version=None, raw=False):
+        # This implementation can/should be overridden by concrete subclasses
+        # to write all items in as few round trips as possible.
+        for key, value in items.items():
+            self.set(key, value, timeout, version=version, raw=raw)
+
     def delete(self, key, version=None):
         raise NotImplementedError
 
@@ -8,6 +8,10 @@ class DjangoCache(BaseCache):
         cache.set(key, value, timeout, version=version or self.version)
         self._mark_transaction("set")
 
+    def set_many(self, items, timeout, version=None, raw=False):
+        cache.set_many(items, timeout, version=version or self.version)
+        self._mark_transaction("set")
+
     def delete(self, key, version=None):
         cache.delete(key, version=version or self.version)
         self._mark_transaction("delete")
@@ -17,16 +17,28 @@ class CommonRedisCache(BaseCache):
         BaseCache.__init__(self, **options)
 
     def set(self, key, value, timeout, version=None, raw=False):
+        self._set(self.client, key, value, timeout, version=version, raw=raw)
+        self._mark_transaction("set")
+
+    def set_many(self, items, timeout, version=None, raw=False):
+        # Cluster pipelines group the commands by node, so all items are
+        # written with a single round trip per node.
+        with self.client.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                self._set(pipe, key, value, timeout, version=version, raw=raw)
+            pipe.execute()
+
+        self._mark_transaction("set")
+
+    def _set(self, client, key, value, timeout, version=None, raw=False):
         key = self.make_key(key, version=version)
         v = json.dumps(value) if not raw else value
         if len(v) > self.max_size:
             raise ValueTooLarge(f"Cache key too large: {key!r} {len(v)!r}")
         if timeout:
-            self.client.setex(key, int(timeout), v)
+            client.setex(key, int(timeout), v)
         else:
-            self.client.set(key, v)
-
-        self._mark_transaction("set")
+            client.set(key, v)
 
     def delete(self, key, version=None):
         key = self.make_key(key, version=version)
@@ -51,6 +63,15 @@ class RbCache(CommonRedisCache):
         client = cluster.get_routing_client()
         CommonRedisCache.__init__(self, client, **options)
 
+    def set_many(self, items, timeout, version=None, raw=False):
+        # rb does not support pipelines on the routing client, but a mapping
+        # client batches the commands per host.
+        with self.client.map() as client:
+            for key, value in items.items():
+                self._set(client, key, value, timeout, version=version, raw=raw)
+
+        self._mark_transaction("set")
+
 
 # Confusing legacy name for RbCache.  We don't actually have a pure redis cache
 RedisCache = RbCache
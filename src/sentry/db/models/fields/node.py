@@ -8,6 +8,7 @@ from django.db.models.signals import post_delete
 
 from sentry import nodestore
 from sentry.db.models.utils import Creator
+from sentry.nodestore.base import LazyNodePayload
 from sentry.utils.cache import memoize
 from sentry.utils.canonical import CANONICAL_TYPES, CanonicalKeyDict
 from sentry.utils.strings import compress, decompress
@@ -45,9 +46,15 @@ class NodeData(MutableMapping):
         if data is not None and self.wrapper is not None:
             data = self.wrapper(data)
         self._node_data = data
+        # (payload, ref) of lazily read data that is bound on first access
+        self._unbound_node_data = None
 
     def __getstate__(self):
+        if self._unbound_node_data is not None:
+            # bind lazily read data before it is pickled
+            self.data
         data = dict(self.__dict__)
+        data.pop("_unbound_node_data", None)
         # downgrade this into a normal dict in case it's a shim dict.
         # This is needed as older workers might not know about newer
         # collection types.  For instance we have events where this is a
@@ -61,6 +68,7 @@ class NodeData(MutableMapping):
         # If there is a legacy pickled version that used to have data as a
         # duplicate, reject it.
         state.pop("data", None)
+        state["_unbound_node_data"] = None
         if state.pop("_node_data_CANONICAL", False):
             state["_node_data"] = CanonicalKeyDict(state["_node_data"])
         self.__dict__ = state
@@ -103,6 +111,12 @@ class NodeData(MutableMapping):
         if self._node_data is not None:
             return self._node_data
 
+        elif self._unbound_node_data is not None:
+            data, ref = self._unbound_node_data
+            self._unbound_node_data = None
+            self.bind_data(data, ref=ref)
+            return self._node_data
+
         elif self.id:
             self.bind_data(nodestore.get(self.id) or {})
             return self._node_data
@@ -113,6 +127,17 @@ class NodeData(MutableMapping):
         return rv
 
     def bind_data(self, data, ref=None):
+        """
+        Binds data read from nodestore. Binding of a ``LazyNodePayload`` that
+        has not been decoded yet (including the reference check) is deferred
+        until the data is first accessed.
+        """
+        if isinstance(data, LazyNodePayload) and not data.is_decoded:
+            self.__dict__.pop("data", None)
+            self._node_data = None
+            self._unbound_node_data = (data, ref)
+            return
+
         self.ref = data.pop("_ref", ref)
         ref_version = data.pop("_ref_version", None)
         if ref_version == self.ref_version and ref is not None and self.ref != ref:
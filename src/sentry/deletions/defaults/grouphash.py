@@ -0,0 +1,22 @@
+from ..base import BulkModelDeletionTask
+
+
+class GroupHashDeletionTask(BulkModelDeletionTask):
+    """
+    Deletes grouphashes with raw SQL like `BulkModelDeletionTask`, which skips the
+    signals that invalidate the grouphash cache, so it is invalidated here.
+    """
+
+    def get_project_ids(self):
+        if "project_id" in self.query:
+            return [self.query["project_id"]]
+        return set(
+            self.model.objects.filter(**self.query).values_list("project_id", flat=True).distinct()
+        )
+
+    def chunk(self):
+        project_ids = self.get_project_ids()
+        try:
+            return super().chunk()
+        finally:
+            self.model.objects.invalidate_cache(project_ids)
@@ -769,25 +769,35 @@ def _tsdb_record_all_metrics(jobs):
     """
     Do all tsdb-related things for save_event in here s.t. we can potentially
     put everything in a single redis pipeline someday.
+
+    Writes of all jobs are collected and recorded with a single call per
+    data type, which allows the backend to merge identical increments.
     """
 
     # XXX: validate whether anybody actually uses those metrics
 
-    for job in jobs:
-        incrs = []
-        frequencies = []
-        records = []
+    incrs = []
+    frequencies = []
+    records = []
 
-        incrs.append((tsdb.models.project, job["project_id"]))
+    for job in jobs:
         event = job["event"]
         group = job["group"]
         release = job["release"]
         environment = job["environment"]
 
+        options = {"timestamp": event.datetime, "environment_id": environment.id}
+
+        incrs.append((tsdb.models.project, job["project_id"], options))
+
         if group:
-            incrs.append((tsdb.models.group, group.id))
+            incrs.append((tsdb.models.group, group.id, options))
             frequencies.append(
-                (tsdb.models.frequent_environments_by_group, {group.id: {environment.id: 1}})
+                (
+                    tsdb.models.frequent_environments_by_group,
+                    {group.id: {environment.id: 1}},
+                    {"timestamp": event.datetime},
+                )
             )
 
             if release:
@@ -795,29 +805,34 @@ def _tsdb_record_all_metrics(jobs):
                     (
                         tsdb.models.frequent_releases_by_group,
                         {group.id: {job["grouprelease"].id: 1}},
+                        {"timestamp": event.datetime},
                     )
                 )
 
         if release:
-            incrs.append((tsdb.models.release, release.id))
+            incrs.append((tsdb.models.release, release.id, options))
 
         user = job["user"]
 
         if user:
             project_id = job["project_id"]
-            records.append((tsdb.models.users_affected_by_project, project_id, (user.tag_value,)))
+            records.append(
+                (tsdb.models.users_affected_by_project, project_id, (user.tag_value,), options)
+            )
 
             if group:
-                records.append((tsdb.models.users_affected_by_group, group.id, (user.tag_value,)))
+                records.append(
+                    (tsdb.models.users_affected_by_group, group.id, (user.tag_value,), options)
+                )
 
-        if incrs:
-            tsdb.incr_multi(incrs, timestamp=event.datetime, environment_id=environment.id)
+    if incrs:
+        tsdb.incr_multi(incrs)
 
-        if records:
-            tsdb.record_multi(records, timestamp=event.datetime, environment_id=environment.id)
+    if records:
+        tsdb.record_multi(records)
 
-        if frequencies:
-            tsdb.record_frequency_multi(frequencies, timestamp=event.datetime)
+    if frequencies:
+        tsdb.record_frequency_multi(frequencies)
 
 
 @metrics.wraps("save_event.nodestore_save_many")
@@ -988,9 +1003,7 @@ def get_culprit(data):
 def _save_aggregate(event, hashes, release, metadata, received_timestamp, **kwargs):
     project = event.project
 
-    flat_grouphashes = [
-        GroupHash.objects.get_or_create(project=project, hash=hash)[0] for hash in hashes.hashes
-    ]
+    flat_grouphashes = GroupHash.objects.get_or_create_for_hashes(project, hashes.hashes)
 
     # The root_hierarchical_hash is the least specific hash within the tree, so
     # typically hierarchical_hashes[0], unless a hash `n` has been split in
@@ -1003,8 +1016,8 @@ def _save_aggregate(event, hashes, release, metadata, received_timestamp, **kwar
     )
 
     if root_hierarchical_hash is not None:
-        root_hierarchical_grouphash = GroupHash.objects.get_or_create(
-            project=project, hash=root_hierarchical_hash
+        root_hierarchical_grouphash = GroupHash.objects.get_or_create_for_hashes(
+            project, [root_hierarchical_hash]
         )[0]
 
         metadata.update(
@@ -1058,7 +1071,7 @@ def _save_aggregate(event, hashes, release, metadata, received_timestamp, **kwar
             flat_grouphashes = [gh for gh in all_hashes if gh.hash in hashes.hashes]
 
             existing_grouphash, root_hierarchical_hash = _find_existing_grouphash(
-                project, flat_grouphashes, hashes.hierarchical_hashes
+                project, flat_grouphashes, hashes.hierarchical_hashes, use_cache=False
             )
 
             if root_hierarchical_hash is not None:
@@ -1168,6 +1181,7 @@ def _find_existing_grouphash(
     project,
     flat_grouphashes,
     hierarchical_hashes,
+    use_cache=True,
 ):
     all_grouphashes = []
     root_hierarchical_hash = None
@@ -1175,10 +1189,15 @@ def _find_existing_grouphash(
     found_split = False
 
     if hierarchical_hashes:
-        hierarchical_grouphashes = {
-            h.hash: h
-            for h in GroupHash.objects.filter(project=project, hash__in=hierarchical_hashes)
-        }
+        if use_cache:
+            hierarchical_grouphashes = GroupHash.objects.get_for_hashes(
+                project, hierarchical_hashes
+            )
+        else:
+            hierarchical_grouphashes = {
+                h.hash: h
+                for h in GroupHash.objects.filter(project=project, hash__in=hierarchical_hashes)
+            }
 
         for hash in reversed(hierarchical_hashes):
             group_hash = hierarchical_grouphashes.get(hash)
@@ -8,10 +8,13 @@ from parsimonious.grammar import Grammar, NodeVisitor
 
 from sentry import projectoptions
 from sentry.grouping.component import GroupingComponent
+from sentry.utils.datastructures import LRUCache
+from sentry.utils.hashlib import md5_text
 from sentry.utils.strings import unescape_string
 
 from .actions import Action, FlagAction, VarAction
 from .exceptions import InvalidEnhancerConfig
+from .index import get_rule_index
 from .matchers import (
     CalleeMatch,
     CallerMatch,
@@ -70,6 +73,11 @@ _        = space*
 VERSIONS = [1, 2]
 LATEST_VERSION = VERSIONS[-1]
 
+# Process-wide caches of loaded enhancements (keyed by their serialized form)
+# and parsed rules (keyed by the config string).
+_loaded_enhancements_cache = LRUCache(1000)
+_parsed_rules_cache = LRUCache(1000)
+
 
 class StacktraceState:
     def __init__(self):
@@ -115,6 +123,34 @@ class Enhancements:
 
         self._modifier_rules = [rule for rule in self.iter_rules() if rule.is_modifier]
         self._updater_rules = [rule for rule in self.iter_rules() if rule.is_updater]
+        self._rule_indexes = {}
+
+    def _get_config_hash(self):
+        return md5_text(msgpack.dumps(self._to_config_structure())).hexdigest()
+
+    def _get_rule_index(self, kind):
+        index = self._rule_indexes.get(kind)
+        if index is None:
+            rules = self._modifier_rules if kind == "modifier" else self._updater_rules
+            index = self._rule_indexes[kind] = get_rule_index(
+                (self._get_config_hash(), kind), rules
+            )
+        return index
+
+    def _iter_matching_frame_actions(self, kind, match_frames, platform, exception_data, cache):
+        """Yields ``(rule, idx, action)`` for all rules of the given kind
+        (``"modifier"`` or ``"updater"``) in rule order, only evaluating each
+        rule against the candidate frames from the compiled rule index.
+        """
+        rules = self._modifier_rules if kind == "modifier" else self._updater_rules
+        index = self._get_rule_index(kind)
+
+        for pos, frame_indices in index.get_candidate_frames(match_frames):
+            rule = rules[pos]
+            for idx, action in rule.get_matching_frame_actions(
+                match_frames, platform, exception_data, cache, frame_indices=frame_indices
+            ):
+                yield rule, idx, action
 
     def apply_modifications_to_frame(self, frames, platform, exception_data):
         """This applies the frame modifications to the frames itself.  This
@@ -125,11 +161,10 @@ class Enhancements:
 
         match_frames = [create_match_frame(frame, platform) for frame in frames]
 
-        for rule in self._modifier_rules:
-            for idx, action in rule.get_matching_frame_actions(
-                match_frames, platform, exception_data, cache
-            ):
-                action.apply_modifications_to_frame(frames, match_frames, idx, rule=rule)
+        for rule, idx, action in self._iter_matching_frame_actions(
+            "modifier", match_frames, platform, exception_data, cache
+        ):
+            action.apply_modifications_to_frame(frames, match_frames, idx, rule=rule)
 
     def update_frame_components_contributions(self, components, frames, platform, exception_data):
 
@@ -139,13 +174,11 @@ class Enhancements:
 
         stacktrace_state = StacktraceState()
         # Apply direct frame actions and update the stack state alongside
-        for rule in self._updater_rules:
-
-            for idx, action in rule.get_matching_frame_actions(
-                match_frames, platform, exception_data, cache
-            ):
-                action.update_frame_components_contributions(components, frames, idx, rule=rule)
-                action.modify_stacktrace_state(stacktrace_state, rule)
+        for rule, idx, action in self._iter_matching_frame_actions(
+            "updater", match_frames, platform, exception_data, cache
+        ):
+            action.update_frame_components_contributions(components, frames, idx, rule=rule)
+            action.modify_stacktrace_state(stacktrace_state, rule)
 
         # Use the stack state to update frame contributions again to trim
         # down to max-frames.  min-frames is handled on the other hand for
@@ -249,28 +282,46 @@ class Enhancements:
 
     @classmethod
     def loads(cls, data):
+        """Loads enhancements from their serialized form.
+
+        Loaded enhancements are shared through a process-wide cache and must
+        not be modified.
+        """
         if isinstance(data, str):
             data = data.encode("ascii", "ignore")
+
+        rv = _loaded_enhancements_cache.get(data)
+        if rv is not None:
+            return rv
+
         padded = data + b"=" * (4 - (len(data) % 4))
         try:
-            return cls._from_config_structure(
+            rv = cls._from_config_structure(
                 msgpack.loads(zlib.decompress(base64.urlsafe_b64decode(padded)), raw=False)
             )
         except (LookupError, AttributeError, TypeError, ValueError) as e:
             raise ValueError("invalid stack trace rule config: %s" % e)
 
+        _loaded_enhancements_cache.set(data, rv)
+        return rv
+
     @classmethod
     def from_config_string(self, s, bases=None, id=None):
-        try:
-            tree = enhancements_grammar.parse(s)
-        except ParseError as e:
-            context = e.text[e.pos : e.pos + 33]
-            if len(context) == 33:
-                context = context[:-1] + "..."
-            raise InvalidEnhancerConfig(
-                f'Invalid syntax near "{context}" (line {e.line()}, column {e.column()})'
-            )
-        return EnhancmentsVisitor(bases, id).visit(tree)
+        rules = _parsed_rules_cache.get(s)
+        if rules is None:
+            try:
+                tree = enhancements_grammar.parse(s)
+            except ParseError as e:
+                context = e.text[e.pos : e.pos + 33]
+                if len(context) == 33:
+                    context = context[:-1] + "..."
+                raise InvalidEnhancerConfig(
+                    f'Invalid syntax near "{context}" (line {e.line()}, column {e.column()})'
+                )
+            rules = EnhancmentsVisitor(bases, id).visit(tree).rules
+            _parsed_rules_cache.set(s, rules)
+
+        return Enhancements(list(rules), bases=bases, id=id)
 
 
 class Rule:
@@ -312,9 +363,14 @@ class Rule:
             matchers[matcher.key] = matcher.pattern
         return {"match": matchers, "actions": [str(x) for x in self.actions]}
 
-    def get_matching_frame_actions(self, frames, platform, exception_data=None, cache=None):
+    def get_matching_frame_actions(
+        self, frames, platform, exception_data=None, cache=None, frame_indices=None
+    ):
         """Given a frame returns all the matching actions based on this rule.
         If the rule does not match `None` is returned.
+
+        If `frame_indices` is given, only the frames at these (ascending)
+        indices are considered.
         """
         if not self.matchers:
             return []
@@ -327,7 +383,9 @@ class Rule:
         rv = []
 
         # 2 - Check if frame matchers match
-        for idx, frame in enumerate(frames):
+        if frame_indices is None:
+            frame_indices = range(len(frames))
+        for idx in frame_indices:
             if all(
                 m.matches_frame(frames, idx, platform, exception_data, cache)
                 for m in self._other_matchers
@@ -460,3 +518,15 @@ def _load_configs():
 
 ENHANCEMENT_BASES = _load_configs()
 del _load_configs
+
+
+def warm_up_enhancements():
+    """Loads the enhancements for all built-in bases (without custom rules)
+    into the process-wide cache and compiles their rule indexes.  This is
+    called when a worker process starts so that the first events don't pay
+    for it.
+    """
+    for base_id in ENHANCEMENT_BASES:
+        enhancements = Enhancements.loads(Enhancements([], bases=[base_id]).dumps())
+        enhancements._get_rule_index("modifier")
+        enhancements._get_rule_index("updater")
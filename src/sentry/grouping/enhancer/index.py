@@ -0,0 +1,113 @@
+from collections import defaultdict
+
+from sentry.utils.datastructures import LRUCache
+
+from .matchers import FamilyMatch, FunctionMatch, ModuleMatch
+
+# Characters that end the literal prefix of a glob pattern.
+_GLOB_SPECIAL_CHARS = frozenset(b"*?[]{}\\")
+
+# Frame fields that are matched with a case sensitive glob and never modified
+# by actions, so a literal prefix can be looked up before any rule is applied.
+_PREFIX_MATCHERS = {FunctionMatch: "function", ModuleMatch: "module"}
+
+_index_cache = LRUCache(500)
+
+
+def _get_literal_prefix(pattern):
+    for idx, char in enumerate(pattern):
+        if char in _GLOB_SPECIAL_CHARS:
+            return pattern[:idx]
+    return pattern
+
+
+class RuleIndex:
+    """A decision index over a list of enhancement rules.
+
+    Each rule is assigned at most one "anchor": a condition on a frame field
+    which never changes during enhancement (family, function or module) and
+    which is necessary for the rule to match.  For a stacktrace the index
+    then returns, per rule, only the frames that satisfy the anchor, so that
+    the full set of matchers is evaluated for candidate frames only.
+
+    The index stores rule positions rather than rules so that it can be
+    shared between ``Enhancements`` objects with the same configuration.
+    """
+
+    def __init__(self, rules):
+        self.rule_count = len(rules)
+        # Rules without an anchor, evaluated against all frames
+        self.unindexed = []
+        # family -> rule positions
+        self.by_family = defaultdict(list)
+        # field -> prefix length -> prefix -> rule positions
+        self.by_prefix = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+
+        for pos, rule in enumerate(rules):
+            self._add_rule(pos, rule)
+
+        # Freeze into plain dicts for faster lookups
+        self.by_family = dict(self.by_family)
+        self.by_prefix = {
+            field: {length: dict(prefixes) for length, prefixes in by_length.items()}
+            for field, by_length in self.by_prefix.items()
+        }
+
+    def _add_rule(self, pos, rule):
+        best_prefix = None
+        families = None
+
+        for matcher in rule._other_matchers:
+            if getattr(matcher, "negated", True):
+                continue
+            field = _PREFIX_MATCHERS.get(type(matcher))
+            if field is not None:
+                prefix = _get_literal_prefix(matcher._encoded_pattern)
+                if prefix and (best_prefix is None or len(prefix) > len(best_prefix[1])):
+                    best_prefix = (field, prefix)
+            elif isinstance(matcher, FamilyMatch) and b"all" not in matcher._flags:
+                families = matcher._flags
+
+        if best_prefix is not None:
+            field, prefix = best_prefix
+            self.by_prefix[field][len(prefix)][prefix].append(pos)
+        elif families is not None:
+            for family in families:
+                self.by_family[family].append(pos)
+        else:
+            self.unindexed.append(pos)
+
+    def get_candidate_frames(self, match_frames):
+        """Returns a sorted list of ``(rule_position, frame_indices)`` where
+        ``frame_indices`` is either a list of candidate frame indices or `None`
+        if the rule has to be evaluated against all frames.
+        """
+        rv = defaultdict(list)
+
+        for idx, match_frame in enumerate(match_frames):
+            for pos in self.by_family.get(match_frame["family"], ()):
+                rv[pos].append(idx)
+
+            for field, by_length in self.by_prefix.items():
+                value = match_frame[field]
+                if value is None:
+                    continue
+                for length, prefixes in by_length.items():
+                    for pos in prefixes.get(value[:length], ()):
+                        rv[pos].append(idx)
+
+        for pos in self.unindexed:
+            rv[pos] = None
+
+        return sorted(rv.items())
+
+
+def get_rule_index(cache_key, rules):
+    """Returns the ``RuleIndex`` for ``rules``, shared between all rule lists
+    with the same ``cache_key``.
+    """
+    index = _index_cache.get(cache_key)
+    if index is None:
+        index = RuleIndex(rules)
+        _index_cache.set(cache_key, index)
+    return index
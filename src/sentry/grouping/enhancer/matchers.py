@@ -4,7 +4,7 @@ from sentry.grouping.utils import get_rule_bool
 from sentry.stacktraces.functions import get_function_name_for_frame
 from sentry.stacktraces.platform import get_behavior_family_for_platform
 from sentry.utils.functional import cached
-from sentry.utils.glob import glob_match
+from sentry.utils.glob import glob_match, glob_match_many
 from sentry.utils.safe import get_path
 
 from .exceptions import InvalidEnhancerConfig
@@ -196,16 +196,54 @@ def path_like_match(pattern, value):
     return False
 
 
-class PathLikeMatch(FrameMatch):
-    def __init__(self, key, pattern, negated=False):
-        super().__init__(key, pattern.lower(), negated)
+def path_like_match_many(pattern, values):
+    """Batch version of ``path_like_match``, `None` values never match."""
+    rv = glob_match_many(values, pattern, doublestar=True, path_normalize=True)
+    retry = [
+        idx
+        for idx, (value, matches) in enumerate(zip(values, rv))
+        if not matches and value is not None and not value.startswith(b"/")
+    ]
+    if retry:
+        retried = glob_match_many(
+            [b"/" + values[idx] for idx in retry], pattern, doublestar=True, path_normalize=True
+        )
+        for idx, matches in zip(retry, retried):
+            rv[idx] = matches
+    return rv
+
+
+class ColumnMatch(FrameMatch):
+    """Matches a frame field that is never modified by enhancement actions.
+    The pattern is matched against the field of all frames of a stacktrace in
+    one go and the result is kept in the per-stacktrace ``cache``.
+    """
+
+    field = None
+
+    def matches_frame(self, frames, idx, platform, exception_data, cache):
+        key = (self, id(frames))
+        column = cache.get(key)
+        if column is None:
+            column = cache[key] = self._match_column([frame[self.field] for frame in frames])
+        rv = column[idx]
+        if self.negated:
+            rv = not rv
+        return rv
+
+    def _match_column(self, values):
+        raise NotImplementedError
 
     def _positive_frame_match(self, match_frame, platform, exception_data, cache):
-        value = match_frame[self.field]
-        if value is None:
-            return False
+        return self._match_column([match_frame[self.field]])[0]
+
 
-        return cached(cache, path_like_match, self._encoded_pattern, value)
+class PathLikeMatch(ColumnMatch):
+    def __init__(self, key, pattern, negated=False):
+        super().__init__(key, pattern.lower(), negated)
+
+    def _match_column(self, values):
+        return path_like_match_many(self._encoded_pattern, values)
 
 
 class PackageMatch(PathLikeMatch):
@@ -240,10 +278,12 @@ class InAppMatch(FrameMatch):
         return ref_val is not None and ref_val == match_frame["in_app"]
 
 
-class FunctionMatch(FrameMatch):
-    def _positive_frame_match(self, match_frame, platform, exception_data, cache):
+class FunctionMatch(ColumnMatch):
+
+    field = "function"
 
-        return cached(cache, glob_match, match_frame["function"], self._encoded_pattern)
+    def _match_column(self, values):
+        return glob_match_many(values, self._encoded_pattern)
 
 
 class FrameFieldMatch(FrameMatch):
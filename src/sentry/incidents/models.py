@@ -336,6 +336,44 @@ class AlertRuleManager(BaseManager):
 
         return alert_rule
 
+    def get_for_subscriptions(self, subscriptions):
+        """
+        Fetches the AlertRules associated with many Subscriptions, as a dict keyed by
+        subscription id. Subscriptions without an AlertRule are omitted. Attempts to
+        fetch from cache then hits the database once for all misses
+        """
+        cache_keys = {
+            subscription.id: self.__build_subscription_cache_key(subscription.id)
+            for subscription in subscriptions
+        }
+        cached = cache.get_many(list(cache_keys.values()))
+
+        alert_rules = {}
+        missing = []
+        for subscription in subscriptions:
+            alert_rule = cached.get(cache_keys[subscription.id])
+            if alert_rule is None:
+                missing.append(subscription)
+            else:
+                alert_rules[subscription.id] = alert_rule
+
+        if missing:
+            fetched = {
+                alert_rule.snuba_query_id: alert_rule
+                for alert_rule in AlertRule.objects.filter(
+                    snuba_query_id__in={subscription.snuba_query_id for subscription in missing}
+                )
+            }
+            to_cache = {}
+            for subscription in missing:
+                alert_rule = fetched.get(subscription.snuba_query_id)
+                if alert_rule is not None:
+                    alert_rules[subscription.id] = alert_rule
+                    to_cache[cache_keys[subscription.id]] = alert_rule
+            cache.set_many(to_cache, 3600)
+
+        return alert_rules
+
     @classmethod
     def clear_subscription_cache(cls, instance, **kwargs):
         cache.delete(cls.__build_subscription_cache_key(instance.id))
@@ -486,6 +524,38 @@ class AlertRuleTriggerManager(BaseManager):
             cache.set(cache_key, triggers, 3600)
         return triggers
 
+    def get_for_alert_rules(self, alert_rules):
+        """
+        Fetches the AlertRuleTriggers associated with many AlertRules, as a dict keyed by
+        alert rule id. Attempts to fetch from cache then hits the database once for all
+        misses
+        """
+        cache_keys = {
+            alert_rule.id: self._build_trigger_cache_key(alert_rule.id)
+            for alert_rule in alert_rules
+        }
+        cached = cache.get_many(list(cache_keys.values()))
+
+        triggers = {}
+        missing = set()
+        for alert_rule_id, cache_key in cache_keys.items():
+            if cached.get(cache_key) is None:
+                missing.add(alert_rule_id)
+            else:
+                triggers[alert_rule_id] = cached[cache_key]
+
+        if missing:
+            for alert_rule_id in missing:
+                triggers[alert_rule_id] = []
+            for trigger in AlertRuleTrigger.objects.filter(alert_rule_id__in=missing):
+                triggers[trigger.alert_rule_id].append(trigger)
+            cache.set_many(
+                {cache_keys[alert_rule_id]: triggers[alert_rule_id] for alert_rule_id in missing},
+                3600,
+            )
+
+        return triggers
+
     @classmethod
     def clear_trigger_cache(cls, instance, **kwargs):
         cache.delete(cls._build_trigger_cache_key(instance.alert_rule_id))
@@ -66,21 +66,30 @@ class SubscriptionProcessor:
         AlertRuleThresholdType.BELOW: (operator.lt, operator.gt),
     }
 
-    def __init__(self, subscription):
+    def __init__(self, subscription, alert_rule=None, triggers=None, stats=None):
+        """
+        The alert rule, its triggers and the alert rule stats are fetched for the
+        subscription, unless they are passed in (see `process_updates`).
+        """
         self.subscription = subscription
-        try:
-            self.alert_rule = AlertRule.objects.get_for_subscription(subscription)
-        except AlertRule.DoesNotExist:
-            return
-
-        self.triggers = AlertRuleTrigger.objects.get_for_alert_rule(self.alert_rule)
-        self.triggers.sort(key=lambda trigger: trigger.alert_threshold)
-
+        if alert_rule is None:
+            try:
+                alert_rule = AlertRule.objects.get_for_subscription(subscription)
+            except AlertRule.DoesNotExist:
+                return
+        self.alert_rule = alert_rule
+
+        if triggers is None:
+            triggers = AlertRuleTrigger.objects.get_for_alert_rule(self.alert_rule)
+        self.triggers = sorted(triggers, key=lambda trigger: trigger.alert_threshold)
+
+        if stats is None:
+            stats = get_alert_rule_stats(self.alert_rule, self.subscription, self.triggers)
         (
             self.last_update,
             self.trigger_alert_counts,
             self.trigger_resolve_counts,
-        ) = get_alert_rule_stats(self.alert_rule, self.subscription, self.triggers)
+        ) = stats
         self.orig_trigger_alert_counts = deepcopy(self.trigger_alert_counts)
         self.orig_trigger_resolve_counts = deepcopy(self.trigger_resolve_counts)
 
@@ -281,7 +290,11 @@ class SubscriptionProcessor:
                 )
         return aggregation_value
 
-    def process_update(self, subscription_update):
+    def process_update(self, subscription_update, pipeline=None):
+        """
+        Processes a single subscription update. If a Redis ``pipeline`` is passed, the
+        updated alert rule stats are added to it rather than written immediately.
+        """
         dataset = self.subscription.snuba_query.dataset
         try:
             # Check that the project exists
@@ -386,7 +399,7 @@ class SubscriptionProcessor:
         # is killed here. The trade-off is that we might process an update twice. Mostly
         # this will have no effect, but if someone manages to close a triggered incident
         # before the next one then we might alert twice.
-        self.update_alert_rule_stats()
+        self.update_alert_rule_stats(pipeline)
 
     def calculate_event_date_from_update_date(self, update_date):
         """
@@ -534,7 +547,7 @@ class SubscriptionProcessor:
                     status_method=IncidentStatusMethod.RULE_TRIGGERED,
                 )
 
-    def update_alert_rule_stats(self):
+    def update_alert_rule_stats(self, pipeline=None):
         """
         Updates stats about the alert rule, if they're changed.
         :return:
@@ -556,7 +569,53 @@ class SubscriptionProcessor:
             self.last_update,
             updated_trigger_alert_counts,
             updated_trigger_resolve_counts,
+            pipeline=pipeline,
         )
+        # Later updates processed by this instance only need to write what they change.
+        self.orig_trigger_alert_counts = deepcopy(self.trigger_alert_counts)
+        self.orig_trigger_resolve_counts = deepcopy(self.trigger_resolve_counts)
+
+
+def process_updates(subscription_updates):
+    """
+    Processes many ``(subscription_update, subscription)`` pairs, in order. The alert
+    rules, triggers and alert rule stats of all subscriptions are fetched up front, and
+    the updated stats are written back in a single pipeline once all updates have been
+    processed. The stats are also written if processing an update fails, so that the
+    updates processed before it are skipped when the batch is retried.
+    """
+    subscriptions = {}
+    for _, subscription in subscription_updates:
+        subscriptions.setdefault(subscription.id, subscription)
+
+    alert_rules = AlertRule.objects.get_for_subscriptions(list(subscriptions.values()))
+    triggers = AlertRuleTrigger.objects.get_for_alert_rules(list(alert_rules.values()))
+    stats = get_alert_rule_stats_many(
+        [
+            (alert_rule, subscriptions[subscription_id], triggers[alert_rule.id])
+            for subscription_id, alert_rule in alert_rules.items()
+        ]
+    )
+
+    processors = {}
+    for (subscription_id, alert_rule), subscription_stats in zip(alert_rules.items(), stats):
+        processors[subscription_id] = SubscriptionProcessor(
+            subscriptions[subscription_id],
+            alert_rule=alert_rule,
+            triggers=triggers[alert_rule.id],
+            stats=subscription_stats,
+        )
+
+    pipeline = get_redis_client().pipeline()
+    try:
+        for subscription_update, subscription in subscription_updates:
+            processor = processors.get(subscription.id)
+            if processor is None:
+                # The alert rule has likely been removed, let the processor handle that.
+                processor = SubscriptionProcessor(subscription)
+            processor.process_update(subscription_update, pipeline=pipeline)
+    finally:
+        pipeline.execute()
 
 
 def build_alert_rule_stat_keys(alert_rule, subscription):
@@ -613,6 +672,33 @@ def get_alert_rule_stats(alert_rule, subscription, triggers):
     alert_rule_keys = build_alert_rule_stat_keys(alert_rule, subscription)
     trigger_keys = build_trigger_stat_keys(alert_rule, subscription, triggers)
     results = get_redis_client().mget(alert_rule_keys + trigger_keys)
+    return _parse_alert_rule_stats(triggers, results)
+
+
+def get_alert_rule_stats_many(items):
+    """
+    Fetches the stats of many ``(alert_rule, subscription, triggers)`` tuples in one
+    round trip. The keys of each tuple share a hash tag, so each of them is read with
+    its own MGET in a pipeline.
+    :return: A list of tuples in the format returned by `get_alert_rule_stats`
+    """
+    if not items:
+        return []
+
+    pipeline = get_redis_client().pipeline()
+    for alert_rule, subscription, triggers in items:
+        pipeline.mget(
+            build_alert_rule_stat_keys(alert_rule, subscription)
+            + build_trigger_stat_keys(alert_rule, subscription, triggers)
+        )
+
+    return [
+        _parse_alert_rule_stats(triggers, results)
+        for (_, _, triggers), results in zip(items, pipeline.execute())
+    ]
+
+
+def _parse_alert_rule_stats(triggers, results):
     results = tuple(0 if result is None else int(result) for result in results)
     last_update = to_datetime(results[0])
     trigger_results = results[1:]
@@ -627,11 +713,17 @@ def get_alert_rule_stats(alert_rule, subscription, triggers):
     return last_update, trigger_alert_counts, trigger_resolve_counts
 
 
-def update_alert_rule_stats(alert_rule, subscription, last_update, alert_counts, resolve_counts):
+def update_alert_rule_stats(
+    alert_rule, subscription, last_update, alert_counts, resolve_counts, pipeline=None
+):
     """
     Updates stats about the alert rule, subscription and triggers if they've changed.
+    If a ``pipeline`` is passed, the updates are only added to it and the caller is
+    responsible for executing it.
     """
-    pipeline = get_redis_client().pipeline()
+    execute = pipeline is None
+    if execute:
+        pipeline = get_redis_client().pipeline()
 
     counts_with_stat_keys = zip(ALERT_RULE_TRIGGER_STAT_KEYS, (alert_counts, resolve_counts))
     for stat_key, trigger_counts in counts_with_stat_keys:
@@ -646,7 +738,8 @@ def update_alert_rule_stats(alert_rule, subscription, last_update, alert_counts,
 
     last_update_key = build_alert_rule_stat_keys(alert_rule, subscription)[0]
     pipeline.set(last_update_key, int(to_timestamp(last_update)), ex=REDIS_TTL)
-    pipeline.execute()
+    if execute:
+        pipeline.execute()
 
 
 def get_redis_client():
@@ -1,8 +1,10 @@
 import functools
 import logging
 import random
+import threading
 import time
-from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait
 from typing import (
     Any,
     Callable,
@@ -17,15 +19,16 @@ from typing import (
     Union,
 )
 
-import msgpack
 import sentry_sdk
 from django.conf import settings
 from django.core.cache import cache
+from django.db import close_old_connections
 
 from sentry import eventstore, features
 from sentry.attachments import CachedAttachment, attachment_cache
 from sentry.event_manager import save_attachment
 from sentry.eventstore.processing import event_processing_store
+from sentry.ingest.message import LazyMessage
 from sentry.ingest.types import ConsumerType
 from sentry.ingest.userreport import Conflict, save_userreport
 from sentry.killswitches import killswitch_matches_context
@@ -44,6 +47,13 @@ logger = logging.getLogger(__name__)
 
 CACHE_TIMEOUT = 3600
 
+# Message types that get their own bounded thread pool when batches are
+# flushed as a pipeline (see ``IngestConsumerWorker``).
+PIPELINE_STAGES = ("attachment_chunk", "attachment", "user_report", "event")
+
+# The last batch a pipeline thread has processed a message of.
+_pipeline_thread_state = threading.local()
+
 
 T = TypeVar("T")
 
@@ -57,7 +67,25 @@ Message = Any
 
 
 class IngestConsumerWorker(AbstractBatchWorker):
-    def __init__(self, process_event_executor: Optional[ThreadPoolExecutor] = None) -> None:
+    """
+    Flushes batches of ingest messages.
+
+    By default attachment chunks are processed on the main thread before all
+    other messages, and only storing events may be offloaded to
+    ``process_event_executor``.
+
+    If ``pipeline_concurrency`` maps every message type in ``PIPELINE_STAGES``
+    to a pool size, each message type is instead processed by its own bounded
+    thread pool. The only ordering that is kept within a batch is that events
+    and individual attachments wait for the attachment chunks of their own
+    event, so large uploads do not hold up unrelated messages.
+    """
+
+    def __init__(
+        self,
+        process_event_executor: Optional[ThreadPoolExecutor] = None,
+        pipeline_concurrency: Optional[Mapping[str, int]] = None,
+    ) -> None:
         self.__process_event_executor = process_event_executor
         if self.__process_event_executor is None:
             self.__process_event = process_event
@@ -66,9 +94,18 @@ class IngestConsumerWorker(AbstractBatchWorker):
                 process_event_async, self.__process_event_executor
             )
 
+        self.__pipeline_executors: Mapping[str, ThreadPoolExecutor] = {}
+        if pipeline_concurrency is not None:
+            self.__pipeline_executors = {
+                stage: ThreadPoolExecutor(
+                    pipeline_concurrency[stage], thread_name_prefix=f"ingest-consumer-{stage}"
+                )
+                for stage in PIPELINE_STAGES
+            }
+
     def process_message(self, message) -> Message:
-        message = msgpack.unpackb(message.value(), use_list=False)
-        return message
+        # Payloads are only decoded once a message has passed filtering.
+        return LazyMessage(message.value())
 
     def flush_batch(self, batch):
         mark_scope_as_unsafe()
@@ -76,8 +113,15 @@ class IngestConsumerWorker(AbstractBatchWorker):
             return self._flush_batch(batch)
 
     def _flush_batch(self, batch: Sequence[Message]):
+        if self.__pipeline_executors:
+            return self._flush_batch_pipelined(batch)
+
         attachment_chunks = []
 
+        # Without an executor, events are processed in one batch so that
+        # backend operations can be shared between them.
+        events = []
+
         # Processing functions may be either synchronous or asynchronous.
         # Functions that return an ``AsyncResult`` may perform a combination of
         # synchronous and asynchronous work, and need to be explicitly waited on
@@ -102,7 +146,10 @@ class IngestConsumerWorker(AbstractBatchWorker):
                 projects_to_fetch.add(message["project_id"])
 
                 if message_type == "event":
-                    other_messages.append((self.__process_event, message))
+                    if self.__process_event_executor is None:
+                        events.append(message)
+                    else:
+                        other_messages.append((self.__process_event, message))
                 elif message_type == "attachment_chunk":
                     attachment_chunks.append(message)
                 elif message_type == "attachment":
@@ -121,8 +168,11 @@ class IngestConsumerWorker(AbstractBatchWorker):
         if attachment_chunks:
             # attachment_chunk messages need to be processed before attachment/event messages.
             with metrics.timer("ingest_consumer.process_attachment_chunk_batch"):
-                for attachment_chunk in attachment_chunks:
-                    process_attachment_chunk(attachment_chunk, projects=projects)
+                process_attachment_chunks(attachment_chunks, projects=projects)
+
+        if events:
+            with metrics.timer("ingest_consumer.process_events_batch"):
+                process_events(events, projects=projects)
 
         if other_messages:
             with metrics.timer("ingest_consumer.process_other_messages_batch"):
@@ -148,9 +198,106 @@ class IngestConsumerWorker(AbstractBatchWorker):
                     (time.monotonic() - other_messages_flush_start) / len(other_messages),
                 )
 
+    def _flush_batch_pipelined(self, batch: Sequence[Message]):
+        projects_to_fetch = set()
+
+        with metrics.timer("ingest_consumer.prepare_messages"):
+            for message in batch:
+                message_type = message["type"]
+                if message_type not in PIPELINE_STAGES:
+                    raise ValueError(f"Unknown message type: {message_type}")
+                projects_to_fetch.add(message["project_id"])
+                metrics.incr(
+                    "ingest_consumer.flush.messages_seen", tags={"message_type": message_type}
+                )
+
+        with metrics.timer("ingest_consumer.fetch_projects"):
+            projects = {p.id: p for p in Project.objects.get_many_from_cache(projects_to_fetch)}
+
+        processing_funcs = {
+            "attachment_chunk": process_attachment_chunk,
+            "attachment": process_individual_attachment,
+            "user_report": process_userreport,
+            "event": process_event,
+        }
+
+        with metrics.timer("ingest_consumer.process_pipelined_batch"):
+            flush_start = time.monotonic()
+            futures = []
+            batch_token = object()
+
+            # Submit all chunks first, so that events and attachments can be
+            # made to wait for the chunks of their own event only.
+            chunk_futures: MutableMapping[Tuple[int, str], MutableSequence["Future[Any]"]]
+            chunk_futures = defaultdict(list)
+            for message in batch:
+                if message["type"] == "attachment_chunk":
+                    future = self.__pipeline_executors["attachment_chunk"].submit(
+                        _run_after, batch_token, (), process_attachment_chunk, message, projects
+                    )
+                    chunk_futures[_get_event_key(message)].append(future)
+                    futures.append(future)
+
+            for message in batch:
+                message_type = message["type"]
+                if message_type == "attachment_chunk":
+                    continue
+
+                dependencies: Sequence["Future[Any]"] = ()
+                if message_type != "user_report":
+                    dependencies = chunk_futures.get(_get_event_key(message), ())
+
+                futures.append(
+                    self.__pipeline_executors[message_type].submit(
+                        _run_after,
+                        batch_token,
+                        dependencies,
+                        processing_funcs[message_type],
+                        message,
+                        projects,
+                    )
+                )
+
+            # Let every task finish before raising the first error, so that no
+            # work of a failed batch is still running once it is retried.
+            wait(futures)
+            for future in futures:
+                future.result()
+
+            if futures:
+                metrics.timing(
+                    "ingest_consumer.process_pipelined_batch.normalized",
+                    (time.monotonic() - flush_start) / len(futures),
+                )
+
     def shutdown(self):
         if self.__process_event_executor is not None:
             self.__process_event_executor.shutdown()
+        for executor in self.__pipeline_executors.values():
+            executor.shutdown()
+
+
+def _get_event_key(message: Message) -> Tuple[int, str]:
+    return int(message["project_id"]), message["event_id"]
+
+
+def _run_after(
+    batch_token: object,
+    dependencies: Sequence["Future[Any]"],
+    func: Callable[[Message, Mapping[int, Project]], Any],
+    message: Message,
+    projects: Mapping[int, Project],
+) -> Any:
+    # Pipeline threads outlive a batch. Recycle their database connections
+    # once per batch, so that a stale or broken connection is not kept.
+    if getattr(_pipeline_thread_state, "batch_token", None) is not batch_token:
+        _pipeline_thread_state.batch_token = batch_token
+        close_old_connections()
+
+    for dependency in dependencies:
+        # Re-raises if a chunk this message depends on failed to be stored.
+        dependency.result()
+    return func(message, projects)
 
 
 def trace_func(**span_kwargs):
@@ -178,6 +325,20 @@ def _do_process_event(message: Message, projects: Mapping[int, Project]) -> None
     callback(_store_event(data))
 
 
+class LoadedEvent(NamedTuple):
+    data: Any
+    project: Project
+    event_id: str
+    start_time: float
+    remote_addr: Optional[str]
+    attachments: Sequence[Any]
+    deduplication_key: str
+
+
+def _get_deduplication_key(message: Message) -> str:
+    return f"ev:{int(message['project_id'])}:{message['event_id']}"
+
+
 def _load_event(
     message: Message, projects: Mapping[int, Project]
 ) -> Optional[Tuple[Any, Callable[[str], None]]]:
@@ -188,19 +349,6 @@ def _load_event(
     processing after the event has been persisted and is available to be read by
     other processing components.
     """
-    payload = message["payload"]
-    start_time = float(message["start_time"])
-    event_id = message["event_id"]
-    project_id = int(message["project_id"])
-    remote_addr = message.get("remote_addr")
-    attachments = message.get("attachments") or ()
-
-    sentry_sdk.set_extra("event_id", event_id)
-    sentry_sdk.set_extra("len_attachments", len(attachments))
-
-    if project_id == settings.SENTRY_PROJECT:
-        metrics.incr("internal.captured.ingest_consumer.unparsed")
-
     # check that we haven't already processed this event (a previous instance of the forwarder
     # died before it could commit the event queue offset)
     #
@@ -215,14 +363,38 @@ def _load_event(
     # This code has been ripped from the old python store endpoint. We're
     # keeping it around because it does provide some protection against
     # reprocessing good events if a single consumer is in a restart loop.
-    deduplication_key = f"ev:{project_id}:{event_id}"
-    if cache.get(deduplication_key) is not None:
+    is_duplicate = cache.get(_get_deduplication_key(message)) is not None
+
+    event = _parse_event(message, projects, is_duplicate)
+    if event is None:
+        return None
+
+    return event.data, functools.partial(_dispatch_event, event)
+
+
+def _parse_event(
+    message: Message, projects: Mapping[int, Project], is_duplicate: bool
+) -> Optional[LoadedEvent]:
+    payload = message["payload"]
+    start_time = float(message["start_time"])
+    event_id = message["event_id"]
+    project_id = int(message["project_id"])
+    remote_addr = message.get("remote_addr")
+    attachments = message.get("attachments") or ()
+
+    sentry_sdk.set_extra("event_id", event_id)
+    sentry_sdk.set_extra("len_attachments", len(attachments))
+
+    if project_id == settings.SENTRY_PROJECT:
+        metrics.incr("internal.captured.ingest_consumer.unparsed")
+
+    if is_duplicate:
         logger.warning(
             "pre-process-forwarder detected a duplicated event" " with id:%s for project:%s.",
             event_id,
             project_id,
         )
-        return  # message already processed do not reprocess
+        return None  # message already processed do not reprocess
 
     if killswitch_matches_context(
         "store.load-shed-pipeline-projects",
@@ -234,20 +406,20 @@ def _load_event(
     ):
         # This killswitch is for the worst of scenarios and should probably not
         # cause additional load on our logging infrastructure
-        return
+        return None
 
     try:
         project = projects[project_id]
     except KeyError:
         logger.error("Project for ingested event does not exist: %s", project_id)
-        return
+        return None
 
     # Parse the JSON payload. This is required to compute the cache key and
     # call process_event. The payload will be put into Kafka raw, to avoid
     # serializing it again.
     # XXX: Do not use CanonicalKeyDict here. This may break preprocess_event
     # which assumes that data passed in is a raw dictionary.
-    data = json.loads(payload)
+    data = _load_payload(payload)
 
     if project_id == settings.SENTRY_PROJECT:
         metrics.incr(
@@ -265,39 +437,114 @@ def _load_event(
             "event_id": event_id,
         },
     ):
-        return
+        return None
 
-    def dispatch_task(cache_key: str) -> None:
-        if attachments:
-            with sentry_sdk.start_span(op="ingest_consumer.set_attachment_cache"):
-                attachment_objects = [
-                    CachedAttachment(type=attachment.pop("attachment_type"), **attachment)
-                    for attachment in attachments
-                ]
+    return LoadedEvent(
+        data=data,
+        project=project,
+        event_id=event_id,
+        start_time=start_time,
+        remote_addr=remote_addr,
+        attachments=attachments,
+        deduplication_key=_get_deduplication_key(message),
+    )
 
-                attachment_cache.set(
-                    cache_key, attachments=attachment_objects, timeout=CACHE_TIMEOUT
-                )
 
-        # Preprocess this event, which spawns either process_event or
-        # save_event. Pass data explicitly to avoid fetching it again from the
-        # cache.
-        with sentry_sdk.start_span(op="ingest_consumer.process_event.preprocess_event"):
-            preprocess_event(
-                cache_key=cache_key,
-                data=data,
-                start_time=start_time,
-                event_id=event_id,
-                project=project,
+def _get_attachment_objects(event: LoadedEvent) -> Sequence[CachedAttachment]:
+    return [
+        CachedAttachment(type=attachment.pop("attachment_type"), **attachment)
+        for attachment in event.attachments
+    ]
+
+
+def _dispatch_event(event: LoadedEvent, cache_key: str) -> None:
+    if event.attachments:
+        with sentry_sdk.start_span(op="ingest_consumer.set_attachment_cache"):
+            attachment_cache.set(
+                cache_key, attachments=_get_attachment_objects(event), timeout=CACHE_TIMEOUT
             )
 
-        # remember for an 1 hour that we saved this event (deduplication protection)
-        cache.set(deduplication_key, "", CACHE_TIMEOUT)
+    _preprocess_event(event, cache_key)
+
+    # remember for an 1 hour that we saved this event (deduplication protection)
+    cache.set(event.deduplication_key, "", CACHE_TIMEOUT)
+
+    # emit event_accepted once everything is done
+    _send_event_accepted(event)
+
+
+def _preprocess_event(event: LoadedEvent, cache_key: str) -> None:
+    # Preprocess this event, which spawns either process_event or
+    # save_event. Pass data explicitly to avoid fetching it again from the
+    # cache.
+    with sentry_sdk.start_span(op="ingest_consumer.process_event.preprocess_event"):
+        preprocess_event(
+            cache_key=cache_key,
+            data=event.data,
+            start_time=event.start_time,
+            event_id=event.event_id,
+            project=event.project,
+        )
+
+
+def _send_event_accepted(event: LoadedEvent) -> None:
+    event_accepted.send_robust(
+        ip=event.remote_addr, data=event.data, project=event.project, sender=process_event
+    )
 
-        # emit event_accepted once everything is done
-        event_accepted.send_robust(ip=remote_addr, data=data, project=project, sender=process_event)
 
-    return data, dispatch_task
+@trace_func(name="ingest_consumer.process_events")
+@metrics.wraps("ingest_consumer.process_events")
+def process_events(messages: Sequence[Message], projects: Mapping[int, Project]) -> None:
+    """
+    Processes a batch of event messages like ``process_event``, but performs
+    the deduplication checks, processing store writes and attachment cache
+    writes of all events with one batched call to each backend.
+    """
+    deduplication_keys = [_get_deduplication_key(message) for message in messages]
+    with sentry_sdk.start_span(op="ingest_consumer.process_events.deduplicate"):
+        duplicates = set(cache.get_many(deduplication_keys))
+
+    events = []
+    for message, deduplication_key in zip(messages, deduplication_keys):
+        event = _parse_event(message, projects, deduplication_key in duplicates)
+        if event is not None:
+            events.append(event)
+        # Events are processed only once even if they appear repeatedly
+        # within a batch.
+        duplicates.add(deduplication_key)
+
+    if not events:
+        return
+
+    cache_keys = event_processing_store.store_many([event.data for event in events])
+
+    attachments = [
+        (cache_key, _get_attachment_objects(event))
+        for event, cache_key in zip(events, cache_keys)
+        if event.attachments
+    ]
+    if attachments:
+        with sentry_sdk.start_span(op="ingest_consumer.set_attachment_cache"):
+            attachment_cache.set_many(attachments, timeout=CACHE_TIMEOUT)
+
+    for event, cache_key in zip(events, cache_keys):
+        _preprocess_event(event, cache_key)
+
+    # remember for an 1 hour that we saved these events (deduplication protection)
+    cache.set_many({event.deduplication_key: "" for event in events}, CACHE_TIMEOUT)
+
+    # emit event_accepted once everything is done
+    for event in events:
+        _send_event_accepted(event)
+
+
+def _load_payload(payload: Union[str, bytes, memoryview]) -> Any:
+    # ``LazyMessage`` hands out payloads as memoryview, which the JSON
+    # decoder does not accept.
+    if isinstance(payload, memoryview):
+        payload = str(payload, "utf-8")
+    return json.loads(payload)
 
 
 def _store_event(data) -> str:
@@ -337,6 +584,29 @@ def process_attachment_chunk(message, projects):
     )
 
 
+@trace_func(name="ingest_consumer.process_attachment_chunks")
+@metrics.wraps("ingest_consumer.process_attachment_chunks")
+def process_attachment_chunks(messages, projects):
+    """
+    Stores the attachment chunks of multiple messages with a single batched
+    call to the attachment cache.
+    """
+    attachment_cache.set_chunks(
+        [
+            (
+                cache_key_for_event(
+                    {"event_id": message["event_id"], "project": message["project_id"]}
+                ),
+                message["id"],
+                message["chunk_index"],
+                message["payload"],
+            )
+            for message in messages
+        ],
+        timeout=CACHE_TIMEOUT,
+    )
+
+
 @trace_func(name="ingest_consumer.process_individual_attachment")
 @metrics.wraps("ingest_consumer.process_individual_attachment")
 def process_individual_attachment(message, projects) -> None:
@@ -389,7 +659,7 @@ def process_individual_attachment(message, projects) -> None:
 def process_userreport(message, projects) -> None:
     project_id = int(message["project_id"])
     start_time = to_datetime(message["start_time"])
-    feedback = json.loads(message["payload"])
+    feedback = _load_payload(message["payload"])
 
     try:
         project = projects[project_id]
@@ -411,7 +681,11 @@ def process_userreport(message, projects) -> None:
 
 
 def get_ingest_consumer(
-    consumer_types, once=False, executor: Optional[ThreadPoolExecutor] = None, **options
+    consumer_types,
+    once=False,
+    executor: Optional[ThreadPoolExecutor] = None,
+    pipeline_concurrency: Optional[Mapping[str, int]] = None,
+    **options,
 ):
     """
     Handles events coming via a kafka queue.
@@ -420,5 +694,7 @@ def get_ingest_consumer(
     """
     topic_names = {ConsumerType.get_topic_name(consumer_type) for consumer_type in consumer_types}
     return create_batching_kafka_consumer(
-        topic_names=topic_names, worker=IngestConsumerWorker(executor), **options
+        topic_names=topic_names,
+        worker=IngestConsumerWorker(executor, pipeline_concurrency=pipeline_concurrency),
+        **options,
     )
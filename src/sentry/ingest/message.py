@@ -0,0 +1,71 @@
+from typing import Any, Iterator, Mapping, MutableMapping, Tuple
+
+import msgpack
+
+# Fields that are decoded as soon as a message is read, since they are needed
+# to route and filter every message.
+ROUTING_FIELDS = frozenset(["type", "project_id", "event_id"])
+
+# Fields that hold (potentially large) raw data. These are never decoded, but
+# exposed as a ``memoryview`` into the message instead.
+RAW_FIELDS = frozenset(["payload"])
+
+# Size of the header of msgpack ``bin`` and ``str`` values by their first byte.
+_RAW_HEADER_SIZES = {0xC4: 2, 0xC5: 3, 0xC6: 5, 0xD9: 2, 0xDA: 3, 0xDB: 5}
+_RAW_HEADER_SIZES.update((byte, 1) for byte in range(0xA0, 0xC0))
+
+
+class LazyMessage(Mapping[str, Any]):
+    """
+    A read-only view of a msgpack encoded ingest message.
+
+    Only the routing fields are decoded up front. All other fields are decoded
+    on first access (with the same options as
+    ``msgpack.unpackb(value, use_list=False)``) and then kept, so that mutations
+    of decoded containers are visible to later readers of the same field.
+
+    Raw fields are returned as a ``memoryview`` of the original message, which
+    means that payloads of messages that are dropped before being parsed are
+    neither copied nor decoded.
+    """
+
+    def __init__(self, value: bytes) -> None:
+        self.__buffer = memoryview(value)
+        self.__offsets: MutableMapping[str, Tuple[int, int]] = {}
+        self.__values: MutableMapping[str, Any] = {}
+
+        unpacker = msgpack.Unpacker(use_list=False, max_buffer_size=max(len(value), 1))
+        unpacker.feed(value)
+        for _ in range(unpacker.read_map_header()):
+            key = unpacker.unpack()
+            start = unpacker.tell()
+            if key in ROUTING_FIELDS:
+                self.__values[key] = unpacker.unpack()
+            else:
+                unpacker.skip()
+            self.__offsets[key] = (start, unpacker.tell())
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return self.__values[key]
+        except KeyError:
+            pass
+
+        start, end = self.__offsets[key]
+        header_size = _RAW_HEADER_SIZES.get(self.__buffer[start])
+        if key in RAW_FIELDS and header_size is not None:
+            value = self.__buffer[start + header_size : end]
+        else:
+            value = msgpack.unpackb(self.__buffer[start:end], use_list=False)
+
+        self.__values[key] = value
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__offsets)
+
+    def __len__(self) -> int:
+        return len(self.__offsets)
+
+    def __repr__(self) -> str:
+        return f"<LazyMessage type={self.get('type')!r} event_id={self.get('event_id')!r}>"
@@ -5,14 +5,18 @@ import re
 import sys
 import time
 import zlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from io import BytesIO
 from os.path import splitext
+from queue import Empty, SimpleQueue
+from threading import Lock
 from typing import IO, Optional, Tuple
 from urllib.parse import urlsplit
 
 import sentry_sdk
 from django.conf import settings
+from django.db import connections
 from django.utils import timezone
 from django.utils.encoding import force_bytes, force_text
 from requests.utils import get_encoding_from_headers
@@ -29,8 +33,9 @@ from sentry.utils import json, metrics
 # holding the results of attempting to fetch both kinds of files, either from the
 # database or from the internet
 from sentry.utils.cache import cache
+from sentry.utils.datastructures import LRUCache
 from sentry.utils.files import compress_file
-from sentry.utils.hashlib import md5_text
+from sentry.utils.hashlib import md5_text, sha1_text
 from sentry.utils.http import is_valid_origin
 from sentry.utils.retries import ConditionalRetryPolicy, exponential_delay
 from sentry.utils.safe import get_path
@@ -77,6 +82,11 @@ CACHE_MAX_VALUE_SIZE = settings.SENTRY_CACHE_MAX_VALUE_SIZE
 
 logger = logging.getLogger(__name__)
 
+# Parsed source maps shared by all events processed in this process, see
+# `get_parsed_sourcemap_cache`.
+_parsed_sourcemap_cache = None
+_parsed_sourcemap_cache_lock = Lock()
+
 
 class UnparseableSourcemap(http.BadSource):
     error_type = EventError.JS_INVALID_SOURCEMAP
@@ -721,6 +731,7 @@ def get_max_age(headers):
 
 
 def fetch_sourcemap(url, project=None, release=None, dist=None, allow_scraping=True):
+    cache_key = None
     if is_data_uri(url):
         try:
             body = base64.b64decode(
@@ -739,13 +750,101 @@ def fetch_sourcemap(url, project=None, release=None, dist=None, allow_scraping=T
             allow_scraping=allow_scraping,
         )
         body = result.body
+
+        # Parsing is expensive for large source maps, so parsed views are kept in a process wide
+        # cache. The checksum makes sure that changed files are parsed again.
+        parsed_sourcemap_cache = get_parsed_sourcemap_cache()
+        if parsed_sourcemap_cache is not None:
+            cache_key = (
+                release.id if release else None,
+                dist.id if dist else None,
+                url,
+                sha1_text(body).hexdigest(),
+            )
+            cached = parsed_sourcemap_cache.get(cache_key)
+            if cached is not None:
+                sourcemap_view, parse_time, _ = cached
+                metrics.incr("sourcemaps.parsed_cache", tags={"result": "hit"})
+                metrics.timing("sourcemaps.parsed_cache.parse_time_saved", parse_time)
+                return sourcemap_view
+            metrics.incr("sourcemaps.parsed_cache", tags={"result": "miss"})
+
+    start = time.time()
     try:
-        return SourceMapView.from_json_bytes(body)
+        sourcemap_view = SourceMapView.from_json_bytes(body)
     except Exception as exc:
         # This is in debug because the product shows an error already.
         logger.debug(str(exc), exc_info=True)
         raise UnparseableSourcemap({"url": http.expose_url(url)})
 
+    if cache_key is not None:
+        parsed_sourcemap_cache.set(cache_key, (sourcemap_view, time.time() - start, len(body)))
+    return sourcemap_view
+
+
+def get_parsed_sourcemap_cache():
+    """
+    Returns the process wide cache of parsed source maps, or ``None`` if it is
+    disabled. Entries are ``(sourcemap_view, parse_time, size)``, and their total
+    size is bounded by ``sourcemaps.parsed-cache-size``. The size of an entry is
+    the size of the raw source map, which approximates the memory used by the
+    parsed view. The cache is rebuilt when the option changes.
+    """
+    global _parsed_sourcemap_cache
+
+    max_size = options.get("sourcemaps.parsed-cache-size")
+    with _parsed_sourcemap_cache_lock:
+        if not max_size:
+            _parsed_sourcemap_cache = None
+        elif _parsed_sourcemap_cache is None or _parsed_sourcemap_cache.maxsize != max_size:
+            _parsed_sourcemap_cache = LRUCache(max_size, weigher=lambda entry: entry[2])
+        return _parsed_sourcemap_cache
+
+
+def fetch_concurrently(fetch_fn, keys, concurrency):
+    """
+    Calls ``fetch_fn`` for every distinct key on up to ``concurrency`` threads.
+
+    Returns a dict of key to ``(result, exception)``, where exactly one of both
+    is ``None``. With a concurrency of 1 the keys are fetched one after another
+    in the calling thread.
+    """
+    keys = list(dict.fromkeys(keys))
+    results = {}
+
+    def fetch(key):
+        try:
+            results[key] = (fetch_fn(key), None)
+        except Exception as exc:
+            results[key] = (None, exc)
+
+    if concurrency <= 1 or len(keys) <= 1:
+        for key in keys:
+            fetch(key)
+        return results
+
+    pending = SimpleQueue()
+    for key in keys:
+        pending.put(key)
+
+    def worker():
+        try:
+            while True:
+                try:
+                    key = pending.get_nowait()
+                except Empty:
+                    return
+                fetch(key)
+        finally:
+            # Fetching release files opens a database connection per thread.
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(min(concurrency, len(keys))):
+            executor.submit(worker)
+
+    return results
+
 
 def is_data_uri(url):
     return url[:BASE64_PREAMBLE_LENGTH] == BASE64_SOURCEMAP_PREAMBLE
@@ -1120,31 +1219,60 @@ class JavaScriptStacktraceProcessor(StacktraceProcessor):
         map (if any).
         """
 
-        sourcemaps = self.sourcemaps
-        cache = self.cache
-
         self.fetch_count += 1
 
         if self.fetch_count > self.max_fetches:
-            cache.add_error(filename, {"type": EventError.JS_TOO_MANY_REMOTE_SOURCES})
+            self.cache.add_error(filename, {"type": EventError.JS_TOO_MANY_REMOTE_SOURCES})
             return
 
+        results = fetch_concurrently(self.fetch_source, [filename], concurrency=1)
+        sourcemap_url = self.add_source(filename, *results[filename])
+        if sourcemap_url is None or sourcemap_url in self.sourcemaps:
+            return
+
+        results = fetch_concurrently(self.fetch_sourcemap, [sourcemap_url], concurrency=1)
+        self.add_sourcemap([filename], sourcemap_url, *results[sourcemap_url])
+
+    def fetch_source(self, filename):
         # TODO: respect cache-control/max-age headers to some extent
         logger.debug("Attempting to cache source %r", filename)
-        try:
-            # this both looks in the database and tries to scrape the internet
-            with sentry_sdk.start_span(
-                op="JavaScriptStacktraceProcessor.cache_source.fetch_file"
-            ) as span:
-                span.set_data("filename", filename)
-                result = fetch_file(
-                    filename,
-                    project=self.project,
-                    release=self.release,
-                    dist=self.dist,
-                    allow_scraping=self.allow_scraping,
-                )
-        except http.BadSource as exc:
+        # this both looks in the database and tries to scrape the internet
+        with sentry_sdk.start_span(
+            op="JavaScriptStacktraceProcessor.cache_source.fetch_file"
+        ) as span:
+            span.set_data("filename", filename)
+            return fetch_file(
+                filename,
+                project=self.project,
+                release=self.release,
+                dist=self.dist,
+                allow_scraping=self.allow_scraping,
+            )
+
+    def fetch_sourcemap(self, sourcemap_url):
+        with sentry_sdk.start_span(
+            op="JavaScriptStacktraceProcessor.cache_source.fetch_sourcemap"
+        ) as span:
+            span.set_data("sourcemap_url", sourcemap_url)
+            return fetch_sourcemap(
+                sourcemap_url,
+                project=self.project,
+                release=self.release,
+                dist=self.dist,
+                allow_scraping=self.allow_scraping,
+            )
+
+    def add_source(self, filename, result, exc):
+        """
+        Caches the result of `fetch_source` and returns the URL of its source
+        map that still needs to be fetched, if any.
+        """
+
+        cache = self.cache
+
+        if exc is not None:
+            if not isinstance(exc, http.BadSource):
+                raise exc
             # most people don't upload release artifacts for their third-party libraries,
             # so ignore missing node_modules files
             if exc.data["type"] == EventError.JS_MISSING_SOURCE and "node_modules" in filename:
@@ -1165,34 +1293,29 @@ class JavaScriptStacktraceProcessor(StacktraceProcessor):
         logger.debug(
             "Found sourcemap URL %r for minified script %r", sourcemap_url[:256], result.url
         )
-        sourcemaps.link(filename, sourcemap_url)
-        if sourcemap_url in sourcemaps:
-            return
+        self.sourcemaps.link(filename, sourcemap_url)
+        return sourcemap_url
 
-        # pull down sourcemap
-        try:
-            with sentry_sdk.start_span(
-                op="JavaScriptStacktraceProcessor.cache_source.fetch_sourcemap"
-            ) as span:
-                span.set_data("sourcemap_url", sourcemap_url)
-                sourcemap_view = fetch_sourcemap(
-                    sourcemap_url,
-                    project=self.project,
-                    release=self.release,
-                    dist=self.dist,
-                    allow_scraping=self.allow_scraping,
-                )
-        except http.BadSource as exc:
-            # we don't perform the same check here as above, because if someone has
+    def add_sourcemap(self, filenames, sourcemap_url, sourcemap_view, exc):
+        """
+        Caches the result of `fetch_sourcemap` for the source map of the given
+        source files.
+        """
+
+        if exc is not None:
+            if not isinstance(exc, http.BadSource):
+                raise exc
+            # we don't perform the same check here as in `add_source`, because if someone has
             # uploaded a node_modules file, which has a sourceMappingURL, they
             # presumably would like it mapped (and would like to know why it's not
             # working, if that's the case). If they're not looking for it to be
             # mapped, then they shouldn't be uploading the source file in the
             # first place.
-            cache.add_error(filename, exc.data)
+            for filename in filenames:
+                self.cache.add_error(filename, exc.data)
             return
 
-        sourcemaps.add(sourcemap_url, sourcemap_view)
+        self.sourcemaps.add(sourcemap_url, sourcemap_view)
 
         # cache any inlined sources
         for src_id, source_name in sourcemap_view.iter_sources():
@@ -1203,7 +1326,9 @@ class JavaScriptStacktraceProcessor(StacktraceProcessor):
     def populate_source_cache(self, frames):
         """
         Fetch all sources that we know are required (being referenced directly
-        in frames).
+        in frames), followed by their source maps. Both are fetched on up to
+        ``sourcemaps.fetch-concurrency`` threads, and every source map is only
+        fetched once, no matter how many sources refer to it.
         """
         pending_file_list = set()
         for f in frames:
@@ -1221,12 +1346,36 @@ class JavaScriptStacktraceProcessor(StacktraceProcessor):
                 continue
             pending_file_list.add(f["abs_path"])
 
-        for idx, filename in enumerate(pending_file_list):
-            with sentry_sdk.start_span(
-                op="JavaScriptStacktraceProcessor.populate_source_cache.cache_source"
-            ) as span:
-                span.set_data("filename", filename)
-                self.cache_source(filename=filename)
+        filenames = []
+        for filename in pending_file_list:
+            self.fetch_count += 1
+            if self.fetch_count > self.max_fetches:
+                self.cache.add_error(filename, {"type": EventError.JS_TOO_MANY_REMOTE_SOURCES})
+            else:
+                filenames.append(filename)
+
+        concurrency = options.get("sourcemaps.fetch-concurrency")
+
+        with sentry_sdk.start_span(
+            op="JavaScriptStacktraceProcessor.populate_source_cache.fetch_sources"
+        ) as span:
+            span.set_data("count", len(filenames))
+            results = fetch_concurrently(self.fetch_source, filenames, concurrency)
+
+        pending_sourcemaps = {}
+        for filename in filenames:
+            sourcemap_url = self.add_source(filename, *results[filename])
+            if sourcemap_url is not None and sourcemap_url not in self.sourcemaps:
+                pending_sourcemaps.setdefault(sourcemap_url, []).append(filename)
+
+        with sentry_sdk.start_span(
+            op="JavaScriptStacktraceProcessor.populate_source_cache.fetch_sourcemaps"
+        ) as span:
+            span.set_data("count", len(pending_sourcemaps))
+            results = fetch_concurrently(self.fetch_sourcemap, pending_sourcemaps, concurrency)
+
+        for sourcemap_url, filenames in pending_sourcemaps.items():
+            self.add_sourcemap(filenames, sourcemap_url, *results[sourcemap_url])
 
     def close(self):
         StacktraceProcessor.close(self)
@@ -1,7 +1,158 @@
-from django.db import models
+from uuid import uuid4
+
+from django.db import models, router, transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
 from django.utils.translation import ugettext_lazy as _
 
-from sentry.db.models import BoundedPositiveIntegerField, FlexibleForeignKey, Model
+from sentry.db.models import (
+    BaseManager,
+    BaseQuerySet,
+    BoundedPositiveIntegerField,
+    FlexibleForeignKey,
+    Model,
+)
+from sentry.utils.cache import cache
+
+# Project versions outlive the entries cached with them.
+VERSION_TTL = 60 * 60 * 24
+
+
+class GroupHashQuerySet(BaseQuerySet):
+    """
+    Invalidates the cached hash to group mappings (see `GroupHashManager`) of all
+    projects with rows that are changed by bulk updates. Bulk deletes send
+    ``post_delete`` for every row, which takes care of those.
+    """
+
+    def update(self, **kwargs):
+        # Only hashes with a group or tombstone are cached, assigning new hashes to a
+        # group doesn't need to invalidate anything.
+        project_ids = set(
+            self.filter(Q(group__isnull=False) | Q(group_tombstone_id__isnull=False))
+            .values_list("project_id", flat=True)
+            .distinct()
+        )
+        rv = super().update(**kwargs)
+        GroupHash.objects.invalidate_cache(project_ids)
+        return rv
+
+
+class GroupHashManager(BaseManager):
+    """
+    Keeps a read-through cache of ``(project_id, hash) -> (id, group_id,
+    group_tombstone_id, state)`` for hashes that are associated with a group or
+    tombstone, which is what event ingestion needs to find the group of an event.
+
+    Hashes without a group or tombstone are never cached, since they are about to
+    be assigned. Cache keys contain a version per project. Every write through the
+    ORM (bulk updates, bulk deletes, saves and deletes of instances) and every
+    chunk of `GroupHashDeletionTask` replaces that version, both immediately and
+    once its transaction commits. Entries that a concurrent reader caches from
+    rows it read before the change are therefore stored under a version that is
+    no longer used.
+    """
+
+    _queryset_class = GroupHashQuerySet
+
+    def invalidate_cache(self, project_ids):
+        """
+        Invalidates all cached hash to group mappings of the given projects.
+        """
+        cache_keys = [GroupHash.get_version_cache_key(project_id) for project_id in project_ids]
+        if not cache_keys:
+            return
+
+        def bump_versions():
+            cache.set_many({cache_key: uuid4().hex for cache_key in cache_keys}, VERSION_TTL)
+
+        bump_versions()
+        # Other processes may cache the old state again until the change is committed.
+        transaction.on_commit(bump_versions, using=router.db_for_write(GroupHash))
+
+    def __get_version(self, project_id):
+        cache_key = GroupHash.get_version_cache_key(project_id)
+        version = cache.get(cache_key)
+        if version is None:
+            cache.add(cache_key, uuid4().hex, VERSION_TTL)
+            version = cache.get(cache_key)
+        return version
+
+    def __from_cache(self, project_id, hash, value):
+        id, group_id, group_tombstone_id, state = value
+        instance = self.model(
+            id=id,
+            project_id=project_id,
+            hash=hash,
+            group_id=group_id,
+            group_tombstone_id=group_tombstone_id,
+            state=state,
+        )
+        instance._state.adding = False
+        instance._state.db = router.db_for_read(self.model)
+        return instance
+
+    def __cache_many(self, version, instances):
+        if version is None:
+            return
+
+        values = {
+            GroupHash.get_cache_key(instance.project_id, version, instance.hash): (
+                instance.id,
+                instance.group_id,
+                instance.group_tombstone_id,
+                instance.state,
+            )
+            for instance in instances
+            if instance.group_id is not None or instance.group_tombstone_id is not None
+        }
+        if values:
+            cache.set_many(values, self.cache_ttl)
+
+    def __get_many_from_cache(self, project, version, hashes):
+        if version is None:
+            return {}
+
+        cache_keys = {hash: GroupHash.get_cache_key(project.id, version, hash) for hash in hashes}
+        values = cache.get_many(list(cache_keys.values()))
+        return {
+            hash: self.__from_cache(project.id, hash, values[cache_key])
+            for hash, cache_key in cache_keys.items()
+            if cache_key in values
+        }
+
+    def get_for_hashes(self, project, hashes):
+        """
+        Returns a dict of hash to ``GroupHash`` for all of the given hashes that
+        exist in the project.
+        """
+        version = self.__get_version(project.id)
+        result = self.__get_many_from_cache(project, version, hashes)
+
+        missing = [hash for hash in hashes if hash not in result]
+        if missing:
+            fetched = list(self.filter(project=project, hash__in=missing))
+            self.__cache_many(version, fetched)
+            result.update((instance.hash, instance) for instance in fetched)
+
+        return result
+
+    def get_or_create_for_hashes(self, project, hashes):
+        """
+        Returns a ``GroupHash`` for each of the given hashes, in order, creating
+        the ones that do not exist yet.
+        """
+        version = self.__get_version(project.id)
+        result = self.__get_many_from_cache(project, version, hashes)
+
+        fetched = []
+        for hash in hashes:
+            if hash not in result:
+                result[hash] = self.get_or_create(project=project, hash=hash)[0]
+                fetched.append(result[hash])
+        self.__cache_many(version, fetched)
+
+        return [result[hash] for hash in hashes]
 
 
 class GroupHash(Model):
@@ -24,7 +175,31 @@ class GroupHash(Model):
         choices=[(State.LOCKED_IN_MIGRATION, _("Locked (Migration in Progress)"))], null=True
     )
 
+    objects = GroupHashManager(cache_ttl=60 * 10)
+
     class Meta:
         app_label = "sentry"
         db_table = "sentry_grouphash"
         unique_together = (("project", "hash"),)
+
+    @classmethod
+    def get_cache_key(cls, project_id, version, hash):
+        return f"grouphash:2:{project_id}:{version}:{hash}"
+
+    @classmethod
+    def get_version_cache_key(cls, project_id):
+        return f"grouphash:version:{project_id}"
+
+
+def _invalidate_on_save(instance, created, **kwargs):
+    # New hashes can't have been cached yet.
+    if not created:
+        GroupHash.objects.invalidate_cache([instance.project_id])
+
+
+post_save.connect(_invalidate_on_save, sender=GroupHash, weak=False)
+post_delete.connect(
+    lambda instance, **kwargs: GroupHash.objects.invalidate_cache([instance.project_id]),
+    sender=GroupHash,
+    weak=False,
+)
@@ -1,10 +1,13 @@
-from threading import local
+from collections.abc import Mapping, MutableMapping
+from threading import Lock, local
 
 import sentry_sdk
+import zstandard
 from django.core.cache import InvalidCacheBackendError, caches
 
-from sentry.utils import json
+from sentry.utils import json, metrics
 from sentry.utils.cache import memoize
+from sentry.utils.datastructures import LRUCache
 from sentry.utils.services import Service
 
 # Cache an instance of the encoder we want to use
@@ -23,6 +26,198 @@ json_dumps = json.JSONEncoder(
 json_loads = json._default_decoder.decode
 
 
+def _find_segment(value, subkey):
+    """
+    Returns the encoded payload of ``subkey`` (or of the default payload if
+    ``subkey`` is `None`) within an encoded node, without splitting or copying
+    any of the other payloads.
+    """
+    end = value.find(b"\n")
+    if end == -1:
+        end = len(value)
+
+    if subkey is None:
+        return value[:end] or None
+
+    # Those keys should be statically known identifiers in the app, such as
+    # "unprocessed_event". There is really no reason to allow anything but
+    # ASCII here.
+    subkey = subkey.encode("ascii")
+
+    while end < len(value):
+        key_start = end + 1
+        key_end = value.find(b"\n", key_start)
+        if key_end == -1:
+            return None
+
+        end = value.find(b"\n", key_end + 1)
+        if end == -1:
+            end = len(value)
+
+        if value[key_start:key_end].strip() == subkey:
+            return value[key_end + 1 : end] or None
+
+    return None
+
+
+class LazyNodePayload(MutableMapping):
+    """
+    The default payload of a node, which is decoded only when it is first
+    accessed. Until then, ``raw`` holds the encoded JSON object.
+
+    Copies and pickles are plain dictionaries.
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+        self._data = None
+
+    @property
+    def is_decoded(self):
+        return self._data is not None
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = json_loads(self.raw)
+            self.raw = None
+        return self._data
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+
+    def __delitem__(self, key):
+        del self.data[key]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __bool__(self):
+        if self._data is None:
+            return self.raw != b"{}"
+        return bool(self._data)
+
+    def __reduce__(self):
+        return (dict, (self.data,))
+
+    def __repr__(self):
+        if self._data is None:
+            return f"<{type(self).__name__}: {len(self.raw)} bytes>"
+        return f"<{type(self).__name__}: {self._data!r}>"
+
+    def copy(self):
+        return dict(self.data)
+
+
+def _select_keys_multi(items, keys):
+    if keys is None:
+        return items
+
+    return {
+        id: {key: data[key] for key in keys if key in data} if data else data
+        for id, data in items.items()
+    }
+
+
+def load_zstd_dictionary(path):
+    with open(path, "rb") as f:
+        return zstandard.ZstdCompressionDict(f.read())
+
+
+class NodeCodec:
+    """
+    Compresses encoded nodes before they are handed to the backend.
+
+    Compressed payloads are prefixed with the ``header`` byte of their codec.
+    Header bytes are control characters which can never start the JSON (or
+    pickle) payloads that are written without a codec, so nodes stay readable
+    when a codec is enabled, changed or disabled.
+    """
+
+    header = b""
+
+    def compress(self, value, platform=None):
+        raise NotImplementedError
+
+    def decompress(self, value):
+        raise NotImplementedError
+
+
+class ZstdNodeCodec(NodeCodec):
+    """
+    Compresses nodes with zstd, optionally with a dictionary trained on the
+    events of their platform (see ``sentry nodestore train-dictionary``).
+
+    The id of the dictionary is stored in the zstd frame, so a dictionary has
+    to stay configured for as long as nodes compressed with it are read.
+
+    :param level: The zstd compression level.
+    :param dictionaries: Maps platforms to the path of the dictionary used to
+        compress their events.
+    :param retired_dictionaries: Paths of dictionaries that are no longer used
+        for compression, but are needed to read existing nodes.
+    """
+
+    header = b"\x01"
+
+    def __init__(self, level=3, dictionaries=None, retired_dictionaries=()):
+        self.default_compressor = zstandard.ZstdCompressor(level=level)
+        self.compressors = {}
+        self.decompressors = {0: zstandard.ZstdDecompressor()}
+
+        for platform, path in (dictionaries or {}).items():
+            dictionary = load_zstd_dictionary(path)
+            self.compressors[platform] = zstandard.ZstdCompressor(level=level, dict_data=dictionary)
+            self.decompressors[dictionary.dict_id()] = zstandard.ZstdDecompressor(
+                dict_data=dictionary
+            )
+
+        for path in retired_dictionaries:
+            dictionary = load_zstd_dictionary(path)
+            self.decompressors.setdefault(
+                dictionary.dict_id(), zstandard.ZstdDecompressor(dict_data=dictionary)
+            )
+
+    def compress(self, value, platform=None):
+        compressor = self.compressors.get(platform, self.default_compressor)
+        return self.header + compressor.compress(value)
+
+    def decompress(self, value):
+        frame = value[len(self.header) :]
+        dict_id = zstandard.get_frame_parameters(frame).dict_id
+        try:
+            decompressor = self.decompressors[dict_id]
+        except KeyError:
+            raise ValueError(f"Node was compressed with unknown zstd dictionary {dict_id}")
+        return decompressor.decompress(frame)
+
+
+node_codecs = {"zstd": ZstdNodeCodec}
+
+# Local caches of encoded default payloads, bounded by their size in bytes.
+# These are shared by all threads of the process, whereas the attributes of a
+# ``NodeStorage`` are thread local.
+_local_caches = {}
+_local_caches_lock = Lock()
+
+
+def _get_local_cache(size):
+    with _local_caches_lock:
+        cache = _local_caches.get(size)
+        if cache is None:
+            cache = _local_caches[size] = LRUCache(size, weigher=len)
+        return cache
+
+
+_node_codecs_by_header = {codec.header: codec for codec in node_codecs.values()}
+
+
 class NodeStorage(local, Service):
     """
     Nodestore is a key-value store that is used to store event payloads. It comes in two flavors:
@@ -56,6 +251,20 @@ class NodeStorage(local, Service):
 
     This is used in reprocessing to store a snapshot of the event from multiple
     stages of the pipeline.
+
+    Encoded nodes can additionally be compressed by a codec (see
+    ``node_codecs``) before they are written to the backend, for instance to
+    use zstd with dictionaries trained on events of the same platform. Any
+    compression done by the backend itself should be disabled in that case.
+
+    The node cache can be fronted by a local, per process cache. It is
+    invalidated by writes and deletes of the same process only, so it should
+    be kept small if nodes are updated.
+
+    :param codec: The name of the codec used to compress nodes.
+    :param codec_options: Passed to the codec.
+    :param local_cache_size: The size of the local cache in bytes. The local
+        cache is disabled if this is 0.
     """
 
     __all__ = (
@@ -63,6 +272,7 @@ class NodeStorage(local, Service):
         "delete_multi",
         "get",
         "get_multi",
+        "get_multi_iter",
         "set",
         "set_subkeys",
         "cleanup",
@@ -70,6 +280,13 @@ class NodeStorage(local, Service):
         "bootstrap",
     )
 
+    def __init__(self, codec=None, codec_options=None, local_cache_size=0):
+        if codec is not None and codec not in node_codecs:
+            raise ValueError(f'"codec" must be one of {list(node_codecs)!r}')
+
+        self.codec = node_codecs[codec](**(codec_options or {})) if codec is not None else None
+        self.local_cache = _get_local_cache(local_cache_size) if local_cache_size else None
+
     def delete(self, id):
         """
         >>> nodestore.delete('key1')
@@ -88,30 +305,46 @@ class NodeStorage(local, Service):
         for id in id_list:
             self.delete(id)
 
-    def _decode(self, value, subkey):
-        if value is None:
-            return None
+    def _compress(self, value, platform=None):
+        if self.codec is None:
+            return value
+        return self.codec.compress(value, platform=platform)
 
-        lines_iter = iter(value.splitlines())
-        try:
-            if subkey is not None:
-                # Those keys should be statically known identifiers in the app, such as
-                # "unprocessed_event". There is really no reason to allow anything but
-                # ASCII here.
-                subkey = subkey.encode("ascii")
+    def _decompress(self, value):
+        if not value:
+            return value
 
-                next(lines_iter)
+        header = value[:1]
+        if self.codec is not None and header == self.codec.header:
+            return self.codec.decompress(value)
 
-                for line in lines_iter:
-                    if line.strip() == subkey:
-                        break
+        codec_cls = _node_codecs_by_header.get(header)
+        if codec_cls is not None:
+            # Written with a codec which is no longer configured
+            return codec_cls().decompress(value)
 
-                    next(lines_iter)
+        return value
 
-            return json_loads(next(lines_iter))
-        except StopIteration:
+    def _decode(self, value, subkey, lazy=False):
+        """
+        Decodes the payload of ``subkey`` from an encoded node. Only that
+        payload is parsed, all others are skipped.
+
+        If ``lazy`` is set, a default payload that is a JSON object is
+        returned as a ``LazyNodePayload``.
+        """
+        if value is None:
+            return None
+
+        segment = _find_segment(value, subkey)
+        if segment is None:
             return None
 
+        if lazy and subkey is None and segment.startswith(b"{"):
+            return LazyNodePayload(segment)
+
+        return json_loads(segment)
+
     def _get_bytes(self, id):
         """
         >>> nodestore._get_bytes('key1')
@@ -119,15 +352,19 @@ class NodeStorage(local, Service):
         """
         raise NotImplementedError
 
-    def get(self, id, subkey=None):
+    def get(self, id, subkey=None, lazy=False):
         """
+        If ``lazy`` is set, the default payload is returned as a
+        ``LazyNodePayload``. Lazily read nodes are written to the local cache
+        only, since the node cache would require decoding them.
+
         >>> nodestore.get('key1')
         {"message": "hello world"}
         """
         with sentry_sdk.start_span(op="nodestore.get") as span:
             span.set_tag("node_id", id)
             if subkey is None:
-                item_from_cache = self._get_cache_item(id)
+                item_from_cache = self._get_cache_item(id, lazy=lazy)
                 if item_from_cache:
                     span.set_tag("origin", "from_cache")
                     span.set_tag("found", bool(item_from_cache))
@@ -135,10 +372,11 @@ class NodeStorage(local, Service):
 
             span.set_tag("subkey", str(subkey))
             bytes_data = self._get_bytes(id)
-            rv = self._decode(bytes_data, subkey=subkey)
+            value = self._decompress(bytes_data)
+            rv = self._decode(value, subkey=subkey, lazy=lazy)
             if subkey is None:
                 # set cache item only after we know decoding did not fail
-                self._set_cache_item(id, rv)
+                self._set_cache_item(id, rv, value=value)
 
             span.set_tag("result", "from_service")
             if bytes_data:
@@ -157,8 +395,31 @@ class NodeStorage(local, Service):
         """
         return {id: self._get_bytes(id) for id in id_list}
 
-    def get_multi(self, id_list, subkey=None):
+    def _get_bytes_multi_iter(self, id_list):
+        """
+        Yields dictionaries of ``id -> bytes`` for the nodes in ``id_list``,
+        one per batch in which the backend fetched them.
+
+        >>> list(nodestore._get_bytes_multi_iter(['key1', 'key2']))
+        [{"key1": b'{"message": "hello world"}'}, {"key2": b'{"message": "hello world"}'}]
+        """
+        yield self._get_bytes_multi(id_list)
+
+    def _get_decoded_multi_iter(self, id_list, subkey, lazy=False):
+        for chunk in self._get_bytes_multi_iter(id_list):
+            values = {id: self._decompress(value) for id, value in chunk.items()}
+            items = {
+                id: self._decode(value, subkey=subkey, lazy=lazy) for id, value in values.items()
+            }
+            if subkey is None:
+                self._set_cache_items(items, values=values)
+            yield items
+
+    def get_multi(self, id_list, subkey=None, keys=None, lazy=False):
         """
+        If ``keys`` is given, only those top-level fields of each node are
+        returned. See ``get`` for ``lazy``.
+
         >>> nodestore.get_multi(['key1', 'key2')
         {
             "key1": {"message": "hello world"},
@@ -170,27 +431,49 @@ class NodeStorage(local, Service):
             span.set_tag("num_ids", len(id_list))
 
             if subkey is None:
-                cache_items = self._get_cache_items(id_list)
+                cache_items = self._get_cache_items(id_list, lazy=lazy)
                 if len(cache_items) == len(id_list):
                     span.set_tag("result", "from_cache")
-                    return cache_items
+                    return _select_keys_multi(cache_items, keys)
 
                 uncached_ids = [id for id in id_list if id not in cache_items]
             else:
                 uncached_ids = id_list
 
-            items = {
-                id: self._decode(value, subkey=subkey)
-                for id, value in self._get_bytes_multi(uncached_ids).items()
-            }
+            items = {}
+            for chunk in self._get_decoded_multi_iter(uncached_ids, subkey, lazy):
+                items.update(chunk)
             if subkey is None:
-                self._set_cache_items(items)
                 items.update(cache_items)
 
             span.set_tag("result", "from_service")
             span.set_tag("found", len(items))
 
-            return items
+            return _select_keys_multi(items, keys)
+
+    def get_multi_iter(self, id_list, subkey=None, keys=None, lazy=False):
+        """
+        Like ``get_multi``, but yields ``(id, data)`` pairs as soon as they are
+        available: cached nodes first, then all others in the order in which
+        the backend returns them.
+
+        >>> for id, data in nodestore.get_multi_iter(['key1', 'key2'], keys=['message']):
+        ...     print(id, data)
+        key2 {"message": "hello world"}
+        key1 {"message": "hello world"}
+        """
+        if subkey is None:
+            cache_items = self._get_cache_items(id_list, lazy=lazy)
+            yield from _select_keys_multi(cache_items, keys).items()
+            uncached_ids = [id for id in id_list if id not in cache_items]
+        else:
+            uncached_ids = id_list
+
+        if not uncached_ids:
+            return
+
+        for chunk in self._get_decoded_multi_iter(uncached_ids, subkey, lazy):
+            yield from _select_keys_multi(chunk, keys).items()
 
     def _encode(self, data):
         """
@@ -241,10 +524,11 @@ class NodeStorage(local, Service):
             span.set_tag("node_id", id)
             span.set_data("subkeys_count", len(data))
             cache_item = data.get(None)
-            bytes_data = self._encode(data)
-            self._set_bytes(id, bytes_data, ttl=ttl)
+            platform = cache_item.get("platform") if isinstance(cache_item, Mapping) else None
+            value = self._encode(data)
+            self._set_bytes(id, self._compress(value, platform=platform), ttl=ttl)
             # set cache only after encoding and write to nodestore has succeeded
-            self._set_cache_item(id, cache_item)
+            self._set_cache_item(id, cache_item, value=value)
 
     def cleanup(self, cutoff_timestamp):
         raise NotImplementedError
@@ -252,28 +536,93 @@ class NodeStorage(local, Service):
     def bootstrap(self):
         raise NotImplementedError
 
-    def _get_cache_item(self, id):
-        if self.cache:
-            return self.cache.get(id)
+    def _get_local_cache_item(self, id, lazy=False):
+        raw = self.local_cache.get(id)
+        if raw is None:
+            return None
+        return LazyNodePayload(raw) if lazy else json_loads(raw)
+
+    def _set_local_cache_item(self, id, data, value=None):
+        """
+        Stores the default payload of a node in the local cache, taking it from
+        the encoded node ``value`` if possible and encoding ``data`` otherwise.
+        """
+        if not data:
+            self.local_cache.pop(id)
+            return
+
+        raw = _find_segment(value, None) if value else None
+        if raw is None or not raw.startswith(b"{"):
+            raw = json_dumps(dict(data)).encode("utf8")
+
+        evicted = self.local_cache.set(id, raw)
+        if evicted:
+            metrics.incr("nodestore.local_cache.evicted_bytes", amount=evicted)
+
+    def _get_cache_item(self, id, lazy=False):
+        if self.local_cache is not None:
+            rv = self._get_local_cache_item(id, lazy=lazy)
+            metrics.incr("nodestore.local_cache", tags={"result": "hit" if rv else "miss"})
+            if rv:
+                return rv
 
-    def _get_cache_items(self, id_list):
         if self.cache:
-            return self.cache.get_many(id_list)
-        return {}
+            rv = self.cache.get(id)
+            if rv and self.local_cache is not None:
+                self._set_local_cache_item(id, rv)
+            return rv
 
-    def _set_cache_item(self, id, data):
-        if self.cache and data:
+    def _get_cache_items(self, id_list, lazy=False):
+        rv = {}
+        if self.local_cache is not None:
+            for id in id_list:
+                data = self._get_local_cache_item(id, lazy=lazy)
+                if data:
+                    rv[id] = data
+            metrics.incr("nodestore.local_cache", amount=len(rv), tags={"result": "hit"})
+            metrics.incr(
+                "nodestore.local_cache", amount=len(id_list) - len(rv), tags={"result": "miss"}
+            )
+            id_list = [id for id in id_list if id not in rv]
+
+        if self.cache and id_list:
+            items = self.cache.get_many(id_list)
+            if self.local_cache is not None:
+                for id, data in items.items():
+                    self._set_local_cache_item(id, data)
+            rv.update(items)
+        return rv
+
+    def _set_cache_item(self, id, data, value=None):
+        if self.local_cache is not None:
+            self._set_local_cache_item(id, data, value=value)
+
+        # Lazily read nodes are not decoded to be cached
+        if self.cache and data and not isinstance(data, LazyNodePayload):
             self.cache.set(id, data)
 
-    def _set_cache_items(self, items):
+    def _set_cache_items(self, items, values=None):
+        if self.local_cache is not None:
+            for id, data in items.items():
+                self._set_local_cache_item(id, data, value=values and values.get(id))
+
         if self.cache:
-            self.cache.set_many(items)
+            self.cache.set_many(
+                {id: data for id, data in items.items() if not isinstance(data, LazyNodePayload)}
+            )
 
     def _delete_cache_item(self, id):
+        if self.local_cache is not None:
+            self.local_cache.pop(id)
+
         if self.cache:
             self.cache.delete(id)
 
     def _delete_cache_items(self, id_list):
+        if self.local_cache is not None:
+            for id in id_list:
+                self.local_cache.pop(id)
+
         if self.cache:
             self.cache.delete_many([id for id in id_list])
 
@@ -1,4 +1,5 @@
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import sentry_sdk
 
@@ -6,6 +7,12 @@ from sentry.nodestore.base import NodeStorage
 from sentry.utils.kvstore.bigtable import BigtableKVStorage
 
 
+def _get_many(store, id_list):
+    rv = {id: None for id in id_list}
+    rv.update(store.get_many(id_list))
+    return rv
+
+
 class BigtableNodeStorage(NodeStorage):
     """
     A Bigtable-based backend for storing node data.
@@ -18,6 +25,13 @@ class BigtableNodeStorage(NodeStorage):
         valid for reading + returning)
     :param compression: A boolean whether to enable zlib-compression, or the
         string "zstd" to use zstd.
+    :param multi_get_shard_size: The maximum number of rows read in one
+        request by ``get_multi``. Larger lists of ids are split into shards.
+    :param multi_get_concurrency: How many shards are read concurrently.
+    :param codec: See ``NodeStorage``. Disable ``compression`` when using a
+        codec.
+    :param codec_options: See ``NodeStorage``.
+    :param local_cache_size: See ``NodeStorage``.
 
     >>> BigtableNodeStorage(
     ...     project='some-project',
@@ -38,8 +52,17 @@ class BigtableNodeStorage(NodeStorage):
         automatic_expiry=False,
         default_ttl=None,
         compression=False,
+        multi_get_shard_size=50,
+        multi_get_concurrency=4,
+        codec=None,
+        codec_options=None,
+        local_cache_size=0,
         **client_options,
     ):
+        super().__init__(
+            codec=codec, codec_options=codec_options, local_cache_size=local_cache_size
+        )
+
         if compression is True:
             compression = "zlib"
         elif compression is False:
@@ -54,15 +77,34 @@ class BigtableNodeStorage(NodeStorage):
             client_options=client_options,
         )
         self.automatic_expiry = automatic_expiry
+        self.multi_get_shard_size = multi_get_shard_size
+        self.multi_get_concurrency = multi_get_concurrency
         self.skip_deletes = automatic_expiry and "_SENTRY_CLEANUP" in os.environ
 
     def _get_bytes(self, id):
         return self.store.get(id)
 
     def _get_bytes_multi(self, id_list):
-        rv = {id: None for id in id_list}
-        rv.update(self.store.get_many(id_list))
-        return rv
+        return _get_many(self.store, id_list)
+
+    def _get_bytes_multi_iter(self, id_list):
+        size = self.multi_get_shard_size
+        if self.multi_get_concurrency <= 1 or len(id_list) <= size:
+            yield self._get_bytes_multi(id_list)
+            return
+
+        shards = [id_list[i : i + size] for i in range(0, len(id_list), size)]
+
+        # The node storage is thread local, so the worker threads are handed
+        # the (thread safe) KV storage instead.
+        store = self.store
+        with ThreadPoolExecutor(
+            max_workers=min(self.multi_get_concurrency, len(shards)),
+            thread_name_prefix="nodestore-get-multi",
+        ) as executor:
+            futures = [executor.submit(_get_many, store, shard) for shard in shards]
+            for future in as_completed(futures):
+                yield future.result()
 
     def _set_bytes(self, id, data, ttl=None):
         self.store.set(id, data, ttl)
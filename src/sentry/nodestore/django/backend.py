@@ -18,13 +18,13 @@ class DjangoNodeStorage(NodeStorage):
         Node.objects.filter(id=id).delete()
         self._delete_cache_item(id)
 
-    def _decode(self, value, subkey):
+    def _decode(self, value, subkey, lazy=False):
         if value is None:
             return None
 
         try:
             if value.startswith(b"{"):
-                return NodeStorage._decode(self, value, subkey=subkey)
+                return NodeStorage._decode(self, value, subkey=subkey, lazy=lazy)
 
             if subkey is None:
                 return pickle.loads(value)
@@ -34,22 +34,31 @@ class DjangoNodeStorage(NodeStorage):
             logger.exception(e)
             return {}
 
+    def _node_bytes(self, node):
+        if node.codec_data is not None:
+            return bytes(node.codec_data)
+        return decompress(node.data)
+
     def _get_bytes(self, id):
         try:
-            data = Node.objects.get(id=id).data
-            return decompress(data)
+            return self._node_bytes(Node.objects.get(id=id))
         except Node.DoesNotExist:
             return None
 
     def _get_bytes_multi(self, id_list):
-        return {n.id: decompress(n.data) for n in Node.objects.filter(id__in=id_list)}
+        return {n.id: self._node_bytes(n) for n in Node.objects.filter(id__in=id_list)}
 
     def delete_multi(self, id_list):
         Node.objects.filter(id__in=id_list).delete()
         self._delete_cache_items(id_list)
 
     def _set_bytes(self, id, data, ttl=None):
-        create_or_update(Node, id=id, values={"data": compress(data), "timestamp": timezone.now()})
+        if self.codec is not None:
+            values = {"data": "", "codec_data": data}
+        else:
+            values = {"data": compress(data), "codec_data": None}
+        values["timestamp"] = timezone.now()
+        create_or_update(Node, id=id, values=values)
 
     def cleanup(self, cutoff_timestamp):
         from sentry.db.deletion import BulkDeleteQuery
@@ -58,6 +67,8 @@ class DjangoNodeStorage(NodeStorage):
         days = math.floor(total_seconds / 86400)
 
         BulkDeleteQuery(model=Node, dtfield="timestamp", days=days).execute()
+        if self.local_cache is not None:
+            self.local_cache.clear()
         if self.cache:
             self.cache.clear()
 
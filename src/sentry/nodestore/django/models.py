@@ -11,6 +11,9 @@ class Node(BaseModel):
     # TODO(dcramer): this being pickle and not JSON has the ability to cause
     # hard errors as it accepts other serialization than native JSON
     data = models.TextField()
+    # Nodes written with a codec are stored as is, as they are compressed
+    # already and binary. ``data`` is left empty for those.
+    codec_data = models.BinaryField(null=True)
     timestamp = models.DateTimeField(default=timezone.now, db_index=True)
 
     __repr__ = sane_repr("timestamp")
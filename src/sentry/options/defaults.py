@@ -57,6 +57,12 @@ register(
     default=1024 * 1024 * 1024,
     flags=FLAG_PRIORITIZE_DISK,
 )
+# Number of threads that fetch the sources and sourcemaps of a JavaScript event. 1 fetches them
+# one after another in the processing thread.
+register("sourcemaps.fetch-concurrency", type=Int, default=1)
+# Maximum size in bytes of the parsed source maps that every worker process keeps in memory to
+# reuse them for later events. 0 disables the cache.
+register("sourcemaps.parsed-cache-size", type=Int, default=0)
 
 
 # Mail
@@ -366,6 +372,10 @@ register("post-process-forwarder:kafka-headers", default=False)
 # Number of threads to use for post processing
 register("post-process-forwarder:concurrency", default=1)
 
+# Seconds for which the results of event frequency rule conditions are shared between events of
+# the same group. 0 disables the shared cache.
+register("rules.event-frequency.cache-ttl", default=0)
+
 # Subscription queries sampling rate
 register("subscriptions-query.sample-rate", default=0.01)
 
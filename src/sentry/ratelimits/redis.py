@@ -1,3 +1,4 @@
+from threading import Lock
 from time import time
 
 from redis.exceptions import RedisError
@@ -5,15 +6,40 @@ from sentry_sdk import capture_exception
 
 from sentry.exceptions import InvalidConfiguration
 from sentry.ratelimits.base import RateLimiter
+from sentry.utils import metrics
 from sentry.utils.hashlib import md5_text
 from sentry.utils.redis import get_cluster_from_options
 
 
 class RedisRateLimiter(RateLimiter):
+    """
+    A fixed window rate limiter backed by Redis.
+
+    By default every call increments the counter of the current window in
+    Redis. If ``lease_size`` is set, tokens are instead leased from Redis in
+    chunks of up to ``lease_size`` (but no more than ``lease_ratio`` of the
+    limit) and handed out from process memory until the lease is used up, so
+    that only one call per lease requires a round trip to Redis.
+
+    Leased tokens count against the limit in all processes as soon as they
+    are leased, so each process may cause the limit to be reached early by
+    at most the size of its unused lease. Windows that are known to be over
+    their limit are remembered until they end.
+    """
+
     window = 60
 
-    def __init__(self, **options):
+    # Local state is swept of expired windows once it has this many entries.
+    max_local_keys = 10000
+
+    def __init__(self, lease_size=0, lease_ratio=0.1, **options):
         self.cluster, options = get_cluster_from_options("SENTRY_RATELIMITER_OPTIONS", options)
+        self.lease_size = lease_size
+        self.lease_ratio = lease_ratio
+
+        # key -> [expires_at, remaining tokens], or -1 if the window is limited
+        self._leases = {}
+        self._leases_lock = Lock()
 
     def validate(self):
         try:
@@ -34,6 +60,10 @@ class RedisRateLimiter(RateLimiter):
         else:
             key = f"rl:{key_hex}:{bucket}"
 
+        lease_size = min(self.lease_size, int(limit * self.lease_ratio))
+        if lease_size > 1:
+            return self._is_limited_leased(key, limit, window, (bucket + 1) * window, lease_size)
+
         try:
             with self.cluster.map() as client:
                 result = client.incr(key)
@@ -44,3 +74,53 @@ class RedisRateLimiter(RateLimiter):
             # can't be updated. We do want to know when that happens.
             capture_exception(e)
             return False
+
+    def _is_limited_leased(self, key, limit, window, expires_at, lease_size):
+        with self._leases_lock:
+            lease = self._leases.get(key)
+            if lease is not None:
+                if lease[1] < 0:
+                    return True
+                if lease[1] > 0:
+                    lease[1] -= 1
+                    return False
+
+        metrics.incr("ratelimits.lease")
+
+        try:
+            with self.cluster.map() as client:
+                result = client.incrby(key, lease_size)
+                client.expire(key, window)
+            count = result.value
+        except RedisError as e:
+            # We don't want rate limited endpoints to fail when ratelimits
+            # can't be updated. We do want to know when that happens.
+            capture_exception(e)
+            return False
+
+        # The lease covers the calls ``count - lease_size + 1`` to ``count``,
+        # only the ones within the limit may be handed out.
+        granted = min(lease_size, limit - (count - lease_size))
+
+        with self._leases_lock:
+            if len(self._leases) >= self.max_local_keys:
+                now = time()
+                for expired_key in [k for k, v in self._leases.items() if v[0] <= now]:
+                    del self._leases[expired_key]
+
+            if granted <= 0:
+                # Tokens that a concurrent thread leased before the limit was
+                # reached are still valid, so only mark the key as exhausted
+                # once they are used up.
+                lease = self._leases.get(key)
+                if lease is not None and lease[1] > 0:
+                    lease[1] -= 1
+                    return False
+                self._leases[key] = [expires_at, -1]
+                return True
+
+            # Tokens left over from an earlier lease (e.g. granted to a
+            # concurrent thread) are kept.
+            lease = self._leases.setdefault(key, [expires_at, 0])
+            lease[1] = max(lease[1], 0) + granted - 1
+            return False
@@ -0,0 +1,8 @@
+from celery.signals import worker_process_init
+
+from sentry.grouping.enhancer import warm_up_enhancements
+
+
+@worker_process_init.connect(weak=False, dispatch_uid="sentry.grouping.warm_up_enhancements")
+def warm_up_grouping_enhancements(**kwargs):
+    warm_up_enhancements()
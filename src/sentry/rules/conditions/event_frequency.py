@@ -6,10 +6,11 @@ from django import forms
 from django.core.cache import cache
 from django.utils import timezone
 
-from sentry import tsdb
+from sentry import options, tsdb
 from sentry.receivers.rules import DEFAULT_RULE_LABEL
 from sentry.rules.conditions.base import EventCondition
 from sentry.utils import metrics
+from sentry.utils.hashlib import hash_values
 from sentry.utils.snuba import Dataset, options_override, raw_query
 
 standard_intervals = {
@@ -76,6 +77,56 @@ class EventFrequencyForm(forms.Form):
             return
 
 
+class EventFrequencyQueryCache:
+    """
+    Shares the results of frequency queries between all conditions that are evaluated for the
+    same event, see `RuleProcessor`. All queries are relative to the same end of the window, so
+    queries of the same condition type, window and environment (e.g. many "seen more than N times
+    in 1h" rules) are only made once per event.
+
+    If ``rules.event-frequency.cache-ttl`` is set, results are also kept in the shared cache for
+    that many seconds per group and window, so that bursts of events of the same group reuse them.
+    """
+
+    def __init__(self, group_id, end=None):
+        self.group_id = group_id
+        self.end = end or timezone.now()
+        self.results = {}
+
+    def _build_cache_key(self, key):
+        return "r.c.efq:{}:{}".format(self.group_id, hash_values(key))
+
+    def get_or_query(self, condition, event, start, end, environment_id):
+        # Windows are identified by their offsets from the shared end, so that the key is also
+        # valid for other events of the group.
+        key = (
+            condition.id,
+            int((self.end - start).total_seconds()),
+            int((self.end - end).total_seconds()),
+            environment_id,
+        )
+        if key in self.results:
+            metrics.incr("rules.conditions.event_frequency.query_cache", tags={"result": "hit"})
+            return self.results[key]
+
+        cache_ttl = options.get("rules.event-frequency.cache-ttl")
+        if cache_ttl:
+            cache_key = self._build_cache_key(key)
+            result = cache.get(cache_key)
+            if result is not None:
+                metrics.incr(
+                    "rules.conditions.event_frequency.query_cache", tags={"result": "shared_hit"}
+                )
+                self.results[key] = result
+                return result
+
+        metrics.incr("rules.conditions.event_frequency.query_cache", tags={"result": "miss"})
+        result = self.results[key] = condition.query(event, start, end, environment_id)
+        if cache_ttl:
+            cache.set(cache_key, result, cache_ttl)
+        return result
+
+
 class BaseEventFrequencyCondition(EventCondition):
     intervals = standard_intervals
     form_cls = EventFrequencyForm
@@ -83,6 +134,7 @@ class BaseEventFrequencyCondition(EventCondition):
 
     def __init__(self, *args, **kwargs):
         self.tsdb = kwargs.pop("tsdb", tsdb)
+        self.query_cache = kwargs.pop("query_cache", None)
         self.form_fields = {
             "value": {"type": "number", "placeholder": 100},
             "interval": {
@@ -127,10 +179,15 @@ class BaseEventFrequencyCondition(EventCondition):
         """ """
         raise NotImplementedError  # subclass must implement
 
+    def get_or_query(self, event, start, end, environment_id):
+        if self.query_cache is None:
+            return self.query(event, start, end, environment_id)
+        return self.query_cache.get_or_query(self, event, start, end, environment_id)
+
     def get_rate(self, event, interval, environment_id):
         _, duration = self.intervals[interval]
-        end = timezone.now()
-        result = self.query(event, end - duration, end, environment_id=environment_id)
+        end = self.query_cache.end if self.query_cache is not None else timezone.now()
+        result = self.get_or_query(event, end - duration, end, environment_id=environment_id)
         comparison_type = self.get_option("comparisonType", COMPARISON_TYPE_COUNT)
         if comparison_type == COMPARISON_TYPE_PERCENT:
             comparison_interval = comparison_intervals[self.get_option("comparisonInterval")][1]
@@ -138,7 +195,7 @@ class BaseEventFrequencyCondition(EventCondition):
             # TODO: Figure out if there's a way we can do this less frequently. All queries are
             # automatically cached for 10s. We could consider trying to cache this and the main
             # query for 20s to reduce the load.
-            comparison_result = self.query(
+            comparison_result = self.get_or_query(
                 event, comparison_end - duration, comparison_end, environment_id=environment_id
             )
             result = (
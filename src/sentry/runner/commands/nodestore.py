@@ -0,0 +1,79 @@
+import click
+
+from sentry.runner.decorators import configuration
+from sentry.utils.iterators import chunked
+
+
+@click.group()
+def nodestore():
+    """Tools for the node storage."""
+
+
+@nodestore.command("train-dictionary")
+@click.argument("output", type=click.File("wb"))
+@click.option("--platform", required=True, help="Platform of the sampled events.")
+@click.option(
+    "--project",
+    "project_ids",
+    type=click.INT,
+    multiple=True,
+    required=True,
+    help="Project to sample events from, may be passed multiple times.",
+)
+@click.option("--days", default=7, show_default=True, help="Sample events of the last N days.")
+@click.option("--samples", default=5000, show_default=True, help="Number of events to sample.")
+@click.option(
+    "--size", default=112640, show_default=True, help="Maximum size of the dictionary in bytes."
+)
+@click.option(
+    "--dict-id",
+    type=click.INT,
+    default=0,
+    help="Id of the dictionary, must be unique among the configured dictionaries.",
+)
+@configuration
+def train_dictionary(output, platform, project_ids, days, samples, size, dict_id):
+    """
+    Train a zstd dictionary from existing nodes.
+
+    The dictionary is trained on the stored payloads of recent events of one
+    platform, and can be configured in the ``dictionaries`` option of the
+    ``zstd`` node codec.
+    """
+    from datetime import timedelta
+
+    import zstandard
+    from django.utils import timezone
+
+    from sentry import eventstore, nodestore
+    from sentry.eventstore.models import Event
+
+    end = timezone.now()
+    events = eventstore.get_unfetched_events(
+        eventstore.Filter(
+            project_ids=list(project_ids),
+            conditions=[["platform", "=", platform]],
+            start=end - timedelta(days=days),
+            end=end,
+        ),
+        limit=samples,
+        referrer="nodestore.train_dictionary",
+    )
+    if not events:
+        raise click.ClickException(f"No {platform} events found.")
+
+    node_ids = [Event.generate_node_id(event.project_id, event.event_id) for event in events]
+
+    payloads = []
+    with click.progressbar(length=len(node_ids), label="Fetching nodes") as bar:
+        for chunk in chunked(node_ids, 100):
+            for data in nodestore.get_multi(chunk).values():
+                if data:
+                    payloads.append(nodestore._encode({None: data}))
+            bar.update(len(chunk))
+
+    click.echo(f"Training dictionary on {len(payloads)} nodes")
+    dictionary = zstandard.train_dictionary(size, payloads, dict_id=dict_id)
+    output.write(dictionary.as_bytes())
+
+    click.echo(f"Wrote dictionary {dictionary.dict_id()} ({len(dictionary)} bytes)")
@@ -360,6 +360,18 @@ def post_process_forwarder(**options):
     type=int,
     help="How many messages to process before committing offsets.",
 )
+@click.option(
+    "--max-batch-size",
+    default=1,
+    type=int,
+    help="How many messages to process together. Larger batches let subscription updates share database and Redis lookups.",
+)
+@click.option(
+    "--max-batch-time-ms",
+    default=1000,
+    type=int,
+    help="How long to wait for a batch to fill up before processing it.",
+)
 @click.option(
     "--initial-offset-reset",
     default="latest",
@@ -381,6 +393,8 @@ def query_subscription_consumer(**options):
         group_id=options["group"],
         topic=options["topic"],
         commit_batch_size=options["commit_batch_size"],
+        max_batch_size=options["max_batch_size"],
+        max_batch_time=options["max_batch_time_ms"] / 1000.0,
         initial_offset_reset=options["initial_offset_reset"],
         force_offset_reset=options["force_offset_reset"],
     )
@@ -478,6 +492,12 @@ def batching_kafka_options(group):
     default=None,
     help="Thread pool size (only utilitized for message types that support concurrent processing)",
 )
+@click.option(
+    "--pipeline-concurrency",
+    type=int,
+    default=None,
+    help="Process each message type of a batch in its own thread pool of this size. Events only wait for their own attachment chunks.",
+)
 @configuration
 def ingest_consumer(consumer_types, all_consumer_types, **options):
     """
@@ -486,7 +506,7 @@ def ingest_consumer(consumer_types, all_consumer_types, **options):
     The "ingest consumer" tasks read events from a kafka topic (coming from Relay) and schedules
     process event celery tasks for them
     """
-    from sentry.ingest.ingest_consumer import get_ingest_consumer
+    from sentry.ingest.ingest_consumer import PIPELINE_STAGES, get_ingest_consumer
     from sentry.utils import metrics
 
     if all_consumer_types:
@@ -506,10 +526,19 @@ def ingest_consumer(consumer_types, all_consumer_types, **options):
     else:
         executor = None
 
+    pipeline_concurrency = options.pop("pipeline_concurrency", None)
+    if pipeline_concurrency is not None:
+        pipeline_concurrency = {stage: pipeline_concurrency for stage in PIPELINE_STAGES}
+
     with metrics.global_tags(
         ingest_consumer_types=",".join(sorted(consumer_types)), _all_threads=True
     ):
-        get_ingest_consumer(consumer_types=consumer_types, executor=executor, **options).run()
+        get_ingest_consumer(
+            consumer_types=consumer_types,
+            executor=executor,
+            pipeline_concurrency=pipeline_concurrency,
+            **options,
+        ).run()
 
 
 @run.command("metrics-consumer")
@@ -606,7 +606,28 @@ end
 
 -- Command Parsing
 
-local commands = {
+local commands
+
+local parse_request = multiple_argument_parser(
+    argument_parser(
+        function (value)
+            local command = commands[value]
+            assert(command ~= nil)
+            return command
+        end
+    ),
+    object_argument_parser({
+        {"timestamp", argument_parser(validate_number)},
+        {"namespace", argument_parser()},
+        {"bands", argument_parser(validate_integer)},
+        {"interval", argument_parser(validate_integer)},
+        {"retention", argument_parser(validate_integer)},  -- how many previous intervals to store (does not include current interval)
+        {"candidate_set_limit", argument_parser(validate_integer)},
+        {"scope", argument_parser(validate_value)},
+    })
+)
+
+commands = {
     RECORD = function (configuration, cursor, arguments)
         local cursor, key, signatures = multiple_argument_parser(
             argument_parser(validate_value),
@@ -829,25 +850,22 @@ local commands = {
             end
         )
     end,
+    BATCH = function (configuration, cursor, arguments)
+        -- Executes many requests (which may have different scopes and
+        -- timestamps) in one script invocation, and returns their responses.
+        -- Each request is prefixed with its number of arguments.
+        local responses = {}
+        while arguments[cursor] ~= nil do
+            local count = validate_integer(arguments[cursor])
+            local request = table.slice(arguments, cursor + 1, cursor + count)
+            local request_cursor, request_command, request_configuration = parse_request(1, request)
+            table.insert(responses, request_command(request_configuration, request_cursor, request))
+            cursor = cursor + count + 1
+        end
+        return responses
+    end,
 }
 
-local cursor, command, configuration = multiple_argument_parser(
-    argument_parser(
-        function (value)
-            local command = commands[value]
-            assert(command ~= nil)
-            return command
-        end
-    ),
-    object_argument_parser({
-        {"timestamp", argument_parser(validate_number)},
-        {"namespace", argument_parser()},
-        {"bands", argument_parser(validate_integer)},
-        {"interval", argument_parser(validate_integer)},
-        {"retention", argument_parser(validate_integer)},  -- how many previous intervals to store (does not include current interval)
-        {"candidate_set_limit", argument_parser(validate_integer)},
-        {"scope", argument_parser(validate_value)},
-    })
-)(1, ARGV)
+local cursor, command, configuration = parse_request(1, ARGV)
 
 return command(configuration, cursor, ARGV)
@@ -140,3 +140,25 @@ def _build_dispatcher(methodname):
 merge = _build_dispatcher("merge")
 record = _build_dispatcher("record")
 delete = _build_dispatcher("delete")
+
+
+def record_many(events):
+    # TODO: Fold into the dispatcher when features2 supersedes features.
+    projects = {}
+    for event in events:
+        projects.setdefault(event.project_id, (event.project, []))[1].append(event)
+
+    v1_events = []
+    v2_events = []
+    for project, project_events in projects.values():
+        if feature_flags.has("projects:similarity-indexing", project):
+            v1_events.extend(project_events)
+
+        if feature_flags.has("projects:similarity-indexing-v2", project):
+            v2_events.extend(project_events)
+
+    if v1_events:
+        features.record_many(v1_events)
+
+    if v2_events:
+        features2.record_many(v2_events)
@@ -6,6 +6,16 @@ class AbstractIndexBackend(metaclass=ABCMeta):
     def classify(self, scope, items, limit=None, timestamp=None):
         pass
 
+    def classify_many(self, requests):
+        """
+        Classifies many ``(scope, items, limit, timestamp)`` requests,
+        returning the results of each request in order.
+        """
+        return [
+            self.classify(scope, items, limit=limit, timestamp=timestamp)
+            for scope, items, limit, timestamp in requests
+        ]
+
     @abstractmethod
     def compare(self, scope, key, items, limit=None, timestamp=None):
         pass
@@ -14,6 +24,16 @@ class AbstractIndexBackend(metaclass=ABCMeta):
     def record(self, scope, key, items, timestamp=None):
         pass
 
+    def record_many(self, requests):
+        """
+        Records many ``(scope, key, items, timestamp)`` requests, returning
+        the results of each request in order.
+        """
+        return [
+            self.record(scope, key, items, timestamp=timestamp)
+            for scope, key, items, timestamp in requests
+        ]
+
     @abstractmethod
     def merge(self, scope, destination, items, timestamp=None):
         pass
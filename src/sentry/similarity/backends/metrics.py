@@ -22,9 +22,17 @@ class MetricsWrapper(AbstractIndexBackend):
     def record(self, *args, **kwargs):
         return self.__instrumented_method_call("record", *args, **kwargs)
 
+    def record_many(self, requests):
+        with timer(self.template.format("record_many")):
+            return self.backend.record_many(requests)
+
     def classify(self, *args, **kwargs):
         return self.__instrumented_method_call("classify", *args, **kwargs)
 
+    def classify_many(self, requests):
+        with timer(self.template.format("classify_many")):
+            return self.backend.classify_many(requests)
+
     def compare(self, *args, **kwargs):
         return self.__instrumented_method_call("compare", *args, **kwargs)
 
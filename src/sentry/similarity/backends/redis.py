@@ -2,6 +2,7 @@ import itertools
 import time
 
 from django.utils.encoding import force_text
+from rediscluster import RedisCluster
 
 from sentry.similarity.backends.abstract import AbstractIndexBackend
 from sentry.utils.compat import map, zip
@@ -32,14 +33,22 @@ class RedisScriptMinHashIndexBackend(AbstractIndexBackend):
         self.retention = retention
         self.candidate_set_limit = candidate_set_limit
 
-    def _build_signature_arguments(self, features):
-        if not features:
-            return [0] * self.bands
+    def _build_signature_arguments_many(self, feature_sets):
+        signatures = iter(
+            self.signature_builder.build_many([features for features in feature_sets if features])
+        )
 
-        arguments = []
-        for bucket in band(self.bands, self.signature_builder(features)):
-            arguments.extend([1, ",".join(map("{}".format, bucket)), 1])
-        return arguments
+        rv = []
+        for features in feature_sets:
+            if not features:
+                rv.append([0] * self.bands)
+                continue
+
+            arguments = []
+            for bucket in band(self.bands, next(signatures)):
+                arguments.extend([1, ",".join(map("{}".format, bucket)), 1])
+            rv.append(arguments)
+        return rv
 
     def __index(self, scope, args):
         # scope must be passed into the script call as a key to allow the
@@ -48,6 +57,40 @@ class RedisScriptMinHashIndexBackend(AbstractIndexBackend):
         # all redis operations.
         return index(self.cluster, [scope], args)
 
+    def __index_many(self, requests):
+        # Every key that is accessed by a script invocation has to be located
+        # on the same cluster slot, so requests are batched by the slot of
+        # their scope rather than by host.
+        batches = {}
+        for i, (scope, arguments) in enumerate(requests):
+            if isinstance(self.cluster, RedisCluster):
+                slot = self.cluster.connection_pool.nodes.keyslot(scope)
+            else:
+                slot = None
+            batches.setdefault(slot, []).append((i, scope, arguments))
+
+        responses = [None] * len(requests)
+        for batch in batches.values():
+            _, scope, arguments = batch[0]
+            batch_arguments = [
+                "BATCH",
+                arguments[1],
+                self.namespace,
+                self.bands,
+                self.interval,
+                self.retention,
+                self.candidate_set_limit,
+                scope,
+            ]
+            for _, _, arguments in batch:
+                batch_arguments.append(len(arguments))
+                batch_arguments.extend(arguments)
+
+            for (i, _, _), response in zip(batch, self.__index(scope, batch_arguments)):
+                responses[i] = response
+
+        return responses
+
     def _as_search_result(self, results):
         score_replacements = {
             -1.0: None,  # both items don't have the feature (no comparison)
@@ -74,10 +117,7 @@ class RedisScriptMinHashIndexBackend(AbstractIndexBackend):
 
         return sorted(map(decode_search_result, results), key=get_comparison_key)
 
-    def classify(self, scope, items, limit=None, timestamp=None):
-        if timestamp is None:
-            timestamp = int(time.time())
-
+    def __get_classify_arguments(self, scope, items, limit, timestamp, signature_arguments):
         arguments = [
             "CLASSIFY",
             timestamp,
@@ -90,12 +130,50 @@ class RedisScriptMinHashIndexBackend(AbstractIndexBackend):
             limit if limit is not None else -1,
         ]
 
-        for idx, threshold, features in items:
+        for (idx, threshold, _), signature in zip(items, signature_arguments):
             arguments.extend([idx, threshold])
-            arguments.extend(self._build_signature_arguments(features))
+            arguments.extend(signature)
+
+        return arguments
+
+    def classify(self, scope, items, limit=None, timestamp=None):
+        if timestamp is None:
+            timestamp = int(time.time())
+
+        signature_arguments = self._build_signature_arguments_many(
+            [features for _, _, features in items]
+        )
+        arguments = self.__get_classify_arguments(
+            scope, items, limit, timestamp, signature_arguments
+        )
 
         return self._as_search_result(self.__index(scope, arguments))
 
+    def classify_many(self, requests):
+        if not requests:
+            return []
+
+        default_timestamp = int(time.time())
+
+        signature_arguments = iter(
+            self._build_signature_arguments_many(
+                [features for _, items, _, _ in requests for _, _, features in items]
+            )
+        )
+
+        index_requests = []
+        for scope, items, limit, timestamp in requests:
+            arguments = self.__get_classify_arguments(
+                scope,
+                items,
+                limit,
+                timestamp if timestamp is not None else default_timestamp,
+                [next(signature_arguments) for _ in items],
+            )
+            index_requests.append((scope, arguments))
+
+        return map(self._as_search_result, self.__index_many(index_requests))
+
     def compare(self, scope, key, items, limit=None, timestamp=None):
         if timestamp is None:
             timestamp = int(time.time())
@@ -118,13 +196,7 @@ class RedisScriptMinHashIndexBackend(AbstractIndexBackend):
 
         return self._as_search_result(self.__index(scope, arguments))
 
-    def record(self, scope, key, items, timestamp=None):
-        if not items:
-            return  # nothing to do
-
-        if timestamp is None:
-            timestamp = int(time.time())
-
+    def __get_record_arguments(self, scope, key, items, timestamp, signature_arguments):
         arguments = [
             "RECORD",
             timestamp,
@@ -137,12 +209,57 @@ class RedisScriptMinHashIndexBackend(AbstractIndexBackend):
             key,
         ]
 
-        for idx, features in items:
+        for (idx, _), signature in zip(items, signature_arguments):
             arguments.append(idx)
-            arguments.extend(self._build_signature_arguments(features))
+            arguments.extend(signature)
+
+        return arguments
+
+    def record(self, scope, key, items, timestamp=None):
+        if not items:
+            return  # nothing to do
+
+        if timestamp is None:
+            timestamp = int(time.time())
+
+        signature_arguments = self._build_signature_arguments_many(
+            [features for _, features in items]
+        )
+        arguments = self.__get_record_arguments(scope, key, items, timestamp, signature_arguments)
 
         return self.__index(scope, arguments)
 
+    def record_many(self, requests):
+        default_timestamp = int(time.time())
+
+        signature_arguments = iter(
+            self._build_signature_arguments_many(
+                [features for _, _, items, _ in requests for _, features in items]
+            )
+        )
+
+        positions = []
+        index_requests = []
+        for i, (scope, key, items, timestamp) in enumerate(requests):
+            if not items:
+                continue  # nothing to do
+
+            arguments = self.__get_record_arguments(
+                scope,
+                key,
+                items,
+                timestamp if timestamp is not None else default_timestamp,
+                [next(signature_arguments) for _ in items],
+            )
+            positions.append(i)
+            index_requests.append((scope, arguments))
+
+        responses = [None] * len(requests)
+        if index_requests:
+            for i, response in zip(positions, self.__index_many(index_requests)):
+                responses[i] = response
+        return responses
+
     def merge(self, scope, destination, items, timestamp=None):
         if timestamp is None:
             timestamp = int(time.time())
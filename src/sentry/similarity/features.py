@@ -95,6 +95,23 @@ class FeatureSet:
                 )
         return results
 
+    def __encode(self, event, label, features):
+        try:
+            return map(self.encoder.dumps, features)
+        except Exception as error:
+            log = (
+                logger.debug
+                if isinstance(error, self.expected_encoding_errors)
+                else functools.partial(logger.warning, exc_info=True)
+            )
+            log(
+                "Could not encode features from %r for %r due to error: %r",
+                event,
+                label,
+                error,
+            )
+            return None
+
     def record(self, events):
         if not events:
             return []
@@ -121,26 +138,40 @@ class FeatureSet:
                         self.__get_key(event.group) == key
                     ), "all events must be associated with the same group"
 
-                try:
-                    features = map(self.encoder.dumps, features)
-                except Exception as error:
-                    log = (
-                        logger.debug
-                        if isinstance(error, self.expected_encoding_errors)
-                        else functools.partial(logger.warning, exc_info=True)
-                    )
-                    log(
-                        "Could not encode features from %r for %r due to error: %r",
-                        event,
-                        label,
-                        error,
-                    )
-                else:
-                    if features:
-                        items.append((self.aliases[label], features))
+                features = self.__encode(event, label, features)
+                if features:
+                    items.append((self.aliases[label], features))
 
         return self.index.record(scope, key, items, timestamp=int(to_timestamp(event.datetime)))
 
+    def record_many(self, events):
+        """
+        Records events that may belong to any number of groups and projects.
+        The signatures of all events are built at once, and the index is
+        updated with as few script invocations as possible.
+        """
+        requests = []
+        for event in events:
+            if not event.group_id:
+                continue
+
+            items = []
+            for label, features in self.extract(event).items():
+                features = self.__encode(event, label, features)
+                if features:
+                    items.append((self.aliases[label], features))
+
+            requests.append(
+                (
+                    self.__get_scope(event.project),
+                    self.__get_key(event.group),
+                    items,
+                    int(to_timestamp(event.datetime)),
+                )
+            )
+
+        return self.index.record_many(requests)
+
     def classify(self, events, limit=None, thresholds=None):
         if not events:
             return []
@@ -161,24 +192,10 @@ class FeatureSet:
                         self.__get_scope(event.project) == scope
                     ), "all events must be associated with the same project"
 
-                try:
-                    features = map(self.encoder.dumps, features)
-                except Exception as error:
-                    log = (
-                        logger.debug
-                        if isinstance(error, self.expected_encoding_errors)
-                        else functools.partial(logger.warning, exc_info=True)
-                    )
-                    log(
-                        "Could not encode features from %r for %r due to error: %r",
-                        event,
-                        label,
-                        error,
-                    )
-                else:
-                    if features:
-                        items.append((self.aliases[label], thresholds.get(label, 0), features))
-                        labels.append(label)
+                features = self.__encode(event, label, features)
+                if features:
+                    items.append((self.aliases[label], thresholds.get(label, 0), features))
+                    labels.append(label)
 
         return map(
             lambda key__scores: (int(key__scores[0]), dict(zip(labels, key__scores[1]))),
@@ -187,6 +204,36 @@ class FeatureSet:
             ),
         )
 
+    def classify_many(self, events, limit=None, thresholds=None):
+        """
+        Classifies each of the events (which may belong to different
+        projects) individually, returning the results in the order of the
+        events.
+        """
+        if thresholds is None:
+            thresholds = {}
+
+        requests = []
+        request_labels = []
+        for event in events:
+            labels = []
+            items = []
+            for label, features in self.extract(event).items():
+                features = self.__encode(event, label, features)
+                if features:
+                    items.append((self.aliases[label], thresholds.get(label, 0), features))
+                    labels.append(label)
+
+            requests.append(
+                (self.__get_scope(event.project), items, limit, int(to_timestamp(event.datetime)))
+            )
+            request_labels.append(labels)
+
+        return [
+            [(int(key), dict(zip(labels, scores))) for key, scores in results]
+            for labels, results in zip(request_labels, self.index.classify_many(requests))
+        ]
+
     def compare(self, group, limit=None, thresholds=None):
         if thresholds is None:
             thresholds = {}
@@ -1,17 +1,43 @@
 import mmh3
 
-from sentry.utils.compat import map
-
 
 class MinHashSignatureBuilder:
+    """\
+    Builds MinHash signatures of ``columns`` values in ``[0, rows)`` for sets
+    of features, using the MurmurHash3 of a feature seeded with the column
+    index as the hash function of each column.
+    """
+
     def __init__(self, columns, rows):
         self.columns = columns
         self.rows = rows
 
     def __call__(self, features):
-        return map(
-            lambda column: min(
-                map(lambda feature: mmh3.hash(feature, column) % self.rows, features)
-            ),
-            range(self.columns),
-        )
+        return self.build_many([features])[0]
+
+    def build_many(self, feature_sets):
+        """\
+        Builds the signatures of many feature sets at once. Every distinct
+        feature is hashed only once, no matter how many sets contain it.
+        """
+        columns = range(self.columns)
+        rows = self.rows
+
+        hashes = {}
+        signatures = []
+        for features in feature_sets:
+            feature_hashes = []
+            for feature in set(features):
+                value = hashes.get(feature)
+                if value is None:
+                    value = hashes[feature] = [
+                        mmh3.hash(feature, column) % rows for column in columns
+                    ]
+                feature_hashes.append(value)
+
+            if not feature_hashes:
+                raise ValueError("cannot build the signature of an empty feature set")
+
+            signatures.append([min(column) for column in zip(*feature_hashes)])
+
+        return signatures
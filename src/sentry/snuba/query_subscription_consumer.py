@@ -1,6 +1,7 @@
 import logging
+from collections import defaultdict
 from random import random
-from typing import Any, Callable, Dict, Iterable, List, Optional, cast
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, cast
 
 import jsonschema
 import pytz
@@ -20,8 +21,12 @@ from sentry.utils.batching_kafka_consumer import wait_for_topics
 logger = logging.getLogger(__name__)
 
 TQuerySubscriptionCallable = Callable[[Dict[str, Any], QuerySubscription], None]
+TQuerySubscriptionBatchCallable = Callable[
+    [Sequence[Tuple[Dict[str, Any], QuerySubscription]]], None
+]
 
 subscriber_registry: Dict[str, TQuerySubscriptionCallable] = {}
+batch_subscriber_registry: Dict[str, TQuerySubscriptionBatchCallable] = {}
 
 
 def register_subscriber(
@@ -36,6 +41,25 @@ def register_subscriber(
     return inner
 
 
+def register_batch_subscriber(
+    subscriber_key: str,
+) -> Callable[[TQuerySubscriptionBatchCallable], TQuerySubscriptionBatchCallable]:
+    """
+    Registers a callback that receives all updates of a batch for subscriptions of
+    ``subscriber_key`` at once, as a list of ``(subscription_update, subscription)``
+    pairs in the order of their messages. A regular subscriber has to be registered
+    for the same key as well, since it is used when messages are not batched.
+    """
+
+    def inner(func: TQuerySubscriptionBatchCallable) -> TQuerySubscriptionBatchCallable:
+        if subscriber_key in batch_subscriber_registry:
+            raise Exception("Batch handler already registered for %s" % subscriber_key)
+        batch_subscriber_registry[subscriber_key] = func
+        return func
+
+    return inner
+
+
 class InvalidMessageError(Exception):
     pass
 
@@ -62,6 +86,8 @@ class QuerySubscriptionConsumer:
         group_id: str,
         topic: Optional[str] = None,
         commit_batch_size: int = 100,
+        max_batch_size: int = 1,
+        max_batch_time: float = 1.0,
         initial_offset_reset: str = "earliest",
         force_offset_reset: Optional[str] = None,
     ):
@@ -73,6 +99,8 @@ class QuerySubscriptionConsumer:
         self.topic = topic
         cluster_name: str = settings.KAFKA_TOPICS[topic]["cluster"]
         self.commit_batch_size = commit_batch_size
+        self.max_batch_size = max_batch_size
+        self.max_batch_time = max_batch_time
         self.initial_offset_reset = initial_offset_reset
         self.offsets: Dict[int, Optional[int]] = {}
         self.consumer: Consumer = None
@@ -161,31 +189,45 @@ class QuerySubscriptionConsumer:
 
         self.consumer.subscribe([self.topic], on_assign=on_assign, on_revoke=on_revoke)
 
-        i = 0
+        uncommitted = 0
         while not self.__shutdown_requested:
-            message = self.consumer.poll(0.1)
-            if message is None:
+            if self.max_batch_size > 1:
+                messages = self.consumer.consume(self.max_batch_size, self.max_batch_time)
+            else:
+                message = self.consumer.poll(0.1)
+                messages = [message] if message is not None else []
+            if not messages:
                 continue
 
-            error = message.error()
-            if error is not None:
-                raise KafkaException(error)
-
-            i = i + 1
-
-            with sentry_sdk.start_transaction(
-                op="handle_message",
-                name="query_subscription_consumer_process_message",
-                sampled=random() <= options.get("subscriptions-query.sample-rate"),
-            ), metrics.timer("snuba_query_subscriber.handle_message"):
-                self.handle_message(message)
+            for message in messages:
+                error = message.error()
+                if error is not None:
+                    raise KafkaException(error)
+
+            if len(messages) == 1:
+                with sentry_sdk.start_transaction(
+                    op="handle_message",
+                    name="query_subscription_consumer_process_message",
+                    sampled=random() <= options.get("subscriptions-query.sample-rate"),
+                ), metrics.timer("snuba_query_subscriber.handle_message"):
+                    self.handle_message(messages[0])
+            else:
+                with sentry_sdk.start_transaction(
+                    op="handle_messages",
+                    name="query_subscription_consumer_process_messages",
+                    sampled=random() <= options.get("subscriptions-query.sample-rate"),
+                ), metrics.timer("snuba_query_subscriber.handle_messages"):
+                    self.handle_messages(messages)
 
             # Track latest completed message here, for use in `shutdown` handler.
-            self.offsets[message.partition()] = message.offset() + 1
+            for message in messages:
+                self.offsets[message.partition()] = message.offset() + 1
 
-            if i % self.commit_batch_size == 0:
+            uncommitted += len(messages)
+            if uncommitted >= self.commit_batch_size:
                 logger.debug("Committing offsets")
                 self.commit_offsets()
+                uncommitted = 0
 
         logger.debug("Committing offsets and closing consumer")
         self.commit_offsets()
@@ -222,79 +264,162 @@ class QuerySubscriptionConsumer:
         :return:
         """
         with sentry_sdk.push_scope() as scope:
-            try:
-                with metrics.timer("snuba_query_subscriber.parse_message_value"):
-                    contents = self.parse_message_value(message.value())
-            except InvalidMessageError:
-                # If the message is in an invalid format, just log the error
-                # and continue
-                logger.exception(
-                    "Subscription update could not be parsed",
-                    extra={
-                        "offset": message.offset(),
-                        "partition": message.partition(),
-                        "value": message.value(),
-                    },
-                )
+            contents = self.parse_message(message)
+            if contents is None:
                 return
             scope.set_tag("query_subscription_id", contents["subscription_id"])
 
+            subscription: Optional[QuerySubscription]
             try:
                 with metrics.timer("snuba_query_subscriber.fetch_subscription"):
-                    subscription: QuerySubscription = QuerySubscription.objects.get_from_cache(
+                    subscription = QuerySubscription.objects.get_from_cache(
                         subscription_id=contents["subscription_id"]
                     )
-                    if subscription.status != QuerySubscription.Status.ACTIVE.value:
-                        metrics.incr("snuba_query_subscriber.subscription_inactive")
-                        return
             except QuerySubscription.DoesNotExist:
-                metrics.incr("snuba_query_subscriber.subscription_doesnt_exist")
-                logger.error(
-                    "Received subscription update, but subscription does not exist",
-                    extra={
-                        "offset": message.offset(),
-                        "partition": message.partition(),
-                        "value": message.value(),
-                    },
-                )
-                try:
-                    _delete_from_snuba(
-                        self.topic_to_dataset[message.topic()], contents["subscription_id"]
-                    )
-                except Exception:
-                    logger.exception("Failed to delete unused subscription from snuba.")
+                subscription = None
+
+            subscription = self.validate_subscription(message, contents, subscription)
+            if subscription is None:
                 return
 
-            if subscription.type not in subscriber_registry:
-                metrics.incr("snuba_query_subscriber.subscription_type_not_registered")
-                logger.error(
-                    "Received subscription update, but no subscription handler registered",
-                    extra={
-                        "offset": message.offset(),
-                        "partition": message.partition(),
-                        "value": message.value(),
-                    },
+            self.run_callback(message, contents, subscription)
+
+    def handle_messages(self, messages: Sequence[Message]) -> None:
+        """
+        Handles a batch of messages like `handle_message`, but fetches the subscriptions of
+        all messages at once. Updates for subscription types that registered a batch callback
+        are passed to it together, all other updates are passed to their callback one by one.
+        :param messages:
+        :return:
+        """
+        parsed_messages: List[Tuple[Message, Dict[str, Any]]] = []
+        for message in messages:
+            contents = self.parse_message(message)
+            if contents is not None:
+                parsed_messages.append((message, contents))
+
+        with metrics.timer("snuba_query_subscriber.fetch_subscriptions"):
+            subscriptions = {
+                subscription.subscription_id: subscription
+                for subscription in QuerySubscription.objects.get_many_from_cache(
+                    list({contents["subscription_id"] for _, contents in parsed_messages}),
+                    key="subscription_id",
                 )
-                return
+            }
 
-            sentry_sdk.set_tag("project_id", subscription.project_id)
-            sentry_sdk.set_tag("query_subscription_id", contents["subscription_id"])
+        batches: Dict[str, List[Tuple[Dict[str, Any], QuerySubscription]]] = defaultdict(list)
+        for message, contents in parsed_messages:
+            subscription = self.validate_subscription(
+                message, contents, subscriptions.get(contents["subscription_id"])
+            )
+            if subscription is None:
+                continue
 
-            callback = subscriber_registry[subscription.type]
-            with sentry_sdk.start_span(op="process_message") as span, metrics.timer(
-                "snuba_query_subscriber.callback.duration", instance=subscription.type
+            if subscription.type in batch_subscriber_registry:
+                batches[subscription.type].append((contents, subscription))
+            else:
+                with sentry_sdk.push_scope() as scope:
+                    scope.set_tag("query_subscription_id", contents["subscription_id"])
+                    self.run_callback(message, contents, subscription)
+
+        for subscription_type, updates in batches.items():
+            callback = batch_subscriber_registry[subscription_type]
+            with sentry_sdk.start_span(op="process_messages") as span, metrics.timer(
+                "snuba_query_subscriber.batch_callback.duration", instance=subscription_type
             ):
-                span.set_data("payload", contents)
-                span.set_data("subscription_dataset", subscription.snuba_query.dataset)
-                span.set_data("subscription_query", subscription.snuba_query.query)
-                span.set_data("subscription_aggregation", subscription.snuba_query.aggregate)
-                span.set_data("subscription_time_window", subscription.snuba_query.time_window)
-                span.set_data("subscription_resolution", subscription.snuba_query.resolution)
-                span.set_data("message_offset", message.offset())
-                span.set_data("message_partition", message.partition())
-                span.set_data("message_value", message.value())
-
-                callback(contents, subscription)
+                span.set_data("subscription_type", subscription_type)
+                span.set_data("update_count", len(updates))
+                callback(updates)
+
+    def parse_message(self, message: Message) -> Optional[Dict[str, Any]]:
+        """
+        Parses the value of a message, logging the error and returning `None` if it is
+        invalid.
+        """
+        try:
+            with metrics.timer("snuba_query_subscriber.parse_message_value"):
+                return self.parse_message_value(message.value())
+        except InvalidMessageError:
+            # If the message is in an invalid format, just log the error
+            # and continue
+            logger.exception(
+                "Subscription update could not be parsed",
+                extra={
+                    "offset": message.offset(),
+                    "partition": message.partition(),
+                    "value": message.value(),
+                },
+            )
+            return None
+
+    def validate_subscription(
+        self,
+        message: Message,
+        contents: Dict[str, Any],
+        subscription: Optional[QuerySubscription],
+    ) -> Optional[QuerySubscription]:
+        """
+        Returns the subscription if the update should be passed on to its callback, and
+        `None` otherwise. Logs metrics/errors and removes subscriptions from snuba that no
+        longer exist.
+        """
+        if subscription is None:
+            metrics.incr("snuba_query_subscriber.subscription_doesnt_exist")
+            logger.error(
+                "Received subscription update, but subscription does not exist",
+                extra={
+                    "offset": message.offset(),
+                    "partition": message.partition(),
+                    "value": message.value(),
+                },
+            )
+            try:
+                _delete_from_snuba(
+                    self.topic_to_dataset[message.topic()], contents["subscription_id"]
+                )
+            except Exception:
+                logger.exception("Failed to delete unused subscription from snuba.")
+            return None
+
+        if subscription.status != QuerySubscription.Status.ACTIVE.value:
+            metrics.incr("snuba_query_subscriber.subscription_inactive")
+            return None
+
+        if subscription.type not in subscriber_registry:
+            metrics.incr("snuba_query_subscriber.subscription_type_not_registered")
+            logger.error(
+                "Received subscription update, but no subscription handler registered",
+                extra={
+                    "offset": message.offset(),
+                    "partition": message.partition(),
+                    "value": message.value(),
+                },
+            )
+            return None
+
+        return subscription
+
+    def run_callback(
+        self, message: Message, contents: Dict[str, Any], subscription: QuerySubscription
+    ) -> None:
+        sentry_sdk.set_tag("project_id", subscription.project_id)
+        sentry_sdk.set_tag("query_subscription_id", contents["subscription_id"])
+
+        callback = subscriber_registry[subscription.type]
+        with sentry_sdk.start_span(op="process_message") as span, metrics.timer(
+            "snuba_query_subscriber.callback.duration", instance=subscription.type
+        ):
+            span.set_data("payload", contents)
+            span.set_data("subscription_dataset", subscription.snuba_query.dataset)
+            span.set_data("subscription_query", subscription.snuba_query.query)
+            span.set_data("subscription_aggregation", subscription.snuba_query.aggregate)
+            span.set_data("subscription_time_window", subscription.snuba_query.time_window)
+            span.set_data("subscription_resolution", subscription.snuba_query.resolution)
+            span.set_data("message_offset", message.offset())
+            span.set_data("message_partition", message.partition())
+            span.set_data("message_value", message.value())
+
+            callback(contents, subscription)
 
     def parse_message_value(self, value: str) -> Dict[str, Any]:
         """
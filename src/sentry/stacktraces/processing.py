@@ -7,12 +7,15 @@ from django.utils import timezone
 
 from sentry.models import Project, Release
 from sentry.stacktraces.functions import set_in_app, trim_function_name
+from sentry.utils import metrics
 from sentry.utils.cache import cache
 from sentry.utils.hashlib import hash_values
 from sentry.utils.safe import get_path, safe_execute
 
 logger = logging.getLogger(__name__)
 
+FRAME_CACHE_TIMEOUT = 3600
+
 StacktraceInfo = namedtuple(
     "StacktraceInfo", ["stacktrace", "container", "platforms", "is_exception"]
 )
@@ -64,7 +67,7 @@ class ProcessableFrame:
 
     def set_cache_value(self, value):
         if self.cache_key is not None:
-            cache.set(self.cache_key, value, 3600)
+            cache.set(self.cache_key, value, FRAME_CACHE_TIMEOUT)
             return True
         return False
 
@@ -441,10 +444,27 @@ def get_crash_frame_from_event_data(data, frame_filter=None):
 
 
 def lookup_frame_cache(keys):
-    rv = {}
-    for key in keys:
-        rv[key] = cache.get(key)
-    return rv
+    """Looks up the cached values of the given frame cache keys with a single
+    round trip.  Keys that are not cached are missing from the result.
+    """
+    if not keys:
+        return {}
+    return cache.get_many(list(keys))
+
+
+def set_frame_cache_values(processable_frames):
+    """Stores the ``cache_value`` of all given processable frames that have a
+    cache key and value with a single round trip.  This is the batched version
+    of `ProcessableFrame.set_cache_value`.
+    """
+    values = {
+        frame.cache_key: frame.cache_value
+        for frame in processable_frames
+        if frame.cache_key is not None and frame.cache_value is not None
+    }
+    if values:
+        cache.set_many(values, FRAME_CACHE_TIMEOUT)
+    return len(values)
 
 
 def get_stacktrace_processing_task(infos, processors):
@@ -471,8 +491,22 @@ def get_stacktrace_processing_task(infos, processors):
                 to_lookup[processable_frame.cache_key] = processable_frame
 
     frame_cache = lookup_frame_cache(to_lookup)
+    cache_results = {}
     for cache_key, processable_frame in to_lookup.items():
         processable_frame.cache_value = frame_cache.get(cache_key)
+        processor_results = cache_results.setdefault(
+            processable_frame.processor.__class__.__name__, {"hit": 0, "miss": 0}
+        )
+        processor_results["miss" if processable_frame.cache_value is None else "hit"] += 1
+
+    for processor_name, processor_results in cache_results.items():
+        for result, count in processor_results.items():
+            if count:
+                metrics.incr(
+                    "process_stacktraces.frame_cache",
+                    amount=count,
+                    tags={"processor": processor_name, "result": result},
+                )
 
     return StacktraceProcessingTask(
         processable_stacktraces=by_stacktrace_info, processors=by_processor
@@ -432,8 +432,7 @@ def repair_denormalizations(caches, project, events):
     repair_group_release_data(caches, project, events)
     repair_tsdb_data(caches, project, events)
 
-    for event in events:
-        similarity.record(project, [event])
+    similarity.record_many(events)
 
 
 def lock_hashes(project_id, source_id, fingerprints):
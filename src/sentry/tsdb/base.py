@@ -1,4 +1,4 @@
-from collections import OrderedDict
+from collections import OrderedDict, namedtuple
 from collections.abc import Callable
 from datetime import timedelta
 from enum import Enum
@@ -96,12 +96,71 @@ class TSDBModel(Enum):
     sentry_app_component_interacted = 801
 
 
+class TimeSeriesColumns(namedtuple("TimeSeriesColumns", "timestamps keys values")):
+    """
+    A dense, column oriented result of a range query: ``values[i][j]`` is the
+    value of ``keys[i]`` in the bucket starting at ``timestamps[j]``. All keys
+    share the same timestamps, buckets without data are zero.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_series(cls, timestamps, keys, results):
+        """
+        Builds columns from a mapping of key => [(timestamp, value), ...] as
+        returned by ``get_range``. Points outside of ``timestamps`` are
+        dropped.
+        """
+        index = {timestamp: i for i, timestamp in enumerate(timestamps)}
+        values = []
+        for key in keys:
+            row = [0] * len(timestamps)
+            for timestamp, value in results.get(key, ()):
+                i = index.get(timestamp)
+                if i is not None:
+                    row[i] = value
+            values.append(row)
+        return cls(list(timestamps), list(keys), values)
+
+    def to_series(self):
+        """
+        Returns the mapping of key => [(timestamp, value), ...] that is
+        returned by ``get_range``.
+        """
+        return {key: list(zip(self.timestamps, row)) for key, row in zip(self.keys, self.values)}
+
+
+def get_distinct_counter_item(item):
+    """
+    Unpacks an item passed to ``record_multi`` into a ``(model, key, values,
+    options)`` tuple.
+    """
+    if len(item) == 3:
+        model, key, values = item
+        return model, key, values, {}
+    return item
+
+
+def get_frequency_request(request):
+    """
+    Unpacks a request passed to ``record_frequency_multi`` into a ``(model,
+    request, options)`` tuple.
+    """
+    if len(request) == 2:
+        model, request = request
+        return model, request, {}
+    return request
+
+
 class BaseTSDB(Service):
     __read_methods__ = frozenset(
         [
             "get_range",
+            "get_range_columns",
             "get_sums",
             "get_distinct_counts_series",
+            "get_distinct_counts_series_columns",
             "get_distinct_counts_totals",
             "get_distinct_counts_union",
             "get_most_frequent",
@@ -318,6 +377,9 @@ class BaseTSDB(Service):
 
         >>> incr_multi([(TimeSeriesModel.project, 1, {"timestamp": ...}),
         ...             (TimeSeriesModel.group, 5, {"timestamp": ...})])
+
+        Individual items may also override ``count`` and ``environment_id``,
+        so that increments of a whole batch of events can be recorded at once.
         """
         for item in items:
             if len(item) == 2:
@@ -331,7 +393,7 @@ class BaseTSDB(Service):
                 key,
                 timestamp=options.get("timestamp", timestamp),
                 count=options.get("count", count),
-                environment_id=environment_id,
+                environment_id=options.get("environment_id", environment_id),
             )
 
     def merge(self, model, destination, sources, timestamp=None, environment_ids=None):
@@ -361,6 +423,25 @@ class BaseTSDB(Service):
         """
         raise NotImplementedError
 
+    def get_range_columns(
+        self, model, keys, start, end, rollup=None, environment_ids=None, use_cache=False
+    ):
+        """
+        Like ``get_range``, but returns ``TimeSeriesColumns`` with all keys
+        aligned to the same rollup buckets.
+        """
+        rollup, series = self.get_optimal_rollup_series(start, end, rollup)
+        results = self.get_range(
+            model,
+            keys,
+            start,
+            end,
+            rollup,
+            environment_ids=environment_ids,
+            use_cache=use_cache,
+        )
+        return TimeSeriesColumns.from_series(series, keys, results)
+
     def get_sums(self, model, keys, start, end, rollup=None, environment_id=None, use_cache=False):
         range_set = self.get_range(
             model,
@@ -402,9 +483,20 @@ class BaseTSDB(Service):
     def record_multi(self, items, timestamp=None, environment_id=None):
         """
         Record occurrence of items in multiple distinct counters.
+
+        Items are ``(model, key, values)`` tuples, optionally followed by a
+        dictionary that overrides ``timestamp`` and ``environment_id`` for
+        this item.
         """
-        for model, key, values in items:
-            self.record(model, key, values, timestamp, environment_id=environment_id)
+        for item in items:
+            model, key, values, options = get_distinct_counter_item(item)
+            self.record(
+                model,
+                key,
+                values,
+                options.get("timestamp", timestamp),
+                environment_id=options.get("environment_id", environment_id),
+            )
 
     def get_distinct_counts_series(
         self, model, keys, start, end=None, rollup=None, environment_id=None
@@ -414,6 +506,19 @@ class BaseTSDB(Service):
         """
         raise NotImplementedError
 
+    def get_distinct_counts_series_columns(
+        self, model, keys, start, end=None, rollup=None, environment_id=None
+    ):
+        """
+        Like ``get_distinct_counts_series``, but returns ``TimeSeriesColumns``
+        with all keys aligned to the same rollup buckets.
+        """
+        rollup, series = self.get_optimal_rollup_series(start, end, rollup)
+        results = self.get_distinct_counts_series(
+            model, keys, start, end, rollup, environment_id=environment_id
+        )
+        return TimeSeriesColumns.from_series(series, keys, results)
+
     def get_distinct_counts_totals(
         self,
         model,
@@ -461,6 +566,9 @@ class BaseTSDB(Service):
 
         Metrics to increment should be passed as sequence pairs, using this
         structure: ``(model, {key: {item: score, ...}, ...})``
+
+        A dictionary that overrides ``timestamp`` and ``environment_id`` for
+        a request may be passed as a third element.
         """
         raise NotImplementedError
 
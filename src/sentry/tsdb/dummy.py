@@ -1,4 +1,4 @@
-from sentry.tsdb.base import BaseTSDB
+from sentry.tsdb.base import BaseTSDB, get_frequency_request
 
 
 class DummyTSDB(BaseTSDB):
@@ -67,7 +67,11 @@ class DummyTSDB(BaseTSDB):
         self.validate_arguments(models, environment_ids)
 
     def record_frequency_multi(self, requests, timestamp=None, environment_id=None):
-        self.validate_arguments([model for model, request in requests], [environment_id])
+        requests = [get_frequency_request(request) for request in requests]
+        self.validate_arguments(
+            [model for model, request, options in requests],
+            [options.get("environment_id", environment_id) for model, request, options in requests],
+        )
 
     def get_most_frequent(
         self, model, keys, start, end=None, rollup=None, limit=None, environment_id=None
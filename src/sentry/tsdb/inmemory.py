@@ -2,7 +2,7 @@ from collections import Counter, defaultdict
 
 from django.utils import timezone
 
-from sentry.tsdb.base import BaseTSDB
+from sentry.tsdb.base import BaseTSDB, get_frequency_request
 from sentry.utils.compat import map
 from sentry.utils.dates import to_datetime, to_timestamp
 
@@ -199,20 +199,25 @@ class InMemoryTSDB(BaseTSDB):
         self.frequencies = defaultdict(lambda: defaultdict(lambda: defaultdict(Counter)))
 
     def record_frequency_multi(self, requests, timestamp=None, environment_id=None):
-        environment_ids = {environment_id, None}
+        requests = [get_frequency_request(request) for request in requests]
 
-        self.validate_arguments([model for model, request in requests], [environment_id])
+        self.validate_arguments(
+            [model for model, request, options in requests],
+            [options.get("environment_id", environment_id) for model, request, options in requests],
+        )
 
         if timestamp is None:
             timestamp = timezone.now()
 
-        for model, request in requests:
+        for model, request, options in requests:
+            request_timestamp = options.get("timestamp", timestamp)
+            environment_ids = {options.get("environment_id", environment_id), None}
             for key, items in request.items():
                 items = {k: float(v) for k, v in items.items()}
-                for environment_id in environment_ids:
-                    source = self.frequencies[model][(key, environment_id)]
+                for request_environment_id in environment_ids:
+                    source = self.frequencies[model][(key, request_environment_id)]
                     for rollup in self.rollups:
-                        source[self.normalize_to_rollup(timestamp, rollup)].update(items)
+                        source[self.normalize_to_rollup(request_timestamp, rollup)].update(items)
 
     def get_most_frequent(
         self, model, keys, start, end=None, rollup=None, limit=None, environment_id=None
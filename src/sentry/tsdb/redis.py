@@ -11,7 +11,12 @@ from django.utils import timezone
 from django.utils.encoding import force_bytes
 from pkg_resources import resource_string
 
-from sentry.tsdb.base import BaseTSDB
+from sentry.tsdb.base import (
+    BaseTSDB,
+    TimeSeriesColumns,
+    get_distinct_counter_item,
+    get_frequency_request,
+)
 from sentry.utils.compat import crc32, map, zip
 from sentry.utils.dates import to_datetime, to_timestamp
 from sentry.utils.redis import SentryScript, check_cluster_versions, get_cluster_from_options
@@ -211,54 +216,89 @@ class RedisTSDB(BaseTSDB):
 
         >>> incr_multi([(TimeSeriesModel.project, 1, {"timestamp": ...}),
         ...             (TimeSeriesModel.group, 5, {"timestamp": ...})])
+
+        Increments of all items are merged before they are written, so that
+        every hash field is incremented (and every hash key expired) only
+        once per call, with one pipeline per host.
         """
 
         default_timestamp = timestamp
         default_count = count
 
-        self.validate_arguments([item[0] for item in items], [environment_id])
-
         if default_timestamp is None:
             default_timestamp = timezone.now()
 
-        for (cluster, durable), environment_ids in self.get_cluster_groups({None, environment_id}):
-            manager = cluster.map()
-            if not durable:
-                manager = SuppressionWrapper(manager)
+        requests = []
+        for item in items:
+            if len(item) == 2:
+                model, key = item
+                options = {}
+            else:
+                model, key, options = item
 
-            with manager as client:
-                # (hash_key, hash_field) -> count
-                key_operations = defaultdict(lambda: 0)
-                # (hash_key) -> "max expiration encountered"
-                key_expiries = defaultdict(lambda: 0.0)
+            requests.append(
+                (
+                    model,
+                    key,
+                    options.get("count", default_count),
+                    options.get("timestamp", default_timestamp),
+                    options.get("environment_id", environment_id),
+                )
+            )
 
-                for rollup, max_values in self.rollups.items():
-                    for item in items:
-                        if len(item) == 2:
-                            model, key = item
-                            options = {}
-                        else:
-                            model, key, options = item
+        self.validate_arguments(
+            [request[0] for request in requests], [request[4] for request in requests]
+        )
 
-                        count = options.get("count", default_count)
-                        timestamp = options.get("timestamp", default_timestamp)
+        get_cluster = self._get_cluster_cache()
 
-                        expiry = self.calculate_expiry(rollup, max_values, timestamp)
+        # cluster -> (hash_key, hash_field) -> count
+        key_operations = defaultdict(lambda: defaultdict(lambda: 0))
+        # cluster -> (hash_key) -> "max expiration encountered"
+        key_expiries = defaultdict(lambda: defaultdict(lambda: 0.0))
 
-                        for environment_id in environment_ids:
-                            hash_key, hash_field = self.make_counter_key(
-                                model, rollup, timestamp, key, environment_id
-                            )
+        for rollup, max_values in self.rollups.items():
+            for model, key, count, timestamp, item_environment_id in requests:
+                expiry = self.calculate_expiry(rollup, max_values, timestamp)
+
+                for environment_id in {None, item_environment_id}:
+                    cluster = get_cluster(environment_id)
+                    hash_key, hash_field = self.make_counter_key(
+                        model, rollup, timestamp, key, environment_id
+                    )
+
+                    if key_expiries[cluster][hash_key] < expiry:
+                        key_expiries[cluster][hash_key] = expiry
 
-                            if key_expiries[hash_key] < expiry:
-                                key_expiries[hash_key] = expiry
+                    key_operations[cluster][(hash_key, hash_field)] += count
 
-                            key_operations[(hash_key, hash_field)] += count
+        for (cluster, durable), operations in key_operations.items():
+            manager = cluster.map()
+            if not durable:
+                manager = SuppressionWrapper(manager)
 
-                for (hash_key, hash_field), count in key_operations.items():
+            expiries = key_expiries[(cluster, durable)]
+            with manager as client:
+                for (hash_key, hash_field), count in operations.items():
                     client.hincrby(hash_key, hash_field, count)
-                    if key_expiries.get(hash_key):
-                        client.expireat(hash_key, key_expiries.pop(hash_key))
+                    if expiries.get(hash_key):
+                        client.expireat(hash_key, expiries.pop(hash_key))
+
+    def _get_cluster_cache(self):
+        """
+        Returns a memoized version of ``get_cluster`` for use while batching
+        writes for many environments.
+        """
+        clusters = {}
+
+        def get_cluster(environment_id):
+            try:
+                return clusters[environment_id]
+            except KeyError:
+                rv = clusters[environment_id] = self.get_cluster(environment_id)
+                return rv
+
+        return get_cluster
 
     def get_range(
         self, model, keys, start, end, rollup=None, environment_ids=None, use_cache=False
@@ -271,6 +311,13 @@ class RedisTSDB(BaseTSDB):
         >>>          start=now - timedelta(days=1),
         >>>          end=now)
         """
+        return self.get_range_columns(
+            model, keys, start, end, rollup, environment_ids, use_cache
+        ).to_series()
+
+    def get_range_columns(
+        self, model, keys, start, end, rollup=None, environment_ids=None, use_cache=False
+    ):
         # redis backend doesn't support multiple envs
         if environment_ids is not None and len(environment_ids) > 1:
             raise NotImplementedError
@@ -280,26 +327,26 @@ class RedisTSDB(BaseTSDB):
 
         rollup, series = self.get_optimal_rollup_series(start, end, rollup)
         series = map(to_datetime, series)
+        keys = list(keys)
 
-        results = []
+        promises = []
         cluster, _ = self.get_cluster(environment_id)
         with cluster.map() as client:
             for key in keys:
-                for timestamp in series:
-                    hash_key, hash_field = self.make_counter_key(
-                        model, rollup, timestamp, key, environment_id
-                    )
-                    results.append(
-                        (to_timestamp(timestamp), key, client.hget(hash_key, hash_field))
-                    )
-
-        results_by_key = defaultdict(dict)
-        for epoch, key, count in results:
-            results_by_key[key][epoch] = int(count.value or 0)
+                promises.append(
+                    [
+                        client.hget(
+                            *self.make_counter_key(model, rollup, timestamp, key, environment_id)
+                        )
+                        for timestamp in series
+                    ]
+                )
 
-        for key, points in results_by_key.items():
-            results_by_key[key] = sorted(points.items())
-        return dict(results_by_key)
+        return TimeSeriesColumns(
+            [to_timestamp(timestamp) for timestamp in series],
+            keys,
+            [[int(promise.value or 0) for promise in row] for row in promises],
+        )
 
     def merge(self, model, destination, sources, timestamp=None, environment_ids=None):
         environment_ids = (set(environment_ids) if environment_ids is not None else set()).union(
@@ -384,26 +431,53 @@ class RedisTSDB(BaseTSDB):
         """
         Record an occurrence of an item in a distinct counter.
         """
-        self.validate_arguments([model for model, key, values in items], [environment_id])
+        items = [get_distinct_counter_item(item) for item in items]
+
+        self.validate_arguments(
+            [model for model, key, values, options in items],
+            [
+                options.get("environment_id", environment_id)
+                for model, key, values, options in items
+            ],
+        )
 
         if timestamp is None:
             timestamp = timezone.now()
 
-        ts = int(to_timestamp(timestamp))  # ``timestamp`` is not actually a timestamp :(
-
-        for (cluster, durable), environment_ids in self.get_cluster_groups({None, environment_id}):
+        get_cluster = self._get_cluster_cache()
+
+        # cluster -> key -> distinct counter key -> (values, "max expiration encountered")
+        operations = defaultdict(lambda: defaultdict(dict))
+
+        for model, key, values, options in items:
+            item_timestamp = options.get("timestamp", timestamp)
+            item_environment_id = options.get("environment_id", environment_id)
+            # ``timestamp`` is not actually a timestamp :(
+            ts = int(to_timestamp(item_timestamp))
+
+            for rollup, max_values in self.rollups.items():
+                expiry = self.calculate_expiry(rollup, max_values, item_timestamp)
+                for environment_id in {None, item_environment_id}:
+                    k = self.make_key(model, rollup, ts, key, environment_id)
+                    counters = operations[get_cluster(environment_id)][key]
+                    if k in counters:
+                        counter_values, counter_expiry = counters[k]
+                        counter_values.update(dict.fromkeys(values))
+                        counters[k] = (counter_values, max(counter_expiry, expiry))
+                    else:
+                        counters[k] = (dict.fromkeys(values), expiry)
+
+        for (cluster, durable), keys in operations.items():
             manager = cluster.fanout()
             if not durable:
                 manager = SuppressionWrapper(manager)
 
             with manager as client:
-                for model, key, values in items:
+                for key, counters in keys.items():
                     c = client.target_key(key)
-                    for rollup, max_values in self.rollups.items():
-                        for environment_id in environment_ids:
-                            k = self.make_key(model, rollup, ts, key, environment_id)
-                            c.pfadd(k, *values)
-                            c.expireat(k, self.calculate_expiry(rollup, max_values, timestamp))
+                    for k, (values, expiry) in counters.items():
+                        c.pfadd(k, *values)
+                        c.expireat(k, expiry)
 
     def get_distinct_counts_series(
         self, model, keys, start, end=None, rollup=None, environment_id=None
@@ -411,28 +485,33 @@ class RedisTSDB(BaseTSDB):
         """
         Fetch counts of distinct items for each rollup interval within the range.
         """
+        return self.get_distinct_counts_series_columns(
+            model, keys, start, end, rollup, environment_id
+        ).to_series()
+
+    def get_distinct_counts_series_columns(
+        self, model, keys, start, end=None, rollup=None, environment_id=None
+    ):
         self.validate_arguments([model], [environment_id])
 
         rollup, series = self.get_optimal_rollup_series(start, end, rollup)
+        keys = list(keys)
 
-        responses = {}
+        promises = []
         cluster, _ = self.get_cluster(environment_id)
         with cluster.fanout() as client:
             for key in keys:
                 c = client.target_key(key)
-                r = responses[key] = []
-                for timestamp in series:
-                    r.append(
-                        (
-                            timestamp,
-                            c.pfcount(self.make_key(model, rollup, timestamp, key, environment_id)),
-                        )
-                    )
+                promises.append(
+                    [
+                        c.pfcount(self.make_key(model, rollup, timestamp, key, environment_id))
+                        for timestamp in series
+                    ]
+                )
 
-        return {
-            key: [(timestamp, promise.value) for timestamp, promise in value]
-            for key, value in responses.items()
-        }
+        return TimeSeriesColumns(
+            list(series), keys, [[promise.value for promise in row] for row in promises]
+        )
 
     def get_distinct_counts_totals(
         self, model, keys, start, end=None, rollup=None, environment_id=None, use_cache=False
@@ -647,7 +726,12 @@ class RedisTSDB(BaseTSDB):
         return map(operator.methodcaller("format", prefix), ("{}:i", "{}:e"))
 
     def record_frequency_multi(self, requests, timestamp=None, environment_id=None):
-        self.validate_arguments([model for model, request in requests], [environment_id])
+        requests = [get_frequency_request(request) for request in requests]
+
+        self.validate_arguments(
+            [model for model, request, options in requests],
+            [options.get("environment_id", environment_id) for model, request, options in requests],
+        )
 
         if not self.enable_frequency_sketches:
             return
@@ -655,39 +739,61 @@ class RedisTSDB(BaseTSDB):
         if timestamp is None:
             timestamp = timezone.now()
 
-        ts = int(to_timestamp(timestamp))  # ``timestamp`` is not actually a timestamp :(
+        get_cluster = self._get_cluster_cache()
 
-        for (cluster, durable), environment_ids in self.get_cluster_groups({None, environment_id}):
-            commands = {}
+        # cluster -> key -> frequency table keys -> member -> score
+        increments = defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: defaultdict(int))))
+        # cluster -> key -> frequency table key -> "max expiration encountered"
+        expirations = defaultdict(lambda: defaultdict(dict))
+
+        for model, request, options in requests:
+            request_timestamp = options.get("timestamp", timestamp)
+            request_environment_id = options.get("environment_id", environment_id)
+            # ``timestamp`` is not actually a timestamp :(
+            ts = int(to_timestamp(request_timestamp))
 
-            for model, request in requests:
+            clusters = defaultdict(list)
+            for environment_id in {None, request_environment_id}:
+                clusters[get_cluster(environment_id)].append(environment_id)
+
+            for cluster, environment_ids in clusters.items():
                 for key, items in request.items():
                     keys = []
-                    expirations = {}
+                    key_expirations = expirations[cluster][key]
 
                     # Figure out all of the keys we need to be incrementing, as
                     # well as their expiration policies.
                     for rollup, max_values in self.rollups.items():
+                        expiry = self.calculate_expiry(rollup, max_values, request_timestamp)
                         for environment_id in environment_ids:
                             chunk = self.make_frequency_table_keys(
                                 model, rollup, ts, key, environment_id
                             )
                             keys.extend(chunk)
 
-                        expiry = self.calculate_expiry(rollup, max_values, timestamp)
-                        for k in chunk:
-                            expirations[k] = expiry
+                            for k in chunk:
+                                if key_expirations.get(k, 0) < expiry:
+                                    key_expirations[k] = expiry
 
-                    arguments = ["INCR"] + list(self.DEFAULT_SKETCH_PARAMETERS)
+                    # Since we're essentially merging dictionaries, we need to
+                    # add the scores to any that already exist for these keys.
+                    scores = increments[cluster][key][tuple(keys)]
                     for member, score in items.items():
+                        scores[member] += score
+
+        for (cluster, durable), requests_by_key in increments.items():
+            commands = {}
+
+            for key, requests_by_keys in requests_by_key.items():
+                cmds = commands[key] = []
+                for keys, scores in requests_by_keys.items():
+                    arguments = ["INCR"] + list(self.DEFAULT_SKETCH_PARAMETERS)
+                    for member, score in scores.items():
                         arguments.extend((score, member))
+                    cmds.append((CountMinScript, list(keys), arguments))
 
-                    # Since we're essentially merging dictionaries, we need to
-                    # append this to any value that already exists at the key.
-                    cmds = commands.setdefault(key, [])
-                    cmds.append((CountMinScript, keys, arguments))
-                    for k, t in expirations.items():
-                        cmds.append(("EXPIREAT", k, t))
+                for k, t in expirations[(cluster, durable)][key].items():
+                    cmds.append(("EXPIREAT", k, t))
 
             try:
                 cluster.execute_commands(commands)
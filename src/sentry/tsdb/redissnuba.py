@@ -25,8 +25,10 @@ def dont_do_this(callargs):
 method_specifications = {
     # method: (type, function(callargs) -> set[model])
     "get_range": (READ, single_model_argument),
+    "get_range_columns": (READ, single_model_argument),
     "get_sums": (READ, single_model_argument),
     "get_distinct_counts_series": (READ, single_model_argument),
+    "get_distinct_counts_series_columns": (READ, single_model_argument),
     "get_distinct_counts_totals": (READ, single_model_argument),
     "get_distinct_counts_union": (READ, single_model_argument),
     "get_most_frequent": (READ, single_model_argument),
@@ -38,12 +40,12 @@ method_specifications = {
     "merge": (WRITE, single_model_argument),
     "delete": (WRITE, multiple_model_argument),
     "record": (WRITE, single_model_argument),
-    "record_multi": (WRITE, lambda callargs: {model for model, key, values in callargs["items"]}),
+    "record_multi": (WRITE, lambda callargs: {item[0] for item in callargs["items"]}),
     "merge_distinct_counts": (WRITE, single_model_argument),
     "delete_distinct_counts": (WRITE, multiple_model_argument),
     "record_frequency_multi": (
         WRITE,
-        lambda callargs: {model for model, data in callargs["requests"]},
+        lambda callargs: {request[0] for request in callargs["requests"]},
     ),
     "merge_frequencies": (WRITE, single_model_argument),
     "delete_frequencies": (WRITE, multiple_model_argument),
@@ -5,7 +5,7 @@ from copy import deepcopy
 
 from sentry.constants import DataCategory
 from sentry.ingest.inbound_filters import FILTER_STAT_KEYS_TO_VALUES
-from sentry.tsdb.base import BaseTSDB, TSDBModel
+from sentry.tsdb.base import BaseTSDB, TimeSeriesColumns, TSDBModel
 from sentry.utils import outcomes, snuba
 from sentry.utils.compat import map, zip
 from sentry.utils.dates import to_datetime
@@ -384,6 +384,40 @@ class SnubaTSDB(BaseTSDB):
         environment_ids=None,
         conditions=None,
         use_cache=False,
+    ):
+        result = self._get_range_data(
+            model, keys, start, end, rollup, environment_ids, conditions, use_cache
+        )
+        # convert
+        #    {group:{timestamp:count, ...}}
+        # into
+        #    {group: [(timestamp, count), ...]}
+        return {k: sorted(result[k].items()) for k in result}
+
+    def get_range_columns(
+        self,
+        model,
+        keys,
+        start,
+        end,
+        rollup=None,
+        environment_ids=None,
+        conditions=None,
+        use_cache=False,
+    ):
+        keys = list(keys)
+        result = self._get_range_data(
+            model, keys, start, end, rollup, environment_ids, conditions, use_cache
+        )
+        _, series = self.get_optimal_rollup_series(start, end, rollup)
+        return TimeSeriesColumns(
+            series,
+            keys,
+            [[result.get(key, {}).get(timestamp, 0) for timestamp in series] for key in keys],
+        )
+
+    def _get_range_data(
+        self, model, keys, start, end, rollup, environment_ids, conditions, use_cache
     ):
         # 10s is the only rollup under an hour that we support
         if rollup and rollup == 10 and model in self.lower_rollup_query_settings:
@@ -398,7 +432,7 @@ class SnubaTSDB(BaseTSDB):
         else:
             aggregate_function = "count()"
 
-        result = self.get_data(
+        return self.get_data(
             model,
             keys,
             start,
@@ -410,11 +444,6 @@ class SnubaTSDB(BaseTSDB):
             conditions=conditions,
             use_cache=use_cache,
         )
-        # convert
-        #    {group:{timestamp:count, ...}}
-        # into
-        #    {group: [(timestamp, count), ...]}
-        return {k: sorted(result[k].items()) for k in result}
 
     def get_distinct_counts_series(
         self, model, keys, start, end=None, rollup=None, environment_id=None
@@ -1,3 +1,5 @@
+import threading
+from collections import OrderedDict
 from collections.abc import Hashable, MutableMapping
 
 __unset__ = object()
@@ -59,3 +61,72 @@ class BidirectionalMapping(MutableMapping):
 
     def inverse(self):
         return self.__inverse.copy()
+
+
+class LRUCache:
+    """\
+    A thread-safe mapping which evicts its least recently used items once it
+    grows beyond ``maxsize``.
+
+    By default every item counts as one towards ``maxsize``. If a ``weigher``
+    function is provided, it is called with each value and the total weight
+    of all items is bounded instead (e.g. to bound the cache by bytes.)
+    Items that weigh more than ``maxsize`` on their own are never stored.
+    """
+
+    def __init__(self, maxsize, weigher=None):
+        assert maxsize > 0
+        self.maxsize = maxsize
+        self.weigher = weigher
+        self.weight = 0
+        self.__data = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__data)
+
+    def __contains__(self, key):
+        return key in self.__data
+
+    def get(self, key, default=None):
+        with self.__lock:
+            try:
+                value, _ = self.__data[key]
+            except KeyError:
+                return default
+            self.__data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """\
+        Stores ``value`` and returns the total weight of the items that were
+        evicted to make room for it.
+        """
+        weight = self.weigher(value) if self.weigher is not None else 1
+        evicted = 0
+        with self.__lock:
+            previous = self.__data.pop(key, None)
+            if previous is not None:
+                self.weight -= previous[1]
+            if weight > self.maxsize:
+                return evicted
+            self.__data[key] = (value, weight)
+            self.weight += weight
+            while self.weight > self.maxsize:
+                _, (_, item_weight) = self.__data.popitem(last=False)
+                self.weight -= item_weight
+                evicted += item_weight
+        return evicted
+
+    def pop(self, key, default=None):
+        with self.__lock:
+            item = self.__data.pop(key, None)
+            if item is None:
+                return default
+            self.weight -= item[1]
+            return item[0]
+
+    def clear(self):
+        with self.__lock:
+            self.__data.clear()
+            self.weight = 0
@@ -1,5 +1,15 @@
+import functools
+import re
+
 import sentry_relay
 
+# Patterns using any of these are left to relay's matcher.
+_UNSUPPORTED_GLOB_CHARS = frozenset(b"[]{}")
+
+_GLOB_TOKEN_RE = re.compile(rb"\*\*|\*|\?")
+
+GLOB_CACHE_SIZE = 5000
+
 
 def glob_match(
     value, pat, doublestar=False, ignorecase=False, path_normalize=False, allow_newline=True
@@ -13,3 +23,98 @@ def glob_match(
         path_normalize=path_normalize,
         allow_newline=allow_newline,
     )
+
+
+def _to_bytes(value):
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    return value
+
+
+def _translate_glob(pat, doublestar):
+    rv = []
+    last = 0
+    for match in _GLOB_TOKEN_RE.finditer(pat):
+        start, end = match.span()
+        rv.append(re.escape(pat[last:start]))
+        last = end
+        token = match.group()
+        if token == b"?":
+            rv.append(b"[^/]" if doublestar else b".")
+        elif token == b"*":
+            rv.append(b"[^/]*" if doublestar else b".*")
+        else:
+            # ``**`` is only recursive if it makes up a whole path segment,
+            # otherwise it behaves like a single ``*``.
+            at_start = start == 0 or pat[start - 1 : start] == b"/"
+            at_end = end == len(pat) or pat[end : end + 1] == b"/"
+            if at_start and at_end:
+                if end == len(pat):
+                    rv.append(b".*")
+                else:
+                    # consume the trailing slash so that zero segments match
+                    rv.append(b"(?:.*/)?")
+                    last = end + 1
+            else:
+                rv.append(b"[^/]*" if doublestar else b".*")
+    rv.append(re.escape(pat[last:]))
+    return b"".join(rv)
+
+
+@functools.lru_cache(maxsize=GLOB_CACHE_SIZE)
+def compile_glob(pat, doublestar=False, path_normalize=False):
+    """Translates a glob pattern into a compiled regular expression over
+    bytes, or returns `None` if the pattern uses syntax that is only
+    supported by ``glob_match``.
+
+    Compiled patterns are kept in a process-wide LRU cache.
+    """
+    pat = _to_bytes(pat)
+    if path_normalize:
+        pat = pat.replace(b"\\", b"/")
+    elif b"\\" in pat:
+        return None
+    if any(char in _UNSUPPORTED_GLOB_CHARS for char in pat) or pat.endswith(b"**/"):
+        return None
+    return re.compile(_translate_glob(pat, doublestar), re.DOTALL)
+
+
+def glob_match_many(
+    values, pat, doublestar=False, ignorecase=False, path_normalize=False, allow_newline=True
+):
+    """Matches all ``values`` against the same pattern and returns a list of
+    booleans.  This behaves like calling ``glob_match`` for every value, but
+    translates the pattern only once and avoids calling into relay per value
+    where possible.  `None` values never match.
+    """
+    regex = None
+    if not ignorecase and allow_newline:
+        regex = compile_glob(pat, doublestar, path_normalize)
+
+    results = {}
+    rv = []
+    for value in values:
+        if value is None:
+            rv.append(False)
+            continue
+
+        value = _to_bytes(value)
+        result = results.get(value)
+        if result is None:
+            if regex is None:
+                result = glob_match(
+                    value,
+                    pat,
+                    doublestar=doublestar,
+                    ignorecase=ignorecase,
+                    path_normalize=path_normalize,
+                    allow_newline=allow_newline,
+                )
+            elif path_normalize:
+                result = regex.fullmatch(value.replace(b"\\", b"/")) is not None
+            else:
+                result = regex.fullmatch(value) is not None
+            results[value] = result
+        rv.append(result)
+
+    return rv
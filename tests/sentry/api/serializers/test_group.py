@@ -347,28 +347,33 @@ class StreamGroupSerializerTestCase(TestCase):
         from sentry.api.serializers.models.group import tsdb
 
         with mock.patch(
-            "sentry.api.serializers.models.group.tsdb.get_range", side_effect=tsdb.get_range
-        ) as get_range:
+            "sentry.api.serializers.models.group.tsdb.get_range_columns",
+            side_effect=tsdb.get_range_columns,
+        ) as get_range_columns:
             serialize(
                 [group],
                 serializer=StreamGroupSerializer(
                     environment_func=lambda: environment, stats_period="14d"
                 ),
             )
-            assert get_range.call_count == 1
-            for args, kwargs in get_range.call_args_list:
+            assert get_range_columns.call_count == 1
+            for args, kwargs in get_range_columns.call_args_list:
                 assert kwargs["environment_ids"] == [environment.id]
 
         def get_invalid_environment():
             raise Environment.DoesNotExist()
 
         with mock.patch(
-            "sentry.api.serializers.models.group.tsdb.make_series", side_effect=tsdb.make_series
-        ) as make_series:
-            serialize(
+            "sentry.api.serializers.models.group.tsdb.get_range_columns",
+            side_effect=tsdb.get_range_columns,
+        ) as get_range_columns:
+            result = serialize(
                 [group],
                 serializer=StreamGroupSerializer(
                     environment_func=get_invalid_environment, stats_period="14d"
                 ),
             )
-            assert make_series.call_count == 1
+            assert get_range_columns.call_count == 0
+            stats = result[0]["stats"]["14d"]
+            assert len(stats) == 14
+            assert all(count == 0 for _, count in stats)
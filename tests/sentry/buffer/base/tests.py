@@ -73,3 +73,37 @@ class BufferTest(TestCase):
         self.buf.process(Group, columns, filters, {"last_seen": the_date}, signal_only=True)
         group.refresh_from_db()
         assert group.times_seen == prev_times_seen
+
+    def test_process_batch_updates_rows(self):
+        group1 = Group.objects.create(project=Project(id=1))
+        group2 = Group.objects.create(project=Project(id=1))
+        the_date = timezone.now() + timedelta(days=5)
+        self.buf.process_batch(
+            [
+                (Group, {"times_seen": 2}, {"id": group1.id}, {"last_seen": the_date}, None),
+                (Group, {"times_seen": 3}, {"id": group2.id}, {"last_seen": the_date}, None),
+            ]
+        )
+        group1_ = Group.objects.get(id=group1.id)
+        group2_ = Group.objects.get(id=group2.id)
+        assert group1_.times_seen == group1.times_seen + 2
+        assert group2_.times_seen == group2.times_seen + 3
+        assert group1_.last_seen == group2_.last_seen == the_date
+        assert abs(group1_.score - Group.calculate_score(group1_.times_seen, the_date)) <= 1
+
+    @mock.patch("sentry.buffer.base.buffer_incr_complete")
+    def test_process_batch_falls_back_to_process(self, buffer_incr_complete):
+        group = Group.objects.create(project=Project(id=1))
+        items = [
+            (Group, {"times_seen": 1}, {"id": group.id}, {}, None),
+            # same row twice, can't be part of the same statement
+            (Group, {"times_seen": 1}, {"id": group.id}, {}, None),
+            # no existing row
+            (Group, {"times_seen": 1}, {"id": group.id + 1000}, {}, None),
+            # not filtered by primary key
+            (Group, {"times_seen": 1}, {"message": "foo bar", "project_id": 1}, {}, None),
+        ]
+        self.buf.process_batch(items)
+        assert Group.objects.get(id=group.id).times_seen == group.times_seen + 2
+        assert Group.objects.get(message="foo bar").times_seen == 2
+        assert len(buffer_incr_complete.send_robust.mock_calls) == 4
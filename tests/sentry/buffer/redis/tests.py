@@ -1,10 +1,12 @@
 import pickle
 from datetime import datetime
 
+import pytest
 from django.utils import timezone
 from django.utils.encoding import force_text
 
-from sentry.buffer.redis import RedisBuffer
+from sentry.buffer.redis import BufferValueCodec, RedisBuffer
+from sentry.event_manager import ScoreClause
 from sentry.models import Group, Project
 from sentry.testutils import TestCase
 from sentry.utils.compat import mock
@@ -45,6 +47,30 @@ class RedisBufferTest(TestCase):
         client = self.buf.cluster.get_routing_client()
         assert client.zrange("b:p", 0, -1) == []
 
+    @mock.patch("sentry.buffer.redis.process_incr")
+    def test_process_pending_streaming(self, process_incr):
+        buf = RedisBuffer(incr_batch_size=2, pending_chunk_size=2)
+        with buf.cluster.map() as client:
+            client.zadd("b:p", {"foo": 1, "bar": 2, "baz": 3})
+        buf.process_pending()
+        assert process_incr.apply_async.mock_calls == [
+            mock.call(kwargs={"batch_keys": ["foo", "bar"]}),
+            mock.call(kwargs={"batch_keys": ["baz"]}),
+        ]
+        client = buf.cluster.get_routing_client()
+        assert client.zrange("b:p", 0, -1) == []
+        assert client.get("l:b:p") is None
+
+    @mock.patch("sentry.buffer.redis.process_incr")
+    def test_process_pending_streaming_skips_locked_host(self, process_incr):
+        buf = RedisBuffer(pending_chunk_size=2)
+        client = buf.cluster.get_routing_client()
+        client.zadd("b:p", {"foo": 1})
+        client.set("l:b:p", "1")
+        buf.process_pending()
+        assert process_incr.apply_async.mock_calls == []
+        assert client.zrange("b:p", 0, -1) == [b"foo"]
+
     @mock.patch("sentry.buffer.redis.RedisBuffer._make_key", mock.Mock(return_value="foo"))
     @mock.patch("sentry.buffer.base.Buffer.process")
     def test_process_does_bubble_up_json(self, process):
@@ -86,6 +112,95 @@ class RedisBufferTest(TestCase):
         self.buf.process("foo")
         process.assert_called_once_with(Group, columns, filters, extra, signal_only)
 
+    @mock.patch("sentry.buffer.redis.RedisBuffer._make_key", mock.Mock(return_value="foo"))
+    @mock.patch("sentry.buffer.base.Buffer.process")
+    def test_process_does_bubble_up_codec(self, process):
+        now = datetime(2017, 5, 3, 6, 6, 6, 123, tzinfo=timezone.utc)
+        client = self.buf.cluster.get_routing_client()
+        client.hmset(
+            "foo",
+            {
+                "e+foo": self.buf.codec.encode("bar"),
+                "e+datetime": self.buf.codec.encode(now),
+                "e+score": self.buf.codec.encode(1.5),
+                "f": self.buf.codec.encode({"pk": 1, "project": Project(id=2)}),
+                "i+times_seen": "2",
+                "m": "sentry.models.Group",
+            },
+        )
+        self.buf.process("foo")
+        process.assert_called_once_with(
+            Group,
+            {"times_seen": 2},
+            {"pk": 1, "project": Project(id=2)},
+            {"foo": "bar", "datetime": now, "score": 1.5},
+            None,
+        )
+
+    @mock.patch("sentry.buffer.base.Buffer.process_batch")
+    def test_process_batch_keys_bulk(self, process_batch):
+        buf = RedisBuffer(bulk_process=True)
+        client = buf.cluster.get_routing_client()
+        for key, group_id in (("foo", 1), ("bar", 2)):
+            client.hmset(
+                key,
+                {
+                    "f": buf.codec.encode({"id": group_id}),
+                    "i+times_seen": "2",
+                    "m": "sentry.models.Group",
+                },
+            )
+            client.zadd("b:p", {key: 1})
+        buf.process(batch_keys=["foo", "bar", "baz"])
+        process_batch.assert_called_once_with(
+            [
+                (Group, {"times_seen": 2}, {"id": 1}, {}, None),
+                (Group, {"times_seen": 2}, {"id": 2}, {}, None),
+            ]
+        )
+        assert client.hgetall("foo") == {}
+        assert client.zrange("b:p", 0, -1) == []
+        assert client.get("l:foo") is None
+
+    def test_codec_roundtrip(self):
+        naive = datetime(1960, 1, 1, 12, 30)
+        aware = datetime(2017, 5, 3, 6, 6, 6, 123, tzinfo=timezone.utc)
+        value = {"s": "\u201d", "i": 2 ** 40, "f": 0.1, "naive": naive, "aware": aware}
+        encoded = self.buf.codec.encode(value)
+        assert encoded.startswith(b"\x01")
+        assert self.buf.codec.decode(encoded) == value
+
+        project = self.buf.codec.decode(self.buf.codec.encode(Project(id=1)))
+        assert type(project) is Project
+        assert project.id == 1
+
+        score = self.buf.codec.decode(
+            self.buf.codec.encode(ScoreClause(last_seen=aware, times_seen=2))
+        )
+        assert type(score) is ScoreClause
+        assert score.last_seen == aware
+        assert score.times_seen == 2
+
+    @mock.patch("sentry.buffer.redis.RedisBuffer._make_key", mock.Mock(return_value="foo"))
+    def test_incr_writes_pickle_by_default(self):
+        client = self.buf.cluster.get_routing_client()
+        model = mock.Mock()
+        model.__name__ = "Mock"
+        self.buf.incr(model, {"times_seen": 1}, {"pk": 1}, extra={"foo": "bar"})
+        assert pickle.loads(client.hget("foo", "f")) == {"pk": 1}
+        assert pickle.loads(client.hget("foo", "e+foo")) == "bar"
+
+    @mock.patch("sentry.buffer.redis.RedisBuffer._make_key", mock.Mock(return_value="foo"))
+    def test_incr_versioned_codec(self):
+        buf = RedisBuffer(codec_version=BufferValueCodec.version)
+        client = buf.cluster.get_routing_client()
+        model = mock.Mock()
+        model.__name__ = "Mock"
+        buf.incr(model, {"times_seen": 1}, {"pk": 1}, extra={"foo": "bar"})
+        assert client.hget("foo", "f").startswith(buf.codec.header)
+        assert buf.codec.decode(client.hget("foo", "f")) == {"pk": 1}
+        assert buf.codec.decode(client.hget("foo", "e+foo")) == "bar"
+
     @mock.patch("sentry.buffer.redis.RedisBuffer._make_key", mock.Mock(return_value="foo"))
     @mock.patch("sentry.buffer.redis.process_incr", mock.Mock())
     def test_incr_saves_to_redis(self):
@@ -101,9 +216,9 @@ class RedisBufferTest(TestCase):
         result = {force_text(k): v for k, v in result.items()}
 
         f = result.pop("f")
-        assert pickle.loads(f) == {"pk": 1, "datetime": now}
-        assert pickle.loads(result.pop("e+datetime")) == now
-        assert pickle.loads(result.pop("e+foo")) == "bar"
+        assert self.buf._decode_stored_value(f) == {"pk": 1, "datetime": now}
+        assert self.buf._decode_stored_value(result.pop("e+datetime")) == now
+        assert self.buf._decode_stored_value(result.pop("e+foo")) == "bar"
         assert result == {"i+times_seen": b"1", "m": b"mock.mock.Mock"}
 
         pending = client.zrange("b:p", 0, -1)
@@ -113,14 +228,122 @@ class RedisBufferTest(TestCase):
         # Force keys to strings
         result = {force_text(k): v for k, v in result.items()}
         f = result.pop("f")
-        assert pickle.loads(f) == {"pk": 1, "datetime": now}
-        assert pickle.loads(result.pop("e+datetime")) == now
-        assert pickle.loads(result.pop("e+foo")) == "baz"
+        assert self.buf._decode_stored_value(f) == {"pk": 1, "datetime": now}
+        assert self.buf._decode_stored_value(result.pop("e+datetime")) == now
+        assert self.buf._decode_stored_value(result.pop("e+foo")) == "baz"
         assert result == {"i+times_seen": b"2", "m": b"mock.mock.Mock"}
 
         pending = client.zrange("b:p", 0, -1)
         assert pending == [b"foo"]
 
+    @mock.patch("sentry.buffer.redis.RedisBuffer._make_key", mock.Mock(return_value="foo"))
+    def test_incr_coalesces_until_flush(self):
+        buf = RedisBuffer(coalesce_window=60, coalesce_batch_size=3)
+        now = datetime(2017, 5, 3, 6, 6, 6, tzinfo=timezone.utc)
+        client = buf.cluster.get_routing_client()
+        model = mock.Mock()
+        model.__name__ = "Mock"
+        filters = {"pk": 1}
+
+        with mock.patch.object(buf, "_ensure_coalesce_flusher"):
+            buf.incr(model, {"times_seen": 1}, filters, extra={"foo": "bar"})
+            buf.incr(model, {"times_seen": 2}, filters, extra={"foo": "baz", "datetime": now})
+
+        # Nothing is written until the batch size is reached
+        assert client.hgetall("foo") == {}
+        assert client.zrange("b:p", 0, -1) == []
+
+        buf.incr(model, {"times_seen": 1}, filters, signal_only=True)
+        result = {force_text(k): v for k, v in client.hgetall("foo").items()}
+        assert buf._decode_stored_value(result.pop("f")) == filters
+        assert buf._decode_stored_value(result.pop("e+datetime")) == now
+        assert buf._decode_stored_value(result.pop("e+foo")) == "baz"
+        assert result == {"i+times_seen": b"4", "m": b"mock.mock.Mock", "s": b"1"}
+        assert client.zrange("b:p", 0, -1) == [b"foo"]
+        assert buf._coalesced == {}
+
+    @mock.patch("sentry.buffer.redis.RedisBuffer._make_key", mock.Mock(return_value="foo"))
+    def test_flush_coalesced(self):
+        buf = RedisBuffer(coalesce_window=60)
+        client = buf.cluster.get_routing_client()
+        model = mock.Mock()
+        model.__name__ = "Mock"
+
+        with mock.patch.object(buf, "_ensure_coalesce_flusher"):
+            buf.incr(model, {"times_seen": 1}, {"pk": 1})
+            buf.incr(model, {"times_seen": 1}, {"pk": 1})
+        assert client.hgetall("foo") == {}
+
+        buf.flush_coalesced()
+        assert client.hget("foo", "i+times_seen") == b"2"
+        assert client.zrange("b:p", 0, -1) == [b"foo"]
+
+        # Flushing again is a no-op
+        buf.flush_coalesced()
+        assert client.hget("foo", "i+times_seen") == b"2"
+
+    @mock.patch("sentry.buffer.redis.RedisBuffer._make_key", mock.Mock(return_value="foo"))
+    def test_flush_coalesced_failure_restores_increments(self):
+        buf = RedisBuffer(coalesce_window=60)
+        client = buf.cluster.get_routing_client()
+        model = mock.Mock()
+        model.__name__ = "Mock"
+
+        with mock.patch.object(buf, "_ensure_coalesce_flusher"):
+            buf.incr(model, {"times_seen": 1}, {"pk": 1}, extra={"foo": "bar"})
+
+            with mock.patch.object(buf, "_write_incr", side_effect=Exception("boom")):
+                with pytest.raises(Exception):
+                    buf.flush_coalesced()
+
+            buf.incr(model, {"times_seen": 2}, {"pk": 1}, extra={"foo": "baz"})
+
+        buf.flush_coalesced()
+        assert client.hget("foo", "i+times_seen") == b"3"
+        assert buf._decode_stored_value(client.hget("foo", "e+foo")) == "baz"
+        assert buf._coalesced == {}
+
+    @mock.patch("sentry.buffer.redis.RedisBuffer._make_key", mock.Mock(return_value="foo"))
+    def test_incr_does_not_raise_on_failed_flush(self):
+        buf = RedisBuffer(coalesce_window=60, coalesce_batch_size=1)
+        client = buf.cluster.get_routing_client()
+        model = mock.Mock()
+        model.__name__ = "Mock"
+
+        with mock.patch.object(buf, "_ensure_coalesce_flusher"):
+            with mock.patch.object(buf, "_write_incr", side_effect=Exception("boom")):
+                buf.incr(model, {"times_seen": 1}, {"pk": 1})
+
+        assert client.hgetall("foo") == {}
+        assert buf._coalesced["foo"].columns == {"times_seen": 1}
+
+        buf.flush_coalesced()
+        assert client.hget("foo", "i+times_seen") == b"1"
+
+    @mock.patch("sentry.buffer.redis.os.register_at_fork")
+    @mock.patch("sentry.buffer.redis.worker_process_shutdown")
+    @mock.patch("sentry.buffer.redis.atexit")
+    def test_coalesce_flushes_on_shutdown(self, atexit, worker_process_shutdown, register_at_fork):
+        buf = RedisBuffer(coalesce_window=60)
+        model = mock.Mock()
+        model.__name__ = "Mock"
+
+        with mock.patch.object(buf, "_ensure_coalesce_flusher"):
+            buf.incr(model, {"times_seen": 1}, {"pk": 1})
+            buf.incr(model, {"times_seen": 1}, {"pk": 2})
+
+        atexit.register.assert_called_once_with(buf._flush_coalesced_on_shutdown)
+        worker_process_shutdown.connect.assert_called_once_with(
+            buf._flush_coalesced_on_shutdown, weak=False
+        )
+        register_at_fork.assert_called_once_with(
+            before=buf._flush_coalesced_on_shutdown,
+            after_in_child=buf._reset_coalesced_in_child,
+        )
+
+        buf._flush_coalesced_on_shutdown()
+        assert buf._coalesced == {}
+
     @mock.patch("sentry.buffer.redis.RedisBuffer._make_key", mock.Mock(return_value="foo"))
     @mock.patch("sentry.buffer.redis.process_incr")
     @mock.patch("sentry.buffer.redis.process_pending")
@@ -1,7 +1,17 @@
 import pytest
 
 from sentry.grouping.api import get_default_grouping_config_dict
+from sentry.grouping.enhancer import ENHANCEMENT_BASES
+from sentry.grouping.enhancer.matchers import (
+    FunctionMatch,
+    PathLikeMatch,
+    create_match_frame,
+    path_like_match,
+)
 from sentry.grouping.strategies.configurations import CONFIGURATIONS
+from sentry.utils.functional import cached
+from sentry.utils.glob import glob_match
+from sentry.utils.safe import get_path
 from tests.sentry.grouping import grouping_input as grouping_inputs
 
 CONFIGS = {key: get_default_grouping_config_dict(key) for key in sorted(CONFIGURATIONS.keys())}
@@ -37,3 +47,59 @@ def run_configuration(grouping_input, config):
     event.project = None
 
     event.get_hashes()
+
+
+def _get_stacktraces(data):
+    for exception in get_path(data, "exception", "values", filter=True) or ():
+        yield get_path(exception, "stacktrace", "frames", filter=True) or []
+    for thread in get_path(data, "threads", "values", filter=True) or ():
+        yield get_path(thread, "stacktrace", "frames", filter=True) or []
+    yield get_path(data, "stacktrace", "frames", filter=True) or []
+
+
+def _get_matchers():
+    rv = []
+    for enhancements in ENHANCEMENT_BASES.values():
+        for rule in enhancements.rules:
+            for matcher in rule.matchers:
+                matcher = getattr(matcher, "caller", matcher)
+                if isinstance(matcher, (PathLikeMatch, FunctionMatch)):
+                    rv.append(matcher)
+    return rv
+
+
+def _match_per_frame(matchers, match_frames):
+    cache = {}
+    for matcher in matchers:
+        for match_frame in match_frames:
+            value = match_frame[matcher.field]
+            if value is None:
+                continue
+            if isinstance(matcher, PathLikeMatch):
+                cached(cache, path_like_match, matcher._encoded_pattern, value)
+            else:
+                cached(cache, glob_match, value, matcher._encoded_pattern)
+
+
+def _match_columns(matchers, match_frames):
+    cache = {}
+    for matcher in matchers:
+        matcher.matches_frame(match_frames, 0, None, None, cache)
+
+
+@pytest.mark.skipif(not benchmark_available(), reason="requires pytest-benchmark")
+@pytest.mark.parametrize("match_func", [_match_per_frame, _match_columns], ids=["old", "new"])
+def test_benchmark_enhancer_matchers(match_func, benchmark):
+    matchers = _get_matchers()
+    stacktraces = [
+        [create_match_frame(frame, grouping_input.data.get("platform")) for frame in frames]
+        for grouping_input in grouping_inputs
+        for frames in _get_stacktraces(grouping_input.data)
+        if frames
+    ]
+
+    def run():
+        for match_frames in stacktraces:
+            match_func(matchers, match_frames)
+
+    benchmark(run)
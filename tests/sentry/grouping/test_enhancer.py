@@ -1,7 +1,13 @@
 import pytest
 
 from sentry.grouping.component import GroupingComponent
-from sentry.grouping.enhancer import Enhancements, InvalidEnhancerConfig, create_match_frame
+from sentry.grouping.enhancer import (
+    ENHANCEMENT_BASES,
+    Enhancements,
+    InvalidEnhancerConfig,
+    create_match_frame,
+    warm_up_enhancements,
+)
 
 
 def dump_obj(obj):
@@ -418,3 +424,78 @@ def test_sentinel_and_prefix(action, type):
     actions[0][1].update_frame_components_contributions([component], frames, 0)
     expected = True if action == "+" else False
     assert getattr(component, f"is_{type}_frame") is expected
+
+
+def test_rule_index_matches_all_rules():
+    enhancement = Enhancements.from_config_string(
+        """
+        family:native function:std::*                  -app
+        family:native,javascript module:core::*        -app
+        function:panic_*                               ^-group
+        !function:panic_* family:javascript            +group
+        [ function:foo ] | function:bar                -group
+        function:baz | [ module:core::baz ]            +group
+        path:**/test.js                                +app
+        error.type:ZeroDivisionError function:foo      -app
+        family:native                                  max-frames=3
+    """,
+        bases=["common:2019-03-23"],
+    )
+    frames = [
+        {"function": "main", "platform": "native"},
+        {"function": "std::foo", "module": "core::foo", "platform": "native"},
+        {"function": "panic_handler", "platform": "javascript"},
+        {"function": "foo", "abs_path": "http://example.com/test.js", "platform": "javascript"},
+        {"function": "bar", "platform": "javascript"},
+        {"function": "baz", "module": "core::bar", "platform": "native"},
+        {"function": "qux", "module": "core::baz", "platform": "python"},
+    ]
+    exception_data = {"type": "ZeroDivisionError"}
+    match_frames = [create_match_frame(frame, "python") for frame in frames]
+
+    for kind, rules in (
+        ("modifier", enhancement._modifier_rules),
+        ("updater", enhancement._updater_rules),
+    ):
+        expected = [
+            (rule, idx, action)
+            for rule in rules
+            for idx, action in rule.get_matching_frame_actions(
+                match_frames, "python", exception_data, {}
+            )
+        ]
+        assert expected
+        assert (
+            list(
+                enhancement._iter_matching_frame_actions(
+                    kind, match_frames, "python", exception_data, {}
+                )
+            )
+            == expected
+        )
+
+
+def test_loads_is_cached():
+    dumped = Enhancements.from_config_string(
+        "function:foo -app", bases=["common:2019-03-23"]
+    ).dumps()
+    enhancements = Enhancements.loads(dumped)
+    assert Enhancements.loads(dumped) is enhancements
+    assert Enhancements.loads(dumped.encode("ascii")) is enhancements
+
+
+def test_from_config_string_reuses_parsed_rules():
+    first = Enhancements.from_config_string("function:foo -app", bases=["common:2019-03-23"])
+    second = Enhancements.from_config_string("function:foo -app", id="foo")
+    assert first is not second
+    assert first.rules == second.rules
+    assert first.bases == ["common:2019-03-23"]
+    assert second.bases == []
+    assert second.id == "foo"
+
+
+def test_warm_up_enhancements():
+    warm_up_enhancements()
+    for base_id in ENHANCEMENT_BASES:
+        enhancements = Enhancements.loads(Enhancements([], bases=[base_id]).dumps())
+        assert set(enhancements._rule_indexes) == {"modifier", "updater"}
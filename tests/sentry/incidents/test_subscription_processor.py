@@ -32,8 +32,10 @@ from sentry.incidents.subscription_processor import (
     build_alert_rule_trigger_stat_key,
     build_trigger_stat_keys,
     get_alert_rule_stats,
+    get_alert_rule_stats_many,
     get_redis_client,
     partition,
+    process_updates,
     update_alert_rule_stats,
 )
 from sentry.models import Integration
@@ -341,6 +343,76 @@ class ProcessUpdateTest(TestCase, SnubaTestCase):
         )
         # TODO: Check subscription is deleted once we start doing that
 
+    def test_process_updates(self):
+        rule = self.rule
+        trigger = self.trigger
+        updates = [
+            (
+                self.build_subscription_update(
+                    self.sub, value=trigger.alert_threshold + 1, time_delta=timedelta(minutes=-2)
+                ),
+                self.sub,
+            ),
+            (
+                self.build_subscription_update(self.other_sub, value=trigger.alert_threshold + 1),
+                self.other_sub,
+            ),
+            (
+                self.build_subscription_update(
+                    self.sub, value=rule.resolve_threshold - 1, time_delta=timedelta(minutes=-1)
+                ),
+                self.sub,
+            ),
+        ]
+        with self.feature(
+            ["organizations:incidents", "organizations:performance-view"]
+        ), self.capture_on_commit_callbacks(execute=True):
+            process_updates(updates)
+
+        self.assert_no_active_incident(rule)
+        self.assert_active_incident(rule, self.other_sub)
+        for subscription, (update, _) in [(self.sub, updates[2]), (self.other_sub, updates[1])]:
+            processor = SubscriptionProcessor(subscription)
+            assert processor.last_update == update["timestamp"]
+            self.assert_trigger_counts(processor, trigger, 0, 0)
+
+    def test_process_updates_failure(self):
+        trigger = self.trigger
+        updates = [
+            (self.build_subscription_update(self.sub, value=trigger.alert_threshold + 1), self.sub),
+            (self.build_subscription_update(self.other_sub), self.other_sub),
+        ]
+        process_update = SubscriptionProcessor.process_update
+
+        def fail_other_sub(processor, *args, **kwargs):
+            if processor.subscription == self.other_sub:
+                raise Exception("failed")
+            return process_update(processor, *args, **kwargs)
+
+        with self.feature(
+            ["organizations:incidents", "organizations:performance-view"]
+        ), self.capture_on_commit_callbacks(execute=True), patch.object(
+            SubscriptionProcessor, "process_update", fail_other_sub
+        ), self.assertRaises(
+            Exception
+        ):
+            process_updates(updates)
+
+        # The stats of the update processed before the failure are written.
+        processor = SubscriptionProcessor(self.sub)
+        assert processor.last_update == updates[0][0]["timestamp"]
+        self.assert_trigger_counts(processor, trigger, 0, 0)
+        self.assert_active_incident(self.rule, self.sub)
+
+    def test_process_updates_removed_alert_rule(self):
+        message = self.build_subscription_update(self.sub)
+        self.rule.delete()
+        with self.feature(["organizations:incidents", "organizations:performance-view"]):
+            process_updates([(message, self.sub)])
+        self.metrics.incr.assert_called_once_with(
+            "incidents.alert_rules.no_alert_rule_for_subscription"
+        )
+
     def test_removed_project(self):
         message = self.build_subscription_update(self.sub)
         self.project.delete()
@@ -1508,6 +1580,24 @@ class TestGetAlertRuleStats(TestCase):
         assert resolve_counts == {3: 2, 4: 4}
 
 
+class TestGetAlertRuleStatsMany(TestCase):
+    def test(self):
+        alert_rule = AlertRule(id=1)
+        sub = QuerySubscription(project_id=2)
+        other_sub = QuerySubscription(project_id=5)
+        triggers = [AlertRuleTrigger(id=3), AlertRuleTrigger(id=4)]
+        timestamp = datetime.now().replace(tzinfo=pytz.utc, microsecond=0)
+        update_alert_rule_stats(alert_rule, sub, timestamp, {3: 1, 4: 3}, {3: 2, 4: 4})
+
+        assert get_alert_rule_stats_many(
+            [(alert_rule, sub, triggers), (alert_rule, other_sub, triggers[:1])]
+        ) == [
+            get_alert_rule_stats(alert_rule, sub, triggers),
+            (datetime.fromtimestamp(0, pytz.utc), {3: 0}, {3: 0}),
+        ]
+        assert get_alert_rule_stats_many([]) == []
+
+
 class TestUpdateAlertRuleStats(TestCase):
     def test(self):
         alert_rule = AlertRule(id=1)
@@ -1,3 +1,4 @@
+import threading
 import time
 import uuid
 
@@ -5,13 +6,17 @@ import pytest
 
 from sentry.event_manager import EventManager
 from sentry.ingest.ingest_consumer import (
+    PIPELINE_STAGES,
+    IngestConsumerWorker,
     process_attachment_chunk,
     process_event,
+    process_events,
     process_individual_attachment,
     process_userreport,
 )
 from sentry.models import EventAttachment, EventUser, File, UserReport
 from sentry.utils import json
+from sentry.utils.compat import mock
 
 
 def get_normalized_event(data, project):
@@ -60,6 +65,45 @@ def test_deduplication_works(default_project, task_runner, preprocess_event):
     }
 
 
+@pytest.mark.django_db
+def test_process_events_deduplicates_batch(default_project, task_runner, preprocess_event):
+    project_id = default_project.id
+    start_time = time.time() - 3600
+    payloads = [
+        get_normalized_event({"message": "hello world"}, default_project),
+        get_normalized_event({"message": "hello again"}, default_project),
+    ]
+
+    def get_message(payload):
+        return {
+            "payload": json.dumps(payload),
+            "start_time": start_time,
+            "event_id": payload["event_id"],
+            "project_id": project_id,
+            "remote_addr": "127.0.0.1",
+        }
+
+    # The first event was already processed by an earlier batch
+    process_event(get_message(payloads[0]), projects={project_id: default_project})
+
+    process_events(
+        [get_message(payloads[0]), get_message(payloads[1]), get_message(payloads[1])],
+        projects={project_id: default_project},
+    )
+
+    assert [kwargs["event_id"] for kwargs in preprocess_event] == [
+        payloads[0]["event_id"],
+        payloads[1]["event_id"],
+    ]
+    assert preprocess_event[1] == {
+        "cache_key": f"e:{payloads[1]['event_id']}:{project_id}",
+        "data": payloads[1],
+        "event_id": payloads[1]["event_id"],
+        "project": default_project,
+        "start_time": start_time,
+    }
+
+
 @pytest.mark.django_db
 @pytest.mark.parametrize("missing_chunks", (True, False))
 def test_with_attachments(default_project, task_runner, missing_chunks, monkeypatch):
@@ -312,3 +356,66 @@ def test_individual_attachments_missing_chunks(default_project, factories, monke
     attachments = list(EventAttachment.objects.filter(project_id=project_id, event_id=event_id))
 
     assert not attachments
+
+
+@pytest.mark.django_db
+def test_pipelined_flush_waits_for_own_chunks(default_project, monkeypatch):
+    chunks_released = threading.Event()
+    calls = []
+
+    def process_attachment_chunk(message, projects):
+        if message["event_id"] == "a" * 32:
+            assert chunks_released.wait(5)
+        calls.append(("chunk", message["event_id"]))
+
+    def process_event(message, projects):
+        calls.append(("event", message["event_id"]))
+        if message["event_id"] == "b" * 32:
+            # The unrelated event must not wait for the slow chunk
+            chunks_released.set()
+
+    monkeypatch.setattr(
+        "sentry.ingest.ingest_consumer.process_attachment_chunk", process_attachment_chunk
+    )
+    monkeypatch.setattr("sentry.ingest.ingest_consumer.process_event", process_event)
+
+    worker = IngestConsumerWorker(pipeline_concurrency={stage: 2 for stage in PIPELINE_STAGES})
+    try:
+        worker.flush_batch(
+            [
+                {
+                    "type": "attachment_chunk",
+                    "event_id": "a" * 32,
+                    "project_id": default_project.id,
+                },
+                {"type": "event", "event_id": "a" * 32, "project_id": default_project.id},
+                {"type": "event", "event_id": "b" * 32, "project_id": default_project.id},
+            ]
+        )
+    finally:
+        worker.shutdown()
+
+    assert calls == [("event", "b" * 32), ("chunk", "a" * 32), ("event", "a" * 32)]
+
+
+@pytest.mark.django_db
+def test_pipelined_flush_recycles_connections(default_project, monkeypatch):
+    monkeypatch.setattr("sentry.ingest.ingest_consumer.process_event", lambda *args: None)
+    close_old_connections = mock.Mock()
+    monkeypatch.setattr(
+        "sentry.ingest.ingest_consumer.close_old_connections", close_old_connections
+    )
+
+    worker = IngestConsumerWorker(pipeline_concurrency={stage: 1 for stage in PIPELINE_STAGES})
+    try:
+        # The single event thread recycles its connections once per batch
+        for batches, event_id in enumerate(("a" * 32, "b" * 32), 1):
+            worker.flush_batch(
+                [
+                    {"type": "event", "event_id": event_id, "project_id": default_project.id},
+                    {"type": "event", "event_id": event_id, "project_id": default_project.id},
+                ]
+            )
+            assert close_old_connections.call_count == batches
+    finally:
+        worker.shutdown()
@@ -0,0 +1,56 @@
+import msgpack
+import pytest
+
+from sentry.ingest.message import LazyMessage
+
+
+@pytest.mark.parametrize(
+    "payload", [b"", b"{}", b"x" * 300, b"x" * 70000, "{}", "x" * 70000], ids=repr
+)
+def test_payload_is_not_copied(payload):
+    value = msgpack.packb({"type": "event", "payload": payload, "project_id": 42})
+    message = LazyMessage(value)
+
+    assert message["type"] == "event"
+    assert message["project_id"] == 42
+    assert isinstance(message["payload"], memoryview)
+    assert message["payload"].obj is value
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    assert message["payload"] == payload
+
+
+def test_matches_unpackb():
+    value = msgpack.packb(
+        {
+            "type": "event",
+            "event_id": "515539018c9b4260a6f999572f1661ee",
+            "project_id": 42,
+            "start_time": 1600000000.5,
+            "remote_addr": None,
+            "attachments": [{"id": "a", "chunks": 2, "attachment_type": "event.attachment"}],
+            "payload": b"{}",
+        }
+    )
+    expected = msgpack.unpackb(value, use_list=False)
+    message = LazyMessage(value)
+
+    assert len(message) == len(expected)
+    assert list(message) == list(expected)
+    for key, expected_value in expected.items():
+        if key == "payload":
+            assert bytes(message[key]) == expected_value
+        else:
+            assert message[key] == expected_value
+
+    assert message.get("missing") is None
+    with pytest.raises(KeyError):
+        message["missing"]
+
+
+def test_decoded_values_are_kept():
+    message = LazyMessage(msgpack.packb({"attachments": [{"attachment_type": "x"}]}))
+
+    (attachment,) = message["attachments"]
+    assert attachment.pop("attachment_type") == "x"
+    assert message["attachments"] == ({},)
@@ -1,3 +1,4 @@
+import base64
 import errno
 import re
 import unittest
@@ -25,6 +26,7 @@ from sentry.lang.javascript.processor import (
     fetch_sourcemap,
     generate_module,
     get_max_age,
+    get_parsed_sourcemap_cache,
     get_release_file_cache_key,
     get_release_file_cache_key_meta,
     should_retry_fetch,
@@ -1023,6 +1025,31 @@ class FetchSourcemapTest(TestCase):
         with pytest.raises(UnparseableSourcemap):
             fetch_sourcemap("http://example.com")
 
+    @responses.activate
+    @override_options({"sourcemaps.parsed-cache-size": 1024 * 1024})
+    def test_parsed_cache(self):
+        parsed_sourcemap_cache = get_parsed_sourcemap_cache()
+        parsed_sourcemap_cache.clear()
+        body = base64.b64decode(base64_sourcemap[len("data:application/json;base64,") :])
+        responses.add(
+            responses.GET,
+            "http://example.com/foo.js.map",
+            body=body,
+            content_type="application/json",
+        )
+        responses.add(
+            responses.GET,
+            "http://example.com/bar.js.map",
+            body=body + b" ",
+            content_type="application/json",
+        )
+
+        smap_view = fetch_sourcemap("http://example.com/foo.js.map")
+        assert list(smap_view) == [SourceMapTokenMatch(0, 0, 1, 0, src="/test.js", src_id=0)]
+        assert fetch_sourcemap("http://example.com/foo.js.map") is smap_view
+        assert fetch_sourcemap("http://example.com/bar.js.map") is not smap_view
+        assert len(parsed_sourcemap_cache) == 2
+
 
 class TrimLineTest(unittest.TestCase):
     long_line = "The public is more familiar with bad design than good design. It is, in effect, conditioned to prefer bad design, because that is what it lives with. The new becomes threatening, the old reassuring."
@@ -1372,3 +1399,46 @@ class CacheSourceTest(TestCase):
         # now we have an error
         assert len(processor.cache.get_errors(abs_path)) == 1
         assert processor.cache.get_errors(abs_path)[0] == {"url": map_url, "type": "js_no_source"}
+
+
+class PopulateSourceCacheTest(TestCase):
+    @override_options({"sourcemaps.fetch-concurrency": 4})
+    @patch("sentry.lang.javascript.processor.fetch_sourcemap")
+    @patch("sentry.lang.javascript.processor.fetch_file")
+    def test_fetches_concurrently(self, mock_fetch_file, mock_fetch_sourcemap):
+        map_url = "http://example.com/bundle.js.map"
+
+        def fetch_file(url, **kwargs):
+            if url.endswith("missing.js"):
+                raise http.BadSource({"type": EventError.JS_MISSING_SOURCE, "url": url})
+            return http.UrlResult(url, {}, b"//# sourceMappingURL=bundle.js.map", 200, "utf-8")
+
+        mock_fetch_file.side_effect = fetch_file
+        mock_fetch_sourcemap.return_value.iter_sources.return_value = []
+
+        processor = JavaScriptStacktraceProcessor(
+            data={}, stacktrace_infos=None, project=self.project
+        )
+        processor.populate_source_cache(
+            [
+                {"abs_path": "http://example.com/a.js"},
+                {"abs_path": "http://example.com/b.js"},
+                {"abs_path": "http://example.com/a.js"},
+                {"abs_path": "http://example.com/missing.js"},
+            ]
+        )
+
+        assert mock_fetch_file.call_count == 3
+        assert processor.fetch_count == 3
+        assert processor.cache.get("http://example.com/a.js")
+        assert processor.cache.get("http://example.com/b.js")
+        assert processor.cache.get_errors("http://example.com/missing.js") == [
+            {"type": EventError.JS_MISSING_SOURCE, "url": "http://example.com/missing.js"}
+        ]
+
+        # Both sources refer to the same source map, which is only fetched once.
+        mock_fetch_sourcemap.assert_called_once_with(
+            map_url, project=self.project, release=None, dist=None, allow_scraping=True
+        )
+        assert map_url in processor.sourcemaps
+        assert processor.sourcemaps.get_link("http://example.com/b.js")[0] == map_url
@@ -0,0 +1,88 @@
+from sentry.models import GroupHash
+from sentry.tasks.deletion import delete_groups
+from sentry.testutils import TestCase
+from sentry.utils.cache import cache
+
+
+class GroupHashManagerTest(TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_get_or_create_for_hashes(self):
+        existing = GroupHash.objects.create(project=self.project, hash="a" * 32, group=self.group)
+
+        grouphashes = GroupHash.objects.get_or_create_for_hashes(self.project, ["a" * 32, "b" * 32])
+        assert [gh.id for gh in grouphashes] == [
+            existing.id,
+            GroupHash.objects.get(project=self.project, hash="b" * 32).id,
+        ]
+
+        # Only the hash associated with a group is cached.
+        with self.assertNumQueries(1):
+            cached, uncached = GroupHash.objects.get_or_create_for_hashes(
+                self.project, ["a" * 32, "b" * 32]
+            )
+        assert (cached.id, cached.hash, cached.group_id) == (existing.id, "a" * 32, self.group.id)
+        assert (uncached.hash, uncached.group_id) == ("b" * 32, None)
+
+    def test_get_for_hashes(self):
+        GroupHash.objects.create(project=self.project, hash="a" * 32, group=self.group)
+
+        assert set(GroupHash.objects.get_for_hashes(self.project, ["a" * 32, "b" * 32])) == {
+            "a" * 32
+        }
+        with self.assertNumQueries(1):
+            result = GroupHash.objects.get_for_hashes(self.project, ["a" * 32, "b" * 32])
+        assert result["a" * 32].group_id == self.group.id
+
+    def test_invalidation(self):
+        other_group = self.create_group()
+        grouphash = GroupHash.objects.create(project=self.project, hash="a" * 32, group=self.group)
+
+        def get_group_id():
+            return GroupHash.objects.get_for_hashes(self.project, ["a" * 32])["a" * 32].group_id
+
+        assert get_group_id() == self.group.id
+
+        with self.capture_on_commit_callbacks(execute=True):
+            GroupHash.objects.filter(group=self.group).update(group=other_group)
+        assert get_group_id() == other_group.id
+
+        grouphash.refresh_from_db()
+        grouphash.state = GroupHash.State.SPLIT
+        with self.capture_on_commit_callbacks(execute=True):
+            grouphash.save()
+        assert GroupHash.objects.get_for_hashes(self.project, ["a" * 32])["a" * 32].state == (
+            GroupHash.State.SPLIT
+        )
+
+        with self.capture_on_commit_callbacks(execute=True):
+            GroupHash.objects.filter(group=other_group).delete()
+        assert GroupHash.objects.get_for_hashes(self.project, ["a" * 32]) == {}
+
+    def test_bulk_deletion_invalidates(self):
+        GroupHash.objects.create(project=self.project, hash="a" * 32, group=self.group)
+        assert set(GroupHash.objects.get_for_hashes(self.project, ["a" * 32])) == {"a" * 32}
+
+        # Groups delete their hashes with raw SQL.
+        with self.tasks():
+            delete_groups(object_ids=[self.group.id])
+        assert GroupHash.objects.get_for_hashes(self.project, ["a" * 32]) == {}
+
+    def test_stale_read_is_not_cached(self):
+        other_group = self.create_group()
+        grouphash = GroupHash.objects.create(project=self.project, hash="a" * 32, group=self.group)
+
+        # A reader fetches the row before a concurrent change and caches it after the
+        # change has been committed.
+        get_version = GroupHash.objects._GroupHashManager__get_version
+        version = get_version(self.project.id)
+        with self.capture_on_commit_callbacks(execute=True):
+            GroupHash.objects.filter(id=grouphash.id).update(group=other_group)
+        grouphash.group_id = self.group.id
+        GroupHash.objects._GroupHashManager__cache_many(version, [grouphash])
+
+        assert get_version(self.project.id) != version
+        result = GroupHash.objects.get_for_hashes(self.project, ["a" * 32])
+        assert result["a" * 32].group_id == other_group.id
@@ -106,6 +106,19 @@ class EventNodeStoreTest(TestCase):
         e2_body = nodestore.get(e2_node_id)
         assert e2_body is None
 
+    def test_bind_nodes_fills_node_cache(self):
+        self.store_event(data={"event_id": "a" * 32}, project_id=self.project.id)
+        nodestore.cache.clear()
+
+        event = Event(project_id=self.project.id, event_id="a" * 32)
+        eventstore.bind_nodes([event])
+        assert event.data._unbound_node_data is None
+        assert event.data["event_id"] == "a" * 32
+        assert event.data.ref == self.project.id
+
+        node_id = Event.generate_node_id(self.project.id, "a" * 32)
+        assert nodestore.cache.get(node_id)["event_id"] == "a" * 32
+
     def test_screams_bloody_murder_when_ref_fails(self):
         project1 = self.create_project()
         project2 = self.create_project()
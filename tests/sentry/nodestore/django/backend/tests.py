@@ -4,7 +4,7 @@ from datetime import timedelta
 import pytest
 from django.utils import timezone
 
-from sentry.nodestore.base import json_dumps
+from sentry.nodestore.base import ZstdNodeCodec, json_dumps
 from sentry.nodestore.django.backend import DjangoNodeStorage
 from sentry.nodestore.django.models import Node
 from sentry.utils.compat import mock
@@ -51,6 +51,22 @@ class TestDjangoNodeStorage:
             b'{"foo":"bar"}'
         )
 
+    def test_set_codec(self):
+        self.ns.codec = ZstdNodeCodec()
+        self.ns.set("d2502ebbd7df41ceba8d3275595cac33", {"foo": "bar"})
+        node = Node.objects.get(id="d2502ebbd7df41ceba8d3275595cac33")
+        assert node.data == ""
+        assert bytes(node.codec_data).startswith(ZstdNodeCodec.header)
+        assert self.ns.codec.decompress(bytes(node.codec_data)) == b'{"foo":"bar"}'
+
+        # Writing without a codec replaces the binary payload
+        self.ns.codec = None
+        self.ns.set("d2502ebbd7df41ceba8d3275595cac33", {"foo": "baz"})
+        node = Node.objects.get(id="d2502ebbd7df41ceba8d3275595cac33")
+        assert node.data == compress(b'{"foo":"baz"}')
+        assert node.codec_data is None
+        assert self.ns.get("d2502ebbd7df41ceba8d3275595cac33") == {"foo": "baz"}
+
     def test_delete(self):
         node = Node.objects.create(id="d2502ebbd7df41ceba8d3275595cac33", data=b'{"foo": "bar"}')
 
@@ -2,11 +2,16 @@
 Testsuite of backend-independent nodestore tests. Add your backend to the
 `ns` fixture to have it tested.
 """
+import pickle
 from contextlib import contextmanager
 
 import pytest
+import zstandard
 
+from sentry.nodestore.base import LazyNodePayload, ZstdNodeCodec
 from sentry.nodestore.django.backend import DjangoNodeStorage
+from sentry.utils.compat import mock
+from sentry.utils.datastructures import LRUCache
 from tests.sentry.nodestore.bigtable.backend.tests import (
     MockedBigtableNodeStorage,
     get_temporary_bigtable_nodestorage,
@@ -46,6 +51,68 @@ def test_get_multi(ns):
     assert result == {n[0]: n[1] for n in nodes}
 
 
+def test_get_multi_iter(ns):
+    nodes = {f"node_{i}": {"foo": str(i), "bar": i} for i in range(5)}
+    for node_id, data in nodes.items():
+        ns.set_subkeys(node_id, {None: data, "other": {"foo": "other"}})
+
+    # Only has an effect on the Bigtable backend
+    ns.multi_get_shard_size = 2
+
+    assert dict(ns.get_multi_iter(list(nodes))) == nodes
+
+    only_foo = {node_id: {"foo": data["foo"]} for node_id, data in nodes.items()}
+    assert dict(ns.get_multi_iter(list(nodes), keys=["foo"])) == only_foo
+    assert ns.get_multi(list(nodes), keys=["foo"]) == only_foo
+
+    assert dict(ns.get_multi_iter(["node_1", "node_2"], subkey="other")) == {
+        "node_1": {"foo": "other"},
+        "node_2": {"foo": "other"},
+    }
+
+
+def test_get_lazy(ns):
+    ns.set_subkeys("node_1", {None: {"foo": "a"}, "other": {"foo": "b"}})
+    ns.set("node_2", {})
+    ns.cache.clear()
+
+    rv = ns.get("node_1", lazy=True)
+    assert isinstance(rv, LazyNodePayload)
+    assert not rv.is_decoded
+    assert rv and rv == {"foo": "a"}
+    assert rv.is_decoded
+    assert pickle.loads(pickle.dumps(rv)) == {"foo": "a"}
+
+    assert ns.get("node_1", subkey="other", lazy=True) == {"foo": "b"}
+
+    result = ns.get_multi(["node_1", "node_2"], lazy=True)
+    assert not result["node_2"]
+    assert result == {"node_1": {"foo": "a"}, "node_2": {}}
+
+
+def test_local_cache(ns):
+    ns.local_cache = LRUCache(1000, weigher=len)
+
+    ns.set("node_1", {"foo": "a"})
+    ns.cache.clear()
+    assert ns.local_cache.get("node_1") == b'{"foo":"a"}'
+    with mock.patch.object(ns, "_get_bytes", side_effect=AssertionError):
+        assert ns.get("node_1") == {"foo": "a"}
+        assert ns.get_multi(["node_1"]) == {"node_1": {"foo": "a"}}
+
+    ns.delete("node_1")
+    assert "node_1" not in ns.local_cache
+    assert ns.get("node_1") is None
+
+    # The cache is bounded by the size of the payloads
+    ns.set("node_2", {"foo": "x" * 600})
+    ns.set("node_3", {"foo": "y" * 600})
+    assert "node_2" not in ns.local_cache
+    assert ns.get("node_2") == {"foo": "x" * 600}
+    assert "node_2" in ns.local_cache
+    assert "node_3" not in ns.local_cache
+
+
 def test_set(ns):
     node_id = "d2502ebbd7df41ceba8d3275595cac33"
     data = {"foo": "bar"}
@@ -97,3 +164,46 @@ def test_set_subkeys(ns):
     ns.delete("node_1")
     assert ns.get("node_1") is None
     assert ns.get("node_1", subkey="other") is None
+
+
+def test_codec(ns):
+    ns.set("node_1", {"foo": "a"})
+
+    ns.codec = ZstdNodeCodec()
+    ns.set("node_2", {"foo": "b"})
+    assert ns._get_bytes("node_2").startswith(ZstdNodeCodec.header)
+
+    ns.cache.clear()
+    assert ns.get_multi(["node_1", "node_2"]) == {"node_1": {"foo": "a"}, "node_2": {"foo": "b"}}
+
+    # Nodes written with a codec can be read after disabling it
+    ns.codec = None
+    ns.cache.clear()
+    assert ns.get("node_2") == {"foo": "b"}
+
+
+def test_codec_dictionary(ns, tmpdir):
+    samples = [
+        ns._encode({None: {"platform": "python", "message": f"error {i}", "tags": [["n", i]]}})
+        for i in range(1000)
+    ]
+    path = tmpdir.join("python.dict")
+    path.write_binary(zstandard.train_dictionary(4096, samples, dict_id=42).as_bytes())
+
+    ns.codec = ZstdNodeCodec(dictionaries={"python": str(path)})
+    data = {"platform": "python", "message": "error", "tags": [["n", 1]]}
+    ns.set("node_1", data)
+    ns.set("node_2", {"platform": "other"})
+
+    ns.cache.clear()
+    assert ns.get("node_1") == data
+    assert ns.get("node_2") == {"platform": "other"}
+
+    ns.codec = ZstdNodeCodec(retired_dictionaries=[str(path)])
+    ns.cache.clear()
+    assert ns.get("node_1") == data
+
+    ns.codec = ZstdNodeCodec()
+    ns.cache.clear()
+    with pytest.raises(ValueError):
+        ns.get("node_1")
@@ -1,5 +1,8 @@
+from time import time
+
 from sentry.ratelimits.redis import RedisRateLimiter
 from sentry.testutils import TestCase
+from sentry.utils.compat import mock
 
 
 class RedisRateLimiterTest(TestCase):
@@ -13,3 +16,52 @@ class RedisRateLimiterTest(TestCase):
     def test_simple_key(self):
         assert not self.backend.is_limited("foo", 1)
         assert self.backend.is_limited("foo", 1)
+
+
+class LeasedRedisRateLimiterTest(TestCase):
+    def setUp(self):
+        self.backend = RedisRateLimiter(lease_size=5, lease_ratio=0.5)
+
+    def test_simple_key(self):
+        for _ in range(10):
+            assert not self.backend.is_limited("foo", 10)
+        assert self.backend.is_limited("foo", 10)
+        assert self.backend.is_limited("foo", 10)
+
+    def test_small_limit_is_not_leased(self):
+        assert not self.backend.is_limited("foo", 1)
+        assert self.backend.is_limited("foo", 1)
+
+    def test_shared_limit(self):
+        other = RedisRateLimiter(lease_size=5, lease_ratio=0.5)
+
+        for _ in range(3):
+            assert not self.backend.is_limited("foo", 10, self.project)
+        for _ in range(5):
+            assert not other.is_limited("foo", 10, self.project)
+
+        # The unused part of the first lease is still available, after that
+        # the limit has been reached.
+        for _ in range(2):
+            assert not self.backend.is_limited("foo", 10, self.project)
+        assert self.backend.is_limited("foo", 10, self.project)
+        assert other.is_limited("foo", 10, self.project)
+
+    def test_exhausted_lease_keeps_concurrent_tokens(self):
+        expires_at = time() + 10
+        with self.backend.cluster.map() as client:
+            client.set("foo", 10)
+        self.backend._leases["foo"] = [expires_at, 0]
+
+        def lease_concurrently(*args, **kwargs):
+            # Another thread stores a lease while this one asks Redis for more.
+            self.backend._leases["foo"][1] = 2
+
+        with mock.patch(
+            "sentry.ratelimits.redis.metrics.incr", side_effect=lease_concurrently
+        ) as mock_incr:
+            assert not self.backend._is_limited_leased("foo", 10, 10, expires_at, 5)
+            mock_incr.side_effect = None
+            assert not self.backend._is_limited_leased("foo", 10, 10, expires_at, 5)
+            assert self.backend._is_limited_leased("foo", 10, 10, expires_at, 5)
+            assert self.backend._leases["foo"] == [expires_at, -1]
@@ -12,6 +12,7 @@ from sentry.rules import init_registry
 from sentry.rules.filters.base import EventFilter
 from sentry.rules.processor import RuleProcessor
 from sentry.testutils import TestCase
+from sentry.testutils.helpers import override_options
 from sentry.utils.compat.mock import patch
 
 EMAIL_ACTION_DATA = {
@@ -21,6 +22,7 @@ EMAIL_ACTION_DATA = {
 }
 
 EVERY_EVENT_COND_DATA = {"id": "sentry.rules.conditions.every_event.EveryEventCondition"}
+EVENT_FREQUENCY_COND_ID = "sentry.rules.conditions.event_frequency.EventFrequencyCondition"
 
 
 class RuleProcessorTest(TestCase):
@@ -155,6 +157,46 @@ class RuleProcessorTest(TestCase):
             # creates no rows.
             self.run_query_test(rp, 2)
 
+    def test_event_frequency_queries_are_shared(self):
+        Rule.objects.filter(project=self.event.project).delete()
+        rules = [
+            Rule.objects.create(
+                project=self.event.project,
+                data={
+                    "conditions": [
+                        {"id": EVENT_FREQUENCY_COND_ID, "interval": interval, "value": 0}
+                    ],
+                    "actions": [EMAIL_ACTION_DATA],
+                },
+            )
+            for interval in ("1h", "1h", "1d")
+        ]
+        rp = RuleProcessor(
+            self.event,
+            is_new=True,
+            is_regression=True,
+            is_new_group_environment=True,
+            has_reappeared=True,
+        )
+
+        with patch(
+            "sentry.tsdb.get_sums", return_value={self.event.group_id: 1}
+        ) as mock_get_sums, override_options({"rules.event-frequency.cache-ttl": 60}):
+            results = list(rp.apply())
+            assert len(results) == 1
+            assert [future.rule for future in results[0][1]] == rules
+            # The two rules with the same interval share a query.
+            assert mock_get_sums.call_count == 2
+
+            GroupRuleStatus.objects.filter(rule__in=rules).update(
+                last_active=timezone.now() - timedelta(minutes=Rule.DEFAULT_FREQUENCY + 1)
+            )
+
+            # The results are shared with later events of the group.
+            results = list(rp.apply())
+            assert len(results[0][1]) == 3
+            assert mock_get_sums.call_count == 2
+
 
 # mock filter which always passes
 class MockFilterTrue(EventFilter):
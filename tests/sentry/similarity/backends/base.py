@@ -172,6 +172,31 @@ class MinHashIndexBackendTestMixin:
         self.index.merge("example", "2", [("index", "1")])
         assert self.index.classify("example", [("index", 0, ["foo", "bar"])]) == [("2", [0.5])]
 
+    def test_record_many(self):
+        self.index.record_many(
+            [
+                ("example", "1", [("index", ["foo", "bar"])], None),
+                ("example", "2", [("index", ["baz"])], None),
+                ("example", "3", [], None),
+                ("other", "1", [("index", ["baz"])], None),
+            ]
+        )
+
+        assert self.index.classify_many(
+            [
+                ("example", [("index", 0, ["foo", "bar"])], None, None),
+                ("example", [("index", 0, ["baz"])], None, None),
+                ("other", [("index", 0, ["foo", "bar"])], None, None),
+                ("other", [("index", 0, ["baz"])], None, None),
+            ]
+        ) == [
+            self.index.classify("example", [("index", 0, ["foo", "bar"])]),
+            self.index.classify("example", [("index", 0, ["baz"])]),
+            [],
+            [("1", [1.0])],
+        ]
+        assert self.index.classify("example", [("index", 0, ["foo", "bar"])]) == [("1", [1.0])]
+
     def test_flush_scoped(self):
         self.index.record("example", "1", [("index", ["foo", "bar"])])
         assert self.index.classify("example", [("index", 0, ["foo", "bar"])]) == [("1", [1.0])]
@@ -1,6 +1,8 @@
 from collections import Counter
 from unittest import TestCase
 
+import mmh3
+
 from sentry.similarity.signatures import MinHashSignatureBuilder
 from sentry.utils.compat import map, zip
 
@@ -29,3 +31,26 @@ class MinHashSignatureBuilderTestCase(TestCase):
         self.assertAlmostEqual(
             similarity, estimation, delta=0.1  # totally made up constant, seems reasonable
         )
+
+    def test_build_many(self):
+        columns, rows = 16, 0xFFFF
+        get_signature = MinHashSignatureBuilder(columns, rows)
+        feature_sets = [{"foo", "bar"}, ["bar", "baz", "bar"], {"foo"}]
+        assert get_signature.build_many(feature_sets) == [
+            [
+                min(mmh3.hash(feature, column) % rows for feature in features)
+                for column in range(columns)
+            ]
+            for features in feature_sets
+        ]
+
+        # Signatures of the original implementation, which must not change since
+        # they are stored in the similarity index.
+        assert MinHashSignatureBuilder(4, rows).build_many(feature_sets) == [
+            [47813, 37936, 32982, 5089],
+            [24146, 35463, 32982, 5089],
+            [47813, 37936, 40942, 50522],
+        ]
+
+        with self.assertRaises(ValueError):
+            get_signature.build_many([{"foo"}, set()])
@@ -12,6 +12,7 @@ from sentry.snuba.query_subscription_consumer import (
     InvalidMessageError,
     InvalidSchemaError,
     QuerySubscriptionConsumer,
+    batch_subscriber_registry,
     register_subscriber,
     subscriber_registry,
 )
@@ -114,6 +115,92 @@ class HandleMessageTest(BaseQuerySubscriptionTest, TestCase):
         mock_callback.assert_called_once_with(data["payload"], sub)
 
 
+class HandleMessagesTest(BaseQuerySubscriptionTest, TestCase):
+    metrics = patcher("sentry.snuba.query_subscription_consumer.metrics")
+
+    def create_subscription(self, registration_key):
+        with self.tasks():
+            snuba_query = create_snuba_query(
+                QueryDatasets.EVENTS,
+                "hello",
+                "count()",
+                timedelta(minutes=10),
+                timedelta(minutes=1),
+                None,
+            )
+            sub = create_snuba_subscription(self.project, registration_key, snuba_query)
+        sub.refresh_from_db()
+        return sub
+
+    def build_message_for(self, sub):
+        data = deepcopy(self.valid_wrapper)
+        data["payload"]["subscription_id"] = sub.subscription_id
+        return self.build_mock_message(data)
+
+    def build_expected_payload(self, sub):
+        payload = deepcopy(self.valid_payload)
+        payload["subscription_id"] = sub.subscription_id
+        payload["values"] = payload["result"]
+        payload["timestamp"] = parse_date(payload["timestamp"]).replace(tzinfo=pytz.utc)
+        return payload
+
+    def test_batch_subscriber(self):
+        mock_callback = mock.Mock()
+        mock_batch_callback = mock.Mock()
+        other_callback = mock.Mock()
+        with mock.patch.dict(
+            subscriber_registry,
+            {"registered_test": mock_callback, "other_test": other_callback},
+        ), mock.patch.dict(batch_subscriber_registry, {"registered_test": mock_batch_callback}):
+            sub = self.create_subscription("registered_test")
+            other_sub = self.create_subscription("registered_test")
+            unbatched_sub = self.create_subscription("other_test")
+
+            self.consumer.handle_messages(
+                [
+                    self.build_message_for(sub),
+                    self.build_message_for(unbatched_sub),
+                    self.build_message_for(other_sub),
+                    self.build_message_for(sub),
+                ]
+            )
+
+        assert not mock_callback.called
+        other_callback.assert_called_once_with(
+            self.build_expected_payload(unbatched_sub), unbatched_sub
+        )
+        mock_batch_callback.assert_called_once_with(
+            [
+                (self.build_expected_payload(sub), sub),
+                (self.build_expected_payload(other_sub), other_sub),
+                (self.build_expected_payload(sub), sub),
+            ]
+        )
+
+    def test_invalid_and_missing_subscriptions(self):
+        mock_batch_callback = mock.Mock()
+        with mock.patch.dict(
+            subscriber_registry, {"registered_test": mock.Mock()}
+        ), mock.patch.dict(batch_subscriber_registry, {"registered_test": mock_batch_callback}):
+            sub = self.create_subscription("registered_test")
+            invalid_message = self.build_mock_message({"version": 50, "payload": {}})
+            with mock.patch("sentry.snuba.tasks._snuba_pool") as pool:
+                pool.urlopen.return_value.status = 202
+                self.consumer.handle_messages(
+                    [
+                        invalid_message,
+                        self.build_mock_message(
+                            self.valid_wrapper, topic=settings.KAFKA_EVENTS_SUBSCRIPTIONS_RESULTS
+                        ),
+                        self.build_message_for(sub),
+                    ]
+                )
+
+        self.metrics.incr.assert_any_call("snuba_query_subscriber.message_wrapper_invalid_version")
+        self.metrics.incr.assert_any_call("snuba_query_subscriber.subscription_doesnt_exist")
+        mock_batch_callback.assert_called_once_with([(self.build_expected_payload(sub), sub)])
+
+
 class ParseMessageValueTest(BaseQuerySubscriptionTest, unittest.TestCase):
     def run_test(self, message):
         self.consumer.parse_message_value(json.dumps(message))
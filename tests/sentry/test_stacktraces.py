@@ -2,11 +2,16 @@ import pytest
 
 from sentry.grouping.api import get_default_grouping_config_dict, load_grouping_config
 from sentry.stacktraces.processing import (
+    StacktraceProcessor,
     find_stacktraces_in_data,
     get_crash_frame_from_event_data,
+    get_stacktrace_processing_task,
     normalize_stacktraces_for_grouping,
+    set_frame_cache_values,
 )
 from sentry.testutils import TestCase
+from sentry.utils.cache import cache
+from sentry.utils.compat.mock import patch
 
 
 class FindStacktracesTest(TestCase):
@@ -157,6 +162,52 @@ class FindStacktracesTest(TestCase):
         assert len(infos[0].stacktrace["frames"]) == 3
 
 
+class CachingStacktraceProcessor(StacktraceProcessor):
+    def handles_frame(self, frame, stacktrace_info):
+        return True
+
+    def preprocess_frame(self, processable_frame):
+        processable_frame.set_cache_key_from_values([processable_frame["function"]])
+
+
+class FrameCacheTest(TestCase):
+    def get_processing_task(self):
+        data = {
+            "project": self.project.id,
+            "stacktrace": {"frames": [{"function": "foo"}, {"function": "bar"}]},
+        }
+        infos = find_stacktraces_in_data(data)
+        return get_stacktrace_processing_task(
+            infos, [CachingStacktraceProcessor(data, infos, project=self.project)]
+        )
+
+    @patch("sentry.stacktraces.processing.metrics.incr")
+    def test_frame_cache(self, mock_incr):
+        cache.clear()
+
+        task = self.get_processing_task()
+        foo, bar = task.iter_processable_frames()
+        assert (foo.cache_value, bar.cache_value) == (None, None)
+        mock_incr.assert_called_once_with(
+            "process_stacktraces.frame_cache",
+            amount=2,
+            tags={"processor": "CachingStacktraceProcessor", "result": "miss"},
+        )
+
+        foo.cache_value = {"value": "foo"}
+        assert set_frame_cache_values([foo, bar]) == 1
+
+        mock_incr.reset_mock()
+        task = self.get_processing_task()
+        foo, bar = task.iter_processable_frames()
+        assert (foo.cache_value, bar.cache_value) == ({"value": "foo"}, None)
+        mock_incr.assert_any_call(
+            "process_stacktraces.frame_cache",
+            amount=1,
+            tags={"processor": "CachingStacktraceProcessor", "result": "hit"},
+        )
+
+
 class NormalizeInApptest(TestCase):
     def test_normalize_with_system_frames(self):
         data = {
@@ -4,7 +4,7 @@ from unittest import TestCase
 
 import pytz
 
-from sentry.tsdb.base import ONE_DAY, ONE_HOUR, ONE_MINUTE, BaseTSDB
+from sentry.tsdb.base import ONE_DAY, ONE_HOUR, ONE_MINUTE, BaseTSDB, TimeSeriesColumns
 from sentry.utils.compat import mock
 from sentry.utils.dates import to_timestamp
 
@@ -40,6 +40,20 @@ class BaseTSDBTest(TestCase):
         assert len(post_results) == 1
         assert post_results[1] == [[1368889200, 15], [1368892800, 7]]
 
+    def test_time_series_columns(self):
+        columns = TimeSeriesColumns.from_series(
+            [1368889200, 1368892800, 1368896400],
+            [1, 2],
+            {1: [(1368889200, 5), (1368896400, 7), (1368900000, 1)]},
+        )
+        assert columns.timestamps == [1368889200, 1368892800, 1368896400]
+        assert columns.keys == [1, 2]
+        assert columns.values == [[5, 0, 7], [0, 0, 0]]
+        assert columns.to_series() == {
+            1: [(1368889200, 5), (1368892800, 0), (1368896400, 7)],
+            2: [(1368889200, 0), (1368892800, 0), (1368896400, 0)],
+        }
+
     def test_calculate_expiry(self):
         timestamp = datetime(2013, 5, 18, 15, 13, 58, 132928, tzinfo=pytz.UTC)
         result = self.tsdb.calculate_expiry(10, 30, timestamp)
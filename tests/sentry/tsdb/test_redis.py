@@ -179,6 +179,82 @@ class RedisTSDBTest(TestCase):
         results = self.db.get_sums(TSDBModel.project, [1, 2], dts[0], dts[-1], environment_id=1)
         assert results == {1: 0, 2: 0}
 
+    def test_columns(self):
+        now = datetime.utcnow().replace(tzinfo=pytz.UTC) - timedelta(hours=4)
+        dts = [now + timedelta(hours=i) for i in range(4)]
+
+        self.db.incr(TSDBModel.project, 1, dts[0])
+        self.db.incr(TSDBModel.project, 1, dts[2], count=2)
+        self.db.incr(TSDBModel.project, 2, dts[3])
+
+        columns = self.db.get_range_columns(TSDBModel.project, [1, 2, 3], dts[0], dts[-1])
+        assert columns.keys == [1, 2, 3]
+        assert columns.values == [[1, 0, 2, 0], [0, 0, 0, 1], [0, 0, 0, 0]]
+        assert columns.to_series() == self.db.get_range(
+            TSDBModel.project, [1, 2, 3], dts[0], dts[-1]
+        )
+
+        model = TSDBModel.users_affected_by_group
+        self.db.record(model, 1, ("foo", "bar"), dts[0])
+        self.db.record(model, 1, ("baz",), dts[3])
+
+        columns = self.db.get_distinct_counts_series_columns(
+            model, [1, 2], dts[0], dts[-1], rollup=3600
+        )
+        assert columns.timestamps == self.db.get_optimal_rollup_series(dts[0], dts[-1], 3600)[1]
+        assert columns.values == [[2, 0, 0, 1], [0, 0, 0, 0]]
+
+    def test_batch_item_options(self):
+        now = datetime.utcnow().replace(tzinfo=pytz.UTC) - timedelta(hours=4)
+        dts = [now + timedelta(hours=i) for i in range(2)]
+
+        def timestamp(d):
+            t = int(to_timestamp(d))
+            return t - (t % 3600)
+
+        self.db.incr_multi(
+            [
+                (TSDBModel.project, 1, {"timestamp": dts[0], "environment_id": 1}),
+                (TSDBModel.project, 1, {"timestamp": dts[0], "environment_id": 1}),
+                (TSDBModel.project, 1, {"timestamp": dts[1], "environment_id": 2, "count": 3}),
+            ]
+        )
+
+        results = self.db.get_range(TSDBModel.project, [1], dts[0], dts[-1])
+        assert results == {1: [(timestamp(dts[0]), 2), (timestamp(dts[1]), 3)]}
+
+        results = self.db.get_range(TSDBModel.project, [1], dts[0], dts[-1], environment_ids=[1])
+        assert results == {1: [(timestamp(dts[0]), 2), (timestamp(dts[1]), 0)]}
+
+        model = TSDBModel.users_affected_by_group
+        self.db.record_multi(
+            [
+                (model, 1, ("foo",), {"timestamp": dts[0], "environment_id": 1}),
+                (model, 1, ("foo", "bar"), {"timestamp": dts[0], "environment_id": 1}),
+                (model, 1, ("baz",), {"timestamp": dts[1], "environment_id": 2}),
+            ]
+        )
+
+        assert self.db.get_distinct_counts_series(model, [1], dts[0], dts[-1], rollup=3600) == {
+            1: [(timestamp(dts[0]), 2), (timestamp(dts[1]), 1)]
+        }
+        assert self.db.get_distinct_counts_totals(
+            model, [1], dts[0], dts[-1], rollup=3600, environment_id=1
+        ) == {1: 2}
+
+        model = TSDBModel.frequent_environments_by_group
+        self.db.record_frequency_multi(
+            [
+                (model, {1: {"a": 1}}, {"timestamp": dts[0]}),
+                (model, {1: {"a": 1, "b": 1}}, {"timestamp": dts[0]}),
+                (model, {1: {"b": 1}}, {"timestamp": dts[1]}),
+            ]
+        )
+
+        assert self.db.get_frequency_totals(model, {1: ("a", "b")}, dts[0], dts[-1]) == {
+            1: {"a": 2.0, "b": 2.0}
+        }
+
     def test_count_distinct(self):
         now = datetime.utcnow().replace(tzinfo=pytz.UTC) - timedelta(hours=4)
         dts = [now + timedelta(hours=i) for i in range(4)]
@@ -1,6 +1,6 @@
 import pytest
 
-from sentry.utils.datastructures import BidirectionalMapping
+from sentry.utils.datastructures import BidirectionalMapping, LRUCache
 
 
 def test_bidirectional_mapping():
@@ -30,3 +30,56 @@ def test_bidirectional_mapping():
     del value["c"]
 
     assert len(value) == len(value.inverse()) == 2
+
+
+def test_lru_cache():
+    cache = LRUCache(2)
+    assert cache.set("a", 1) == 0
+    assert cache.set("b", 2) == 0
+    assert cache.get("a") == 1
+    assert cache.set("c", 3) == 1
+    assert "b" not in cache
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+    assert cache.pop("a") == 1
+    assert cache.pop("a") is None
+    assert len(cache) == 1
+
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.weight == 0
+
+
+def test_lru_cache_weigher():
+    cache = LRUCache(10, weigher=len)
+    cache.set("a", b"12345")
+    cache.set("b", b"1234")
+    assert cache.weight == 9
+    assert cache.set("c", b"123") == 5
+    assert "a" not in cache
+    assert cache.weight == 7
+
+    # too large to be stored at all
+    assert cache.set("d", b"12345678901") == 0
+    assert "d" not in cache
+
+    # replacing a value updates the weight
+    cache.set("b", b"1")
+    assert cache.weight == 4
+
+
+def test_lru_cache_weigher_evicts_least_recently_used():
+    cache = LRUCache(10, weigher=len)
+    cache.set("a", b"1234")
+    cache.set("b", b"1234")
+    assert cache.get("a") == b"1234"
+
+    # "b" is the least recently used item
+    assert cache.set("c", b"1234") == 4
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1234"
+    assert cache.get("c") == b"1234"
+    assert cache.weight == 8
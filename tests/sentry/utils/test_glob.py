@@ -1,6 +1,6 @@
 import pytest
 
-from sentry.utils.glob import glob_match
+from sentry.utils.glob import compile_glob, glob_match, glob_match_many
 
 
 class GlobInput:
@@ -48,7 +48,43 @@ class GlobInput:
         ],
         [GlobInput("foo:\nbar", "foo:*"), True],
         [GlobInput("foo:\nbar", "foo:*", allow_newline=False), False],
+        [GlobInput("foo.js", "**/foo.js", doublestar=True), True],
+        [GlobInput("a/foo.js", "a/**/foo.js", doublestar=True), True],
+        [GlobInput("a/b/c/foo.js", "a/**/foo.js", doublestar=True), True],
+        [GlobInput("a", "a/**", doublestar=True), False],
+        [GlobInput("a/b/c", "a/**", doublestar=True), True],
+        [GlobInput("a/b/c", "a**c", doublestar=True), False],
+        [GlobInput("a/b", "a?b", doublestar=True), False],
+        [GlobInput("a/b", "a?b"), True],
+        [GlobInput("std::foo", "std::*"), True],
+        [GlobInput("a.b", "a?b"), True],
+        [GlobInput("axb", "a.b"), False],
+        [GlobInput("\u00e9", "?"), False],
+        [GlobInput("\u00e9", "??"), True],
+        [GlobInput("b", "[ab]"), True],
+        [GlobInput("*", "\\*"), True],
     ],
 )
 def test_glob_match(glob_input, expect):
     assert glob_input() == expect
+    if glob_input.value is not None:
+        assert glob_match_many([glob_input.value], glob_input.pat, **glob_input.kwargs)[0] == expect
+
+
+def test_glob_match_many():
+    values = [b"foo/hello.py", None, "bar/hello.py", b"foo/hello.py", b"hello.js"]
+    assert glob_match_many(values, b"**/*.py", doublestar=True) == [
+        True,
+        False,
+        True,
+        True,
+        False,
+    ]
+
+
+def test_compile_glob_falls_back():
+    assert compile_glob(b"foo*") is not None
+    assert compile_glob(b"[ab]") is None
+    assert compile_glob(b"{a,b}") is None
+    assert compile_glob(b"\\*") is None
+    assert compile_glob(b"\\*", path_normalize=True) is not None
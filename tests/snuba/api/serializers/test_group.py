@@ -420,29 +420,29 @@ class StreamGroupSerializerTestCase(APITestCase, SnubaTestCase):
         environment = Environment.get_or_create(group.project, "production")
 
         with mock.patch(
-            "sentry.api.serializers.models.group.snuba_tsdb.get_range",
-            side_effect=snuba_tsdb.get_range,
-        ) as get_range:
+            "sentry.api.serializers.models.group.snuba_tsdb.get_range_columns",
+            side_effect=snuba_tsdb.get_range_columns,
+        ) as get_range_columns:
             serialize(
                 [group],
                 serializer=StreamGroupSerializerSnuba(
                     environment_ids=[environment.id], stats_period="14d"
                 ),
             )
-            assert get_range.call_count == 1
-            for args, kwargs in get_range.call_args_list:
+            assert get_range_columns.call_count == 1
+            for args, kwargs in get_range_columns.call_args_list:
                 assert kwargs["environment_ids"] == [environment.id]
 
         with mock.patch(
-            "sentry.api.serializers.models.group.snuba_tsdb.get_range",
-            side_effect=snuba_tsdb.get_range,
-        ) as get_range:
+            "sentry.api.serializers.models.group.snuba_tsdb.get_range_columns",
+            side_effect=snuba_tsdb.get_range_columns,
+        ) as get_range_columns:
             serialize(
                 [group],
                 serializer=StreamGroupSerializerSnuba(environment_ids=None, stats_period="14d"),
             )
-            assert get_range.call_count == 1
-            for args, kwargs in get_range.call_args_list:
+            assert get_range_columns.call_count == 1
+            for args, kwargs in get_range_columns.call_args_list:
                 assert kwargs["environment_ids"] is None
 
     def test_session_count(self):
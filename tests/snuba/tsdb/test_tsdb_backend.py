@@ -166,6 +166,14 @@ class SnubaTSDBTest(TestCase, SnubaTestCase):
 
         assert self.db.get_range(TSDBModel.group, [], dts[0], dts[-1], rollup=3600) == {}
 
+    def test_range_columns_groups(self):
+        dts = [self.now + timedelta(hours=i) for i in range(4)]
+        keys = [self.proj1group1.id, self.proj1group2.id, 0]
+        columns = self.db.get_range_columns(TSDBModel.group, keys, dts[0], dts[-1], rollup=3600)
+        assert columns.timestamps == [timestamp(dt) for dt in dts]
+        assert columns.keys == keys
+        assert columns.values == [[3, 3, 3, 3], [3, 3, 3, 3], [0, 0, 0, 0]]
+
     def test_range_releases(self):
         dts = [self.now + timedelta(hours=i) for i in range(4)]
         assert self.db.get_range(